@@ -0,0 +1,109 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Type, Any, Dict, List, Tuple, AsyncIterator, Optional, Callable
+from models.serialization import rows_to_dicts
+from sqlalchemy import distinct, select, update, delete, text, table, column, literal_column, Column
+
+
+class AsyncBaseDAO:
+    """BaseDAO over an AsyncSession, for the routers; same methods, awaited."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def insert(self, model: Type[Any], data: Dict) -> Any:
+        record = model(**data)
+        self.db.add(record)
+        await self.db.commit()
+        await self.db.refresh(record)
+        return record
+
+    async def bulk_insert_records(self, model: Type[Any], data: List[Dict]):
+        records = [model(**item) for item in data]
+        self.db.add_all(records)
+        await self.db.commit()
+        return records
+
+    async def bulk_upsert_records(self, model: Type[Any], data: List[Dict], conflict_cols: List[str], update_cols: List[str]):
+        stmt = pg_insert(model).values(data)
+        update_dict = {col: getattr(stmt.excluded, col) for col in update_cols}
+        stmt = stmt.on_conflict_do_update(index_elements=conflict_cols, set_=update_dict)
+        await self.db.execute(stmt)
+        await self.db.commit()
+
+    async def copy_upsert(
+        self,
+        model: Type[Any],
+        staging_columns: Dict[str, str],
+        key_col: str,
+        conflict_cols: List[str],
+        record_chunks: AsyncIterator[List[Tuple]],
+        update_set: Dict[str, Any],
+        source_where: Optional[Callable[[Any], Any]] = None,
+    ) -> Tuple[int, List[Tuple[Any, bool]]]:
+        """
+        COPY records into a temporary staging table, then merge it in one INSERT ... ON CONFLICT.
+
+        staging_columns maps each incoming column to its Postgres type. Records are (seq, *columns)
+        tuples; when a key_col value repeats, the highest seq wins. source_where(staging) can hold
+        staged rows back. Returns the number of records staged and (key_col value, inserted) for
+        every row written.
+        """
+        staging_name = f"{model.__tablename__}_staging"
+        columns = list(staging_columns)
+        column_ddl = ", ".join(f'"{name}" {pg_type}' for name, pg_type in staging_columns.items())
+        # Dropped with the transaction, so a pooled connection never keeps one
+        await self.db.execute(text(f'CREATE TEMP TABLE "{staging_name}" (seq bigint, {column_ddl}) ON COMMIT DROP'))
+        raw_connection = (await (await self.db.connection()).get_raw_connection()).driver_connection
+
+        staged = 0
+        async for records in record_chunks:
+            await raw_connection.copy_records_to_table(staging_name, records=records, columns=["seq", *columns])
+            staged += len(records)
+
+        staging = table(staging_name, column("seq"), *(column(name) for name in columns))
+        key = staging.c[key_col]
+        latest = select(*(staging.c[name] for name in columns)).distinct(key).order_by(key, staging.c.seq.desc())
+        if source_where is not None:
+            latest = latest.where(source_where(staging))
+        stmt = pg_insert(model).from_select(columns, latest)
+        stmt = stmt.on_conflict_do_update(index_elements=conflict_cols, set_=update_set)
+        # xmax is 0 on a freshly inserted row version and set on one written by the DO UPDATE
+        stmt = stmt.returning(model.__table__.c[key_col], literal_column("xmax = 0").label("inserted"))
+        result = await self.db.execute(stmt)
+        written = [(row[0], row[1]) for row in result.all()]
+        await self.db.commit()
+        return staged, written
+
+    async def get_all(self, model: Type[Any], filters: Dict) -> List[Any]:
+        result = await self.db.execute(select(model).filter_by(**filters))
+        return result.scalars().all()
+
+    async def get_one(self, model: Type[Any], filters: Dict) -> Any:
+        result = await self.db.execute(select(model).filter_by(**filters).limit(1))
+        return result.scalars().first()
+
+    async def get_page(self, columns: List[Column], key: Column, filters: Dict, after: Any = None, limit: int = 100, conditions: List[Any] = ()) -> List[Dict]:
+        """Up to limit rows after the key value `after`, in key order, with only the given columns selected."""
+        query = select(*columns).where(*(key.table.c[name] == value for name, value in filters.items()), *conditions)
+        if after is not None:
+            query = query.where(key > after)
+        result = await self.db.execute(query.order_by(key).limit(limit))
+        return rows_to_dicts(result)
+
+    async def update(self, model: Type[Any], filters: Dict, update_data: Dict) -> int:
+        result = await self.db.execute(update(model).filter_by(**filters).values(**update_data))
+        await self.db.commit()
+        return result.rowcount
+
+    async def delete(self, model: Type[Any], filters: Dict) -> int:
+        result = await self.db.execute(delete(model).filter_by(**filters))
+        await self.db.commit()
+        return result.rowcount
+
+    async def get_distinct(self, column: Column, filters: Dict = None) -> List[Any]:
+        query = select(distinct(column))
+        if filters:
+            query = query.filter_by(**filters)
+        result = await self.db.execute(query)
+        return result.all()
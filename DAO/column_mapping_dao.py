@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Optional, List
+from sqlalchemy import delete
+from models.column_mapping import ColumnMapping
+from DAO.base_dao import BaseDAO
+from DAO.async_base_dao import AsyncBaseDAO
+import uuid
+
+
+class ColumnMappingDAO(BaseDAO):
+    def __init__(self, db: Session):
+        super().__init__(db)
+
+    def get_mapping_by_cache_key(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        record = self.get_one(ColumnMapping, {"cache_key": cache_key})
+        if record is None:
+            return None
+        return record.mapping
+
+    def upsert_mapping(self, cache_key: str, schema_uuid: Optional[str], mapping: Dict[str, Any]):
+        schema_uuid = uuid.UUID(str(schema_uuid)) if schema_uuid is not None else None
+        data = [{"cache_key": cache_key, "schema_uuid": schema_uuid, "mapping": mapping}]
+        self.bulk_upsert_records(ColumnMapping, data, conflict_cols=["cache_key"], update_cols=["schema_uuid", "mapping"])
+
+    def delete_mappings_by_schema_uuid(self, schema_uuid: str) -> int:
+        return self.delete(ColumnMapping, filters={"schema_uuid": uuid.UUID(str(schema_uuid))})
+
+
+class AsyncColumnMappingDAO(AsyncBaseDAO):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+
+    async def delete_mappings_by_schema_uuid(self, schema_uuid: str) -> int:
+        return await self.delete(ColumnMapping, filters={"schema_uuid": uuid.UUID(str(schema_uuid))})
+
+    async def delete_mappings_by_schema_uuids(self, schema_uuids: List[str]) -> int:
+        result = await self.db.execute(
+            delete(ColumnMapping).where(ColumnMapping.schema_uuid.in_([uuid.UUID(str(schema_uuid)) for schema_uuid in schema_uuids]))
+        )
+        await self.db.commit()
+        return result.rowcount
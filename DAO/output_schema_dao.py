@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional, Union
-from models.output_schema import OutputSchema
+from sqlalchemy import Column, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Union, Tuple, AsyncIterator
+from models.output_schema import OutputSchema, schema_keys
 from DAO.base_dao import BaseDAO
+from DAO.async_base_dao import AsyncBaseDAO
 
 
 class OutputSchemaDAO(BaseDAO):
@@ -23,12 +28,95 @@ class OutputSchemaDAO(BaseDAO):
             json_schemas.append(schema.to_dict())
         return json_schemas
 
+    def get_output_schemas_by_schema_uuids(self, user_uuid: str, schema_uuids: List[str]) -> List[Dict[str, Any]]:
+        """The user's schemas among schema_uuids, in one IN query, without loading the other rows."""
+        rows = (
+            self.db.query(OutputSchema.schema_uuid, OutputSchema.schema_version, OutputSchema.schema)
+            .filter(OutputSchema.user_uuid == user_uuid, OutputSchema.schema_uuid.in_(schema_uuids))
+            .all()
+        )
+        return [
+            {"schema_uuid": str(row.schema_uuid), "schema_version": row.schema_version, "schema": row.schema}
+            for row in rows
+        ]
+
+    def get_schema_versions(self, user_uuid: str, schema_uuids: List[str]) -> Dict[str, int]:
+        """Current version stamp of each of the user's schemas among schema_uuids."""
+        rows = (
+            self.db.query(OutputSchema.schema_uuid, OutputSchema.schema_version)
+            .filter(OutputSchema.user_uuid == user_uuid, OutputSchema.schema_uuid.in_(schema_uuids))
+            .all()
+        )
+        return {str(row.schema_uuid): row.schema_version for row in rows}
+
     def get_output_schema_by_schema_uuid(self, schema_uuid: str) -> Optional[OutputSchema]:
         return self.get_one(OutputSchema, {"schema_uuid": schema_uuid})
 
     def update_output_schema_by_schema_uuid(self, schema_uuid: str, schema_details: Dict[str, Any]) -> Optional[OutputSchema]:
-        return self.update(OutputSchema, filters={"schema_uuid": schema_uuid}, update_data=schema_details)
+        # Every write bumps the version stamp, which invalidates cached copies in every worker
+        update_data = {**schema_details, "schema_version": OutputSchema.schema_version + 1}
+        return self.update(OutputSchema, filters={"schema_uuid": schema_uuid}, update_data=update_data)
 
 
     def delete_schema_by_schema_uuid(self, schema_uuid: str) -> Optional[OutputSchema]:
         return self.delete(OutputSchema, filters={"schema_uuid": schema_uuid})
+
+
+class AsyncOutputSchemaDAO(AsyncBaseDAO):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+
+    async def create_output_schema(self, user_uuid: str, schema_details: Dict[str, Any]) -> OutputSchema:
+        output_schema = {
+            "user_uuid": user_uuid,
+            "schema_name": schema_details["schema_name"],
+            "schema": schema_details["schema"],
+        }
+        return await self.insert(OutputSchema, output_schema)
+
+    async def get_output_schemas_page(self, user_uuid: str, columns: List[Column], after: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self.get_page(
+            columns, key=OutputSchema.__table__.c.schema_uuid, filters={"user_uuid": user_uuid}, after=after, limit=limit
+        )
+
+    async def search_output_schemas_page(self, column_name: str, columns: List[Column], user_uuid: Optional[str] = None, after: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Schemas that have column_name among their output columns, answered from the GIN index on their keys."""
+        return await self.get_page(
+            columns, key=OutputSchema.__table__.c.schema_uuid, filters={"user_uuid": user_uuid} if user_uuid else {},
+            after=after, limit=limit, conditions=[schema_keys.has_key(column_name)]
+        )
+
+    async def bulk_import_output_schemas(self, record_chunks: AsyncIterator[List[Tuple]]) -> Tuple[int, List[Tuple[Any, bool]]]:
+        """
+        Load (seq, schema_uuid, schema_name, user_uuid, schema) records through COPY and merge them on
+        (user_uuid, schema_uuid). Updates bump schema_version; a schema_uuid that already belongs to
+        another user is left out.
+        """
+        excluded = pg_insert(OutputSchema).excluded
+        other_owner = aliased(OutputSchema)
+        return await self.copy_upsert(
+            OutputSchema,
+            staging_columns={"schema_uuid": "uuid", "schema_name": "text", "user_uuid": "uuid", "schema": "json"},
+            key_col="schema_uuid",
+            conflict_cols=["user_uuid", "schema_uuid"],
+            record_chunks=record_chunks,
+            update_set={
+                "schema_name": excluded.schema_name,
+                "schema": excluded.schema,
+                "schema_version": OutputSchema.schema_version + 1,
+            },
+            source_where=lambda staging: ~exists().where(
+                other_owner.schema_uuid == staging.c.schema_uuid, other_owner.user_uuid != staging.c.user_uuid
+            ),
+        )
+
+    async def get_output_schema_by_schema_uuid(self, schema_uuid: str) -> Optional[OutputSchema]:
+        return await self.get_one(OutputSchema, {"schema_uuid": schema_uuid})
+
+    async def update_output_schema_by_schema_uuid(self, schema_uuid: str, schema_details: Dict[str, Any]) -> int:
+        # Every write bumps the version stamp, which invalidates cached copies in every worker
+        update_data = {**schema_details, "schema_version": OutputSchema.schema_version + 1}
+        return await self.update(OutputSchema, filters={"schema_uuid": schema_uuid}, update_data=update_data)
+
+    async def delete_schema_by_schema_uuid(self, schema_uuid: str) -> int:
+        return await self.delete(OutputSchema, filters={"schema_uuid": schema_uuid})
@@ -0,0 +1,48 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from models.sync_job import SyncJob
+from DAO.base_dao import BaseDAO
+from DAO.async_base_dao import AsyncBaseDAO
+import uuid
+
+
+def _new_job(job_uuid: str, user_uuid: Optional[str], progress: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_uuid": uuid.UUID(str(job_uuid)),
+        "user_uuid": uuid.UUID(str(user_uuid)) if user_uuid is not None else None,
+        "status": "queued",
+        "progress": progress,
+    }
+
+
+class SyncJobDAO(BaseDAO):
+    def __init__(self, db: Session):
+        super().__init__(db)
+
+    def create_job(self, job_uuid: str, user_uuid: Optional[str], progress: Dict[str, Any]) -> SyncJob:
+        return self.insert(SyncJob, _new_job(job_uuid, user_uuid, progress))
+
+    def get_job_by_uuid(self, job_uuid: str) -> Optional[SyncJob]:
+        return self.get_one(SyncJob, {"job_uuid": uuid.UUID(str(job_uuid))})
+
+    def update_job(self, job_uuid: str, update_data: Dict[str, Any]) -> int:
+        return self.update(SyncJob, {"job_uuid": uuid.UUID(str(job_uuid))}, update_data)
+
+    def get_expired_jobs(self, now: datetime) -> List[SyncJob]:
+        return self.db.query(SyncJob).filter(SyncJob.expires_at < now, SyncJob.status != "expired").all()
+
+    def get_stale_jobs(self, updated_before: datetime) -> List[SyncJob]:
+        return self.db.query(SyncJob).filter(SyncJob.status.in_(("queued", "running")), SyncJob.updated_at < updated_before).all()
+
+
+class AsyncSyncJobDAO(AsyncBaseDAO):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+
+    async def create_job(self, job_uuid: str, user_uuid: Optional[str], progress: Dict[str, Any]) -> SyncJob:
+        return await self.insert(SyncJob, _new_job(job_uuid, user_uuid, progress))
+
+    async def get_job_by_uuid(self, job_uuid: str) -> Optional[SyncJob]:
+        return await self.get_one(SyncJob, {"job_uuid": uuid.UUID(str(job_uuid))})
@@ -1,7 +1,11 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from sqlalchemy import Column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from models.user import User
 from DAO.base_dao import BaseDAO
+from DAO.async_base_dao import AsyncBaseDAO
 import uuid
 
 class UserDAO(BaseDAO):
@@ -22,3 +26,42 @@ class UserDAO(BaseDAO):
 
     def update_user_by_uuid(self, user_uuid: uuid.UUID, update_data: Dict[str, Any]) -> int:
         return self.update(User, {"user_uuid": user_uuid}, update_data)
+
+
+class AsyncUserDAO(AsyncBaseDAO):
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+
+    async def get_users_page(self, columns: List[Column], after: Optional[uuid.UUID] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self.get_page(columns, key=User.__table__.c.user_uuid, filters={}, after=after, limit=limit)
+
+    async def create_user(self, user_data: Dict[str, Any]) -> User:
+        return await self.insert(User, user_data)
+
+    async def bulk_import_users(self, record_chunks: AsyncIterator[List[Tuple]]) -> Tuple[int, List[Tuple[Any, bool]]]:
+        """Load (seq, user_uuid, user_email, user_password, user_firstname, user_lastname) records through COPY and merge them on user_email."""
+        excluded = pg_insert(User).excluded
+        return await self.copy_upsert(
+            User,
+            staging_columns={
+                "user_uuid": "uuid", "user_email": "text", "user_password": "text",
+                "user_firstname": "text", "user_lastname": "text",
+            },
+            key_col="user_email",
+            conflict_cols=["user_email"],
+            record_chunks=record_chunks,
+            update_set={
+                "user_password": excluded.user_password,
+                "user_firstname": excluded.user_firstname,
+                "user_lastname": excluded.user_lastname,
+            },
+        )
+
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        return await self.get_one(User, {"user_email": email})
+
+    async def get_user_by_uuid(self, user_uuid: uuid.UUID) -> Optional[User]:
+        return await self.get_one(User, {"user_uuid": user_uuid})
+
+    async def update_user_by_uuid(self, user_uuid: uuid.UUID, update_data: Dict[str, Any]) -> int:
+        return await self.update(User, {"user_uuid": user_uuid}, update_data)
@@ -15,6 +15,8 @@ from config.logger import logger
 # Explicitly import models to ensure they are registered with Base
 from models.output_schema import OutputSchema
 from models.user import User
+from models.column_mapping import ColumnMapping
+from models.sync_job import SyncJob
 
 target_metadata = Base.metadata
 
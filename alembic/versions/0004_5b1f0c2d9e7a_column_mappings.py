@@ -0,0 +1,37 @@
+"""column mappings
+
+Revision ID: 0004_5b1f0c2d9e7a
+Revises: 0003_64c2209e1fbc
+Create Date: 2026-10-17 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_5b1f0c2d9e7a'
+down_revision: Union[str, None] = '0003_64c2209e1fbc'
+
+
+def upgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Upgrade schema."""
+    op.create_table('column_mappings',
+    sa.Column('cache_key', sa.String(), nullable=False),
+    sa.Column('schema_uuid', sa.UUID(), nullable=True),
+    sa.Column('mapping', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('cache_key'),
+    schema=schema
+    )
+    op.create_index(op.f('ix_column_mappings_schema_uuid'), 'column_mappings', ['schema_uuid'], unique=False, schema=schema)
+
+
+def downgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_column_mappings_schema_uuid'), table_name='column_mappings', schema=schema)
+    op.drop_table('column_mappings', schema=schema)
@@ -0,0 +1,46 @@
+"""sync jobs
+
+Revision ID: 0005_9d3e6a1c4b2f
+Revises: 0004_5b1f0c2d9e7a
+Create Date: 2026-10-17 12:41:08.518734
+
+"""
+from typing import Sequence, Union
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_9d3e6a1c4b2f'
+down_revision: Union[str, None] = '0004_5b1f0c2d9e7a'
+
+
+def upgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Upgrade schema."""
+    op.create_table('sync_jobs',
+    sa.Column('job_uuid', sa.UUID(), nullable=False),
+    sa.Column('user_uuid', sa.UUID(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('progress', sa.JSON(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('result_path', sa.String(), nullable=True),
+    sa.Column('result_filename', sa.String(), nullable=True),
+    sa.Column('result_media_type', sa.String(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('job_uuid'),
+    schema=schema
+    )
+    op.create_index(op.f('ix_sync_jobs_user_uuid'), 'sync_jobs', ['user_uuid'], unique=False, schema=schema)
+    op.create_index(op.f('ix_sync_jobs_expires_at'), 'sync_jobs', ['expires_at'], unique=False, schema=schema)
+
+
+def downgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sync_jobs_expires_at'), table_name='sync_jobs', schema=schema)
+    op.drop_index(op.f('ix_sync_jobs_user_uuid'), table_name='sync_jobs', schema=schema)
+    op.drop_table('sync_jobs', schema=schema)
@@ -0,0 +1,28 @@
+"""output schema version
+
+Revision ID: 0006_3c8f1e7a2d5b
+Revises: 0005_9d3e6a1c4b2f
+Create Date: 2026-10-17 13:02:44.190355
+
+"""
+from typing import Sequence, Union
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_3c8f1e7a2d5b'
+down_revision: Union[str, None] = '0005_9d3e6a1c4b2f'
+
+
+def upgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Upgrade schema."""
+    op.add_column('output_schemas', sa.Column('schema_version', sa.Integer(), server_default='1', nullable=False), schema=schema)
+
+
+def downgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Downgrade schema."""
+    op.drop_column('output_schemas', 'schema_version', schema=schema)
@@ -0,0 +1,32 @@
+"""output schema indexes
+
+Revision ID: 0007_7a4d2b9e1c6f
+Revises: 0006_3c8f1e7a2d5b
+Create Date: 2026-10-17 14:05:12.307146
+
+"""
+from typing import Sequence, Union
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_7a4d2b9e1c6f'
+down_revision: Union[str, None] = '0006_3c8f1e7a2d5b'
+
+
+def upgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Upgrade schema."""
+    # The primary key is (user_uuid, schema_uuid), so lookups by schema_uuid alone need their own index
+    op.create_index(op.f('ix_output_schemas_schema_uuid'), 'output_schemas', ['schema_uuid'], unique=False, schema=schema)
+    # Top-level keys (the output columns) for GET /schema/search; `schema` stays JSON to keep its key order
+    op.create_index('ix_output_schemas_schema_keys', 'output_schemas', [sa.text('(schema::jsonb)')], unique=False, schema=schema, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    schema = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema")
+    """Downgrade schema."""
+    op.drop_index('ix_output_schemas_schema_keys', table_name='output_schemas', schema=schema)
+    op.drop_index(op.f('ix_output_schemas_schema_uuid'), table_name='output_schemas', schema=schema)
@@ -0,0 +1,84 @@
+"""
+Rows per second loading output schemas: ORM objects through add_all (BaseDAO.bulk_insert_records)
+vs. POST /schema/bulk (COPY into a staging table, then one INSERT ... ON CONFLICT).
+
+Runs in-process against the database configured in the environment and deletes what it wrote.
+
+    python benchmarks/bulk_import.py --rows 50000 --columns 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _schema(columns):
+    return {f"column_{i}": "string" for i in range(columns)}
+
+
+async def _add_all(rows, columns):
+    from config.database import AsyncSessionLocal
+    from DAO.async_base_dao import AsyncBaseDAO
+    from models.output_schema import OutputSchema
+
+    user_uuid = uuid.uuid4()
+    data = [{"user_uuid": user_uuid, "schema_name": f"schema_{i}", "schema": _schema(columns)} for i in range(rows)]
+    async with AsyncSessionLocal() as session:
+        start = time.perf_counter()
+        await AsyncBaseDAO(session).bulk_insert_records(OutputSchema, data)
+        elapsed = time.perf_counter() - start
+        await AsyncBaseDAO(session).delete(OutputSchema, {"user_uuid": user_uuid})
+    return elapsed
+
+
+async def _copy(app, rows, columns):
+    import httpx
+    from config.database import AsyncSessionLocal
+    from DAO.async_base_dao import AsyncBaseDAO
+    from models.output_schema import OutputSchema
+
+    user_uuid = str(uuid.uuid4())
+    body = "\n".join(
+        json.dumps({"user_uuid": user_uuid, "schema_name": f"schema_{i}", "schema": _schema(columns)}) for i in range(rows)
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/schema/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+        elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    async with AsyncSessionLocal() as session:
+        await AsyncBaseDAO(session).delete(OutputSchema, {"user_uuid": uuid.UUID(user_uuid)})
+    return elapsed
+
+
+def main():
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--columns", type=int, default=10)
+    args = parser.parse_args()
+
+    import main as app_module
+    from config.database import async_engine
+
+    async def run():
+        add_all_seconds = await _add_all(args.rows, args.columns)
+        copy_seconds = await _copy(app_module.app, args.rows, args.columns)
+        await async_engine.dispose()
+        return add_all_seconds, copy_seconds
+
+    add_all_seconds, copy_seconds = asyncio.run(run())
+    print(f"{args.rows} schemas of {args.columns} columns")
+    print(f"      add_all: {add_all_seconds:.2f}s, {args.rows / add_all_seconds:.0f} rows/s")
+    print(f"  COPY + merge: {copy_seconds:.2f}s, {args.rows / copy_seconds:.0f} rows/s (request parsing included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Requests one worker serves concurrently on a DB-bound route: the synchronous session on the event
+loop (the previous routers) vs. the AsyncSession routers.
+
+Both run GET /schema/{schema_uuid} in-process, on one event loop, against the database configured
+in the environment. A local proxy in front of it adds --rtt-ms per round trip, since a database on
+localhost hides what blocking the loop costs against a real network. Loop lag is how late a 10 ms
+timer fires while the load runs.
+
+Keep --concurrency within the sync engine's pool, DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW: past it
+the synchronous variant waits for a pooled connection on the loop thread, which is the only thread
+that can give one back, and stalls for DB_POOL_TIMEOUT.
+
+    python benchmarks/db_concurrency.py --concurrency 25 --seconds 5 --rtt-ms 2
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def _pipe(reader, writer, delay):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            await asyncio.sleep(delay)
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def _run_proxy(listen_socket, target_host, target_port, delay):
+    """Forward connections to the database, delaying every chunk by half the round trip each way."""
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        await asyncio.gather(_pipe(client_reader, server_writer, delay), _pipe(server_reader, client_writer, delay))
+
+    async def serve():
+        server = await asyncio.start_server(handle, sock=listen_socket)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def _blocking_app():
+    """The previous router shape: the synchronous DAO called straight from an async endpoint."""
+    from fastapi import FastAPI, Depends
+    from fastapi.responses import JSONResponse
+    from sqlalchemy.orm import Session
+    from config.database import get_db
+    from DAO.output_schema_dao import OutputSchemaDAO
+
+    app = FastAPI()
+
+    @app.get("/schema/{schema_uuid}")
+    async def get_schema(schema_uuid: str, session: Session = Depends(get_db)):
+        output_schema = OutputSchemaDAO(session).get_output_schema_by_schema_uuid(schema_uuid=schema_uuid)
+        return JSONResponse(content={"output_schema": output_schema.to_dict()})
+
+    return app
+
+
+def _seed_schema():
+    from config.database import SessionLocal
+    from DAO.output_schema_dao import OutputSchemaDAO
+    session = SessionLocal()
+    try:
+        schema = {f"column_{i}": "string" for i in range(20)}
+        output_schema = OutputSchemaDAO(session).create_output_schema(
+            user_uuid=str(uuid.uuid4()), schema_details={"schema_name": "benchmark", "schema": schema}
+        )
+        return str(output_schema.schema_uuid)
+    finally:
+        session.close()
+
+
+def _drop_schema(schema_uuid):
+    from config.database import SessionLocal
+    from DAO.output_schema_dao import OutputSchemaDAO
+    session = SessionLocal()
+    try:
+        OutputSchemaDAO(session).delete_schema_by_schema_uuid(schema_uuid=schema_uuid)
+    finally:
+        session.close()
+
+
+async def _load(app, path, concurrency, seconds):
+    import httpx
+
+    latencies = []
+    lags = []
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(client):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async def lag_probe():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # One warm-up request fills the pool's first connection
+        await client.get(path)
+        started = time.perf_counter()
+        await asyncio.gather(lag_probe(), *(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0,
+        "max_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+def main():
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    from config import setting
+    listen_socket = socket.socket()
+    listen_socket.bind(("127.0.0.1", 0))
+    listen_socket.listen(512)
+    proxy = multiprocessing.get_context("spawn").Process(
+        target=_run_proxy, args=(listen_socket, setting.DB_HOST, int(setting.DB_PORT), args.rtt_ms / 2000), daemon=True
+    )
+    proxy.start()
+    # config.database reads the port when it is first imported, which happens below
+    setting.DB_HOST, setting.DB_PORT = listen_socket.getsockname()
+
+    import main as app_module
+    from config.database import async_engine, engine
+
+    schema_uuid = _seed_schema()
+    path = f"/schema/{schema_uuid}"
+    print(f"{args.concurrency} concurrent clients for {args.seconds}s, +{args.rtt_ms} ms per DB round trip, "
+          f"sync pool {setting.DB_SYNC_POOL_SIZE}+{setting.DB_SYNC_MAX_OVERFLOW} of {setting.DB_POOL_SIZE}+{setting.DB_MAX_OVERFLOW}")
+
+    async def run():
+        for name, app in (("sync session", _blocking_app()), ("async session", app_module.app)):
+            result = await _load(app, path, args.concurrency, args.seconds)
+            print(f"{name:>14}: {result['requests']} requests, {result['rps']:.0f} req/s, "
+                  f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, max loop lag {result['max_lag_ms']:.1f} ms")
+        # asyncpg connections belong to this loop and are closed before it is
+        await async_engine.dispose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        _drop_schema(schema_uuid)
+        engine.dispose()
+        proxy.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Wall time and peak memory of the CSV sync path with SYNC_PARSE_ENGINE=c (pandas' parser, NumPy
+object strings) vs. SYNC_PARSE_ENGINE=pyarrow (multithreaded Arrow reader, Arrow-backed columns),
+on a string-heavy vendor file: parse and transform, then serialize as CSV and as Parquet.
+
+Each engine runs in a fresh process. As in upload_memory.py, peak RSS includes the memory-mapped
+upload pages the C engine reads through, so the anonymous (heap) peak is reported as well.
+
+    python benchmarks/parse_engine.py --mb 100
+    python benchmarks/parse_engine.py --mb 1000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from upload_memory import _AnonPeakSampler, _rss_anon_kb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNS = [
+    "order_id", "sku", "product_name", "vendor_name", "vendor_email", "city",
+    "country", "status", "quantity", "unit_price", "order_date", "notes",
+]
+# The output schema keeps 8 of the 12 columns
+MAPPED = [0, 1, 2, 3, 5, 8, 9, 10]
+
+
+def _vendor_frame(rng, start, rows):
+    words = np.array(["steel", "bracket", "valve", "copper", "fitting", "panel", "cable", "sensor", "bolt", "pump"])
+    cities = np.array(["Pune", "Leeds", "Osaka", "Lyon", "Austin", "Porto", "Gdansk", "Cebu"])
+
+    def pick(values):
+        return values[rng.integers(0, len(values), rows)]
+
+    vendor = np.char.add("Vendor ", rng.integers(0, 5000, rows).astype(str))
+    return pd.DataFrame({
+        "order_id": np.arange(start, start + rows),
+        "sku": np.char.add("SKU-", rng.integers(0, 10 ** 8, rows).astype(str)),
+        "product_name": np.char.add(np.char.add(pick(words), " "), pick(words)),
+        "vendor_name": vendor,
+        "vendor_email": np.char.add(np.char.replace(np.char.lower(vendor), " ", "."), "@example.com"),
+        "city": pick(cities),
+        "country": pick(np.array(["IN", "GB", "JP", "FR", "US", "PT", "PL", "PH"])),
+        "status": pick(np.array(["open", "shipped", "cancelled", "returned"])),
+        "quantity": rng.integers(1, 500, rows),
+        "unit_price": rng.integers(100, 10 ** 6, rows) / 100,
+        "order_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "notes": np.where(rng.random(rows) < 0.7, "", np.char.add("Deliver to dock ", rng.integers(1, 40, rows).astype(str))),
+    })
+
+
+def _write_csv(path, target_mb):
+    rng = np.random.default_rng(0)
+    rows, chunk_rows = 0, 200000
+    while os.path.exists(path) is False or os.path.getsize(path) < target_mb * 1024 ** 2:
+        _vendor_frame(rng, rows, chunk_rows).to_csv(path, mode="a", header=rows == 0, index=False)
+        rows += chunk_rows
+    return rows
+
+
+def _measure(engine, path, queue):
+    os.environ["SYNC_PARSE_ENGINE"] = engine
+    from handlers.sync_handlers.sync_handler_csv import _read_and_transform
+    from handlers.sync_handlers.sync_output_writer import iter_csv_bytes, iter_frame_chunks
+    from handlers.sync_handlers.columnar_output import iter_columnar_bytes
+    from config import setting
+
+    mapping_result = {"reordered_columns": MAPPED, "error": False}
+    output_schema = {f"out_{COLUMNS[index]}": "" for index in MAPPED}
+    baseline = _rss_anon_kb()
+    sampler = _AnonPeakSampler()
+    sampler.start()
+    start = time.perf_counter()
+    processed_file, *_ = _read_and_transform(path, mapping_result, output_schema)
+    parsed = time.perf_counter()
+    parse_anon_peak, parse_anon_held = sampler.peak, _rss_anon_kb()
+    frame_mb = processed_file.memory_usage(deep=True).sum() / 1024 ** 2
+    csv_bytes = sum(len(chunk) for chunk in iter_csv_bytes(iter_frame_chunks(processed_file, setting.SYNC_STREAM_CHUNK_ROWS)))
+    csv_written = time.perf_counter()
+    parquet_bytes = sum(len(chunk) for chunk in iter_columnar_bytes([processed_file], "parquet", setting.SYNC_PARQUET_COMPRESSION))
+    parquet_written = time.perf_counter()
+    anon_peak = sampler.stop()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "engine": engine, "parse_s": parsed - start, "csv_s": csv_written - parsed, "parquet_s": parquet_written - csv_written,
+        "frame_mb": frame_mb, "csv_mb": csv_bytes / 1024 ** 2, "parquet_mb": parquet_bytes / 1024 ** 2,
+        "peak": peak, "baseline": baseline, "parse_anon_peak": parse_anon_peak,
+        "parse_anon_held": parse_anon_held, "anon_peak": anon_peak,
+    })
+
+
+def main():
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=100, help="approximate input size")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    os.unlink(path)
+    try:
+        rows = _write_csv(path, args.mb)
+        print(f"input: {rows} rows x {len(COLUMNS)} columns, {os.path.getsize(path) / 1024 ** 2:.1f} MB, {len(MAPPED)} mapped")
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        for engine in ("c", "pyarrow"):
+            process = context.Process(target=_measure, args=(engine, path, queue))
+            process.start()
+            process.join()
+            result = queue.get()
+            # ru_maxrss and /proc/self/status are in KiB on Linux
+            print(
+                f"{result['engine']:>8}: parse+transform {result['parse_s']:.2f}s, frame {result['frame_mb']:.0f} MB | "
+                f"csv {result['csv_s']:.2f}s ({result['csv_mb']:.0f} MB) | parquet {result['parquet_s']:.2f}s ({result['parquet_mb']:.0f} MB)"
+            )
+            line = f"{'':>8}  peak RSS {result['peak'] / 1024:.0f} MB"
+            if result["anon_peak"] is not None:
+                baseline = result["baseline"]
+                line += (
+                    f", heap +{(result['parse_anon_peak'] - baseline) / 1024:.0f} MB peak / "
+                    f"+{(result['parse_anon_held'] - baseline) / 1024:.0f} MB held after parse, "
+                    f"+{(result['anon_peak'] - baseline) / 1024:.0f} MB overall"
+                )
+            print(line)
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
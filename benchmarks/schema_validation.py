@@ -0,0 +1,90 @@
+"""
+Cost of validating a CSV against its output schema's column specs, next to the parse it follows,
+for SYNC_PARSE_ENGINE=c and SYNC_PARSE_ENGINE=pyarrow.
+
+The schema types 8 vendor columns (int, float, date with a format, an enum and a regex among them).
+Every row passes in the first run; in the second the status enum leaves out one of its four
+values, so about a quarter of the rows are rejected with their reasons.
+
+    python benchmarks/schema_validation.py --mb 100
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from parse_engine import _write_csv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNS = ["order_id", "sku", "product_name", "vendor_name", "city", "status", "quantity", "unit_price", "order_date"]
+MAPPED = [0, 1, 2, 3, 5, 7, 8, 9, 10]
+SPECS = {
+    "order_id": {"type": "int", "nullable": False},
+    "sku": {"regex": r"SKU-\d+"},
+    "product_name": "",
+    "vendor_name": {"nullable": False},
+    "city": {"enum": ["Pune", "Leeds", "Osaka", "Lyon", "Austin", "Porto", "Gdansk", "Cebu"]},
+    "status": {"enum": ["open", "shipped", "cancelled", "returned"]},
+    "quantity": {"type": "int"},
+    "unit_price": {"type": "float"},
+    "order_date": {"type": "date", "format": "%Y-%m-%d"},
+}
+
+
+def _measure(engine, path, queue):
+    os.environ["SYNC_PARSE_ENGINE"] = engine
+    from handlers.sync_handlers.sync_handler_csv import _read_and_transform
+    from handlers.sync_handlers.schema_validation import column_specs, validate_frame
+
+    mapping_result = {"reordered_columns": MAPPED, "error": False}
+    start = time.perf_counter()
+    processed_file, *_ = _read_and_transform(path, mapping_result, {name: "" for name in COLUMNS})
+    parse_s = time.perf_counter() - start
+
+    results = {"engine": engine, "rows": len(processed_file), "parse_s": parse_s}
+    for label, schema in (("valid", SPECS), ("rejects", {**SPECS, "status": {"enum": ["open", "shipped", "cancelled"]}})):
+        specs = column_specs(schema)
+        # Pool workers are long-lived, so the first call's one-off setup (kernel lookup, regex compile) is left out
+        validate_frame(processed_file.iloc[:1000], specs)
+        start = time.perf_counter()
+        _, rejects, _ = validate_frame(processed_file, specs)
+        results[label] = (time.perf_counter() - start, 0 if rejects is None else len(rejects))
+    queue.put(results)
+
+
+def main():
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=100, help="approximate input size")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    os.unlink(path)
+    try:
+        rows = _write_csv(path, args.mb)
+        print(f"input: {rows} rows, {os.path.getsize(path) / 1024 ** 2:.1f} MB, {len(MAPPED)} mapped columns")
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        for engine in ("c", "pyarrow"):
+            process = context.Process(target=_measure, args=(engine, path, queue))
+            process.start()
+            process.join()
+            result = queue.get()
+            line = f"{result['engine']:>8}: parse+transform {result['parse_s']:.2f}s"
+            for label in ("valid", "rejects"):
+                seconds, rejected = result[label]
+                line += f" | validate, {rejected} rejected: {seconds:.2f}s ({seconds / result['parse_s']:.0%} of parse)"
+            print(line)
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Time to turn 10k output schema rows into a JSON response body, in-process and without a database:
+
+- reflective to_dict on ORM objects + stdlib JSONResponse (the previous routers)
+- compiled ModelSerializer on ORM objects + the app's orjson response
+- Core row tuples (rows_to_dicts, as AsyncBaseDAO.get_page returns them) + the app's orjson response
+
+    python benchmarks/serialization.py --rows 10000 --columns 10
+"""
+import argparse
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _reflective_to_dict(obj):
+    """The to_dict every model had before ModelSerializer."""
+    return {
+        column.name: str(getattr(obj, column.name)) if isinstance(getattr(obj, column.name), uuid.UUID)
+        else getattr(obj, column.name)
+        for column in obj.__table__.columns
+    }
+
+
+class _CoreResult:
+    """Stands in for a Core result: column names plus plain row tuples."""
+
+    def __init__(self, names, rows):
+        self._names = names
+        self._rows = rows
+
+    def keys(self):
+        return self._names
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+def main():
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from fastapi.responses import JSONResponse
+    from models.output_schema import OutputSchema
+    from models.serialization import rows_to_dicts
+    from router.responses import ORJSONResponse
+
+    user_uuid = uuid.uuid4()
+    objects = [
+        OutputSchema(
+            schema_uuid=uuid.uuid4(), user_uuid=user_uuid, schema_name=f"schema_{i}", schema_version=1,
+            schema={f"column_{j}": "string" for j in range(args.columns)},
+        )
+        for i in range(args.rows)
+    ]
+    names = OutputSchema.serializer.names
+    rows = [tuple(getattr(obj, name) for name in names) for obj in objects]
+
+    cases = {
+        "to_dict + JSONResponse": lambda: JSONResponse(content={"output_schemas": [_reflective_to_dict(obj) for obj in objects]}),
+        "ModelSerializer + orjson": lambda: ORJSONResponse(content={"output_schemas": [OutputSchema.serializer.from_object(obj) for obj in objects]}),
+        "Core rows + orjson": lambda: ORJSONResponse(content={"output_schemas": rows_to_dicts(_CoreResult(names, rows))}),
+    }
+    print(f"{args.rows} rows, {args.columns} schema columns each, best of {args.repeat}")
+    baseline = None
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        print(f"{name:>26}: {seconds * 1000:7.1f} ms  ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
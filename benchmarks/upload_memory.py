@@ -0,0 +1,138 @@
+"""
+Peak memory of the CSV sync parse: raw upload bytes on the heap vs. the spooled, memory-mapped path.
+
+Each mode runs in a fresh process. Peak RSS counts the memory-mapped file pages too, which are
+reclaimable page cache; the anonymous (heap) peak is sampled from /proc/self/status on Linux.
+
+    python benchmarks/upload_memory.py --rows 2000000 --columns 12
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _write_csv(path, rows, columns):
+    rng = np.random.default_rng(0)
+    chunk_rows = 200000
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        df = pd.DataFrame({f"col_{i}": rng.integers(0, 1_000_000, n) for i in range(columns)})
+        df.to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def _mapping(columns, mapped):
+    # Keep every other column, as a typical output schema drops some of the input
+    return {"reordered_columns": list(range(0, columns, 2))[:mapped], "error": False}
+
+
+def _run_bytes(path, mapping_result, output_schema):
+    """The previous behaviour: the whole upload read into memory, then parsed through BytesIO."""
+    import io
+    from handlers.sync_handlers.sync_handler_csv import SyncHandlerCSV
+    from handlers.sync_handlers.column_pruning import prune_mapping
+    with open(path, "rb") as upload:
+        contents = upload.read()
+    usecols, pruned_mapping = prune_mapping(mapping_result)
+    df = pd.read_csv(io.BytesIO(contents), usecols=usecols)
+    return len(SyncHandlerCSV._create_output_dataframe(df=df, mapping_result=pruned_mapping, output_schema=output_schema))
+
+
+def _run_spooled(path, mapping_result, output_schema):
+    """The spooled upload parsed by path with memory_map, as the sync handler does now."""
+    from handlers.sync_handlers.sync_handler_csv import _read_and_transform
+    processed_file, *_ = _read_and_transform(path, mapping_result, output_schema)
+    return len(processed_file)
+
+
+def _rss_anon_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class _AnonPeakSampler(threading.Thread):
+    def __init__(self, interval=0.002):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _rss_anon_kb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            current = _rss_anon_kb()
+            if current is not None and current > self.peak:
+                self.peak = current
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def _measure(mode, path, mapping_result, output_schema, queue):
+    from handlers.sync_handlers import sync_handler_csv  # noqa: F401  imported before the baseline
+    baseline = _rss_anon_kb()
+    sampler = _AnonPeakSampler()
+    sampler.start()
+    start = time.perf_counter()
+    rows = (_run_bytes if mode == "bytes" else _run_spooled)(path, mapping_result, output_schema)
+    elapsed = time.perf_counter() - start
+    anon_peak = sampler.stop()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((mode, rows, elapsed, peak, baseline, anon_peak))
+
+
+def main():
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--columns", type=int, default=12)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    os.unlink(path)
+    try:
+        _write_csv(path, args.rows, args.columns)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        mapped = (args.columns + 1) // 2
+        mapping_result = _mapping(args.columns, mapped)
+        output_schema = {f"out_{i}": "" for i in range(mapped)}
+        print(f"input: {args.rows} rows x {args.columns} columns, {size_mb:.1f} MB")
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        for mode in ("bytes", "spooled"):
+            process = context.Process(target=_measure, args=(mode, path, mapping_result, output_schema, queue))
+            process.start()
+            process.join()
+            mode, rows, elapsed, peak, baseline, anon_peak = queue.get()
+            # ru_maxrss and /proc/self/status are in KiB on Linux
+            line = f"{mode:>8}: {rows} rows in {elapsed:.2f}s, peak RSS {peak / 1024:.1f} MB"
+            if anon_peak is not None:
+                line += f", peak heap +{(anon_peak - baseline) / 1024:.1f} MB"
+            print(line)
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
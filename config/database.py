@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
 from config import setting
@@ -11,6 +12,7 @@ DB_NAME = setting.DB_NAME
 DB_SCHEMA = setting.SCHEMA_SYNC_DB_SCHEMA_NAME
 
 DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Create a custom metadata with schema
 metadata = MetaData(schema=DB_SCHEMA)
@@ -18,20 +20,39 @@ metadata = MetaData(schema=DB_SCHEMA)
 # Create base with the custom metadata
 Base = declarative_base(metadata=metadata)
 
+# Used by the sync pipeline (handlers, caches, job processes); sized to its share of the worker's budget
 engine = create_engine(
     DATABASE_URL,
     poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
-    pool_timeout=30,
-    pool_recycle=1800,
+    pool_size=setting.DB_SYNC_POOL_SIZE,
+    max_overflow=setting.DB_SYNC_MAX_OVERFLOW,
+    pool_timeout=setting.DB_POOL_TIMEOUT,
+    pool_recycle=setting.DB_POOL_RECYCLE,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the routers, so a query waits on the event loop instead of blocking it
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=max(setting.DB_POOL_SIZE - setting.DB_SYNC_POOL_SIZE, 1),
+    max_overflow=max(setting.DB_MAX_OVERFLOW - setting.DB_SYNC_MAX_OVERFLOW, 0),
+    pool_timeout=setting.DB_POOL_TIMEOUT,
+    pool_recycle=setting.DB_POOL_RECYCLE,
+)
+
+# Objects stay readable after commit, as the routers serialize them once the write is done
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
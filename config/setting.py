@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load env vars from .env file
@@ -12,4 +13,71 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres1")
 DB_NAME = os.getenv("DB_NAME", "postgres")
 DB_PORT = os.getenv("DB_PORT", 5432)
 SCHEMA_SYNC_DB_SCHEMA_NAME = os.getenv("SCHEMA_SYNC_DB_SCHEMA_NAME", "schema_sync_schema").lower()
-GROQ_MODEL = os.getenv("GROQ_MODEL", "schema_sync_schema").lower()
\ No newline at end of file
+# Connection pool, per engine and per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# DB_POOL_SIZE and DB_MAX_OVERFLOW bound a worker's connections across both engines: the sync engine
+# (the /sync pipeline) takes this share of them and the routers' async engine the rest
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", DB_POOL_SIZE // 2))
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", DB_MAX_OVERFLOW // 2))
+GROQ_MODEL = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+
+# LLM
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", 20))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 1))
+GROQ_MAX_CONCURRENT_CALLS = int(os.getenv("GROQ_MAX_CONCURRENT_CALLS", 8))
+# One mapping call for all the files of a sync that need the LLM
+LLM_BATCH_MAPPING = os.getenv("LLM_BATCH_MAPPING", "true").lower() == "true"
+LLM_BATCH_MAX_WAIT_MS = int(os.getenv("LLM_BATCH_MAX_WAIT_MS", 2000))
+# Rough budget for one batched prompt, in characters of headers, preview rows and schemas
+LLM_BATCH_MAX_PROMPT_CHARS = int(os.getenv("LLM_BATCH_MAX_PROMPT_CHARS", 24000))
+
+# Sync pipeline
+SYNC_MAX_CONCURRENT_FILES = int(os.getenv("SYNC_MAX_CONCURRENT_FILES", 4))
+SYNC_PROCESS_POOL_WORKERS = int(os.getenv("SYNC_PROCESS_POOL_WORKERS", os.cpu_count() or 1))
+SYNC_STREAM_CHUNK_ROWS = int(os.getenv("SYNC_STREAM_CHUNK_ROWS", 100000))
+SYNC_SPOOL_DIR = os.getenv("SYNC_SPOOL_DIR") or None
+SYNC_ZIP_COMPRESSION_LEVEL = int(os.getenv("SYNC_ZIP_COMPRESSION_LEVEL", 6))
+# "c" (pandas' parser, NumPy dtypes) or "pyarrow" (multithreaded Arrow CSV reader, Arrow-backed dtypes)
+SYNC_PARSE_ENGINE = os.getenv("SYNC_PARSE_ENGINE", "c").lower()
+# Default compression for output_format parquet, and for arrow / feather ("none" writes them uncompressed)
+SYNC_PARQUET_COMPRESSION = os.getenv("SYNC_PARQUET_COMPRESSION", "snappy")
+SYNC_ARROW_COMPRESSION = os.getenv("SYNC_ARROW_COMPRESSION", "lz4")
+
+# Sync jobs (POST /sync/jobs)
+SYNC_JOB_WORKERS = int(os.getenv("SYNC_JOB_WORKERS", 2))
+SYNC_JOB_DIR = os.getenv("SYNC_JOB_DIR") or os.path.join(tempfile.gettempdir(), "schema_sync_jobs")
+SYNC_JOB_RESULT_TTL_SECONDS = int(os.getenv("SYNC_JOB_RESULT_TTL_SECONDS", 86400))
+SYNC_JOB_CLEANUP_INTERVAL_SECONDS = int(os.getenv("SYNC_JOB_CLEANUP_INTERVAL_SECONDS", 600))
+# Queued or running jobs untouched for this long at startup were orphaned by a restart and are marked failed
+SYNC_JOB_STALE_SECONDS = int(os.getenv("SYNC_JOB_STALE_SECONDS", 3600))
+
+# Uploads
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", 1024 ** 3))
+
+# Local column matcher
+COLUMN_MATCH_THRESHOLD = float(os.getenv("COLUMN_MATCH_THRESHOLD", 0.85))
+COLUMN_MATCH_FALLBACK_THRESHOLD = float(os.getenv("COLUMN_MATCH_FALLBACK_THRESHOLD", 0.6))
+EXCEL_HEADER_SCAN_ROWS = int(os.getenv("EXCEL_HEADER_SCAN_ROWS", 50))
+
+# Column mapping cache
+COLUMN_MAPPING_CACHE_SIZE = int(os.getenv("COLUMN_MAPPING_CACHE_SIZE", 1024))
+
+# Output schema cache (per worker, validated against schema_version)
+OUTPUT_SCHEMA_CACHE_SIZE = int(os.getenv("OUTPUT_SCHEMA_CACHE_SIZE", 4096))
+
+# List endpoints (GET /user/, GET /schema/get_all_schemas)
+API_PAGE_DEFAULT_LIMIT = int(os.getenv("API_PAGE_DEFAULT_LIMIT", 100))
+API_PAGE_MAX_LIMIT = int(os.getenv("API_PAGE_MAX_LIMIT", 1000))
+API_NDJSON_CHUNK_ROWS = int(os.getenv("API_NDJSON_CHUNK_ROWS", 1000))
+
+# Bulk imports (POST /schema/bulk, POST /user/bulk)
+BULK_IMPORT_CHUNK_ROWS = int(os.getenv("BULK_IMPORT_CHUNK_ROWS", 10000))
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", 20))
+
+# Staged uploads (POST /files)
+FILE_STORE_DIR = os.getenv("FILE_STORE_DIR") or os.path.join(tempfile.gettempdir(), "schema_sync_files")
+FILE_STORE_TTL_SECONDS = int(os.getenv("FILE_STORE_TTL_SECONDS", 3600))
+FILE_STORE_MAX_BYTES = int(os.getenv("FILE_STORE_MAX_BYTES", 5 * 1024 ** 3))
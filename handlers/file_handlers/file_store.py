@@ -0,0 +1,200 @@
+from datetime import datetime, timezone
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from config import setting
+from config.logger import logger
+from handlers.sync_handlers.excel_loader import read_sheet_names, read_sheet_details
+
+STORE_CHUNK_SIZE = 1024 * 1024
+_FILE_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _describe(path, filename):
+    """Listing reused by /sync: sheet names and header previews for workbooks, the header for CSV."""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return {"columns": [str(column) for column in pd.read_csv(path, nrows=0).columns]}
+    try:
+        return {"sheet_names": read_sheet_names(path), "sheets": read_sheet_details(path)}
+    except (zipfile.BadZipFile, ValueError) as e:
+        logger.error(f"Failed to read sheet listing for staged file {filename}: {e}")
+        return {}
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class PinnedFile(io.BufferedReader):
+    """
+    A staged file read through a private hard link, so evicting the entry cannot remove the bytes
+    while a sync still reads them by path. `listing` is the entry's sheet listing or CSV header.
+    Closing the file removes the link.
+    """
+
+    def __init__(self, path, listing):
+        super().__init__(io.FileIO(path, "rb"))
+        self.listing = listing
+
+    def close(self):
+        path = self.name
+        try:
+            super().close()
+        finally:
+            _unlink(path)
+
+
+class FileStore:
+    """
+    Content-addressed staging area on local disk.
+
+    A file is stored once under the sha256 of its bytes, next to a JSON sidecar with its listing.
+    Entries expire FILE_STORE_TTL_SECONDS after their last use, and the least recently used ones
+    are evicted once the store grows past FILE_STORE_MAX_BYTES.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or setting.FILE_STORE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _data_path(self, file_id):
+        return os.path.join(self.directory, f"{file_id}.data")
+
+    def _metadata_path(self, file_id):
+        return os.path.join(self.directory, f"{file_id}.json")
+
+    async def put(self, file):
+        """Spool an upload into the store in fixed-size chunks, hashing as it goes."""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(prefix="staging_", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                while True:
+                    chunk = await file.read(STORE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    temp_file.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        file_id = hasher.hexdigest()
+        data_path = self._data_path(file_id)
+        metadata = self._read_metadata(file_id)
+        if metadata is not None and os.path.exists(data_path):
+            # Identical bytes are already staged; keep the existing copy and its parsed listing
+            os.unlink(temp_path)
+            os.utime(data_path)
+        else:
+            os.replace(temp_path, data_path)
+            metadata = {
+                "file_id": file_id,
+                "filename": file.filename,
+                "size": size,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                **await run_in_threadpool(_describe, data_path, file.filename),
+            }
+            with open(self._metadata_path(file_id), "w") as metadata_file:
+                json.dump(metadata, metadata_file)
+
+        await run_in_threadpool(self.evict, keep=file_id)
+        return metadata
+
+    def _read_metadata(self, file_id):
+        try:
+            with open(self._metadata_path(file_id)) as metadata_file:
+                return json.load(metadata_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def get(self, file_id):
+        """Return (path, metadata) for a staged file, or None if it is unknown or expired."""
+        if not _FILE_ID.match(file_id or ""):
+            return None
+        data_path = self._data_path(file_id)
+        metadata = self._read_metadata(file_id)
+        try:
+            last_used = os.stat(data_path).st_mtime
+        except FileNotFoundError:
+            return None
+        if metadata is None or time.time() - last_used > setting.FILE_STORE_TTL_SECONDS:
+            return None
+        os.utime(data_path)
+        return data_path, metadata
+
+    def open(self, file_id):
+        """
+        Return a PinnedFile for a staged file, or None if it is unknown, expired or evicted meanwhile.
+        The caller closes it once the sync no longer reads it.
+        """
+        staged_file = self.get(file_id)
+        if staged_file is None:
+            return None
+        data_path, metadata = staged_file
+        # Pins are not .data files, so evict() never sees them; the bytes live until the link is removed
+        pinned_path = tempfile.mktemp(prefix="pinned_", dir=self.directory)
+        try:
+            os.link(data_path, pinned_path)
+        except FileNotFoundError:
+            # Evicted between get() and here
+            return None
+        except OSError:
+            # No hard links on this filesystem; pin a private copy instead
+            try:
+                shutil.copyfile(data_path, pinned_path)
+            except BaseException as e:
+                _unlink(pinned_path)
+                if isinstance(e, FileNotFoundError):
+                    return None
+                raise
+        listing = {key: metadata[key] for key in ("columns", "sheet_names", "sheets") if key in metadata}
+        return PinnedFile(pinned_path, listing)
+
+    def evict(self, keep=None):
+        """Drop expired entries, then the least recently used ones (other than keep) while the store is over its size budget."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".data"):
+                continue
+            file_id = name[:-len(".data")]
+            try:
+                stat = os.stat(self._data_path(file_id))
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > setting.FILE_STORE_TTL_SECONDS:
+                self._remove(file_id)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, file_id))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, file_id in sorted(entries):
+            if total_size <= setting.FILE_STORE_MAX_BYTES:
+                break
+            if file_id == keep:
+                continue
+            self._remove(file_id)
+            total_size -= size
+
+    def _remove(self, file_id):
+        logger.info(f"evicting staged file {file_id}")
+        for path in (self._data_path(file_id), self._metadata_path(file_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
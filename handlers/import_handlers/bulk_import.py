@@ -0,0 +1,147 @@
+import csv
+import json
+import uuid
+from starlette.concurrency import run_in_threadpool
+from config import setting
+from handlers.sync_handlers.schema_validation import column_specs
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+CSV_MEDIA_TYPES = {"text/csv", "application/csv"}
+
+
+class BulkImportError(ValueError):
+    """Rows of an import that cannot be loaded, as (line number, message) pairs."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+
+    def to_dict(self):
+        return [{"line": line, "error": message} for line, message in self.errors]
+
+
+def import_format(content_type):
+    """'ndjson' or 'csv' from a Content-Type header, or None when it is neither."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_MEDIA_TYPES:
+        return "ndjson"
+    if media_type in CSV_MEDIA_TYPES:
+        return "csv"
+    return None
+
+
+def _required_text(row, field):
+    value = row.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f"missing {field}")
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+
+def _optional_uuid(row, field):
+    value = row.get(field)
+    if value is None or value == "":
+        return uuid.uuid4()
+    return _required_uuid(row, field)
+
+
+def _required_uuid(row, field):
+    value = row.get(field)
+    if value is None or value == "":
+        raise ValueError(f"missing {field}")
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"invalid {field}: {value}")
+
+
+def schema_record(row):
+    """(schema_uuid, schema_name, user_uuid, schema) for POST /schema/bulk; in CSV, `schema` is JSON text."""
+    schema = row.get("schema")
+    if isinstance(schema, str):
+        try:
+            schema = json.loads(schema)
+        except ValueError:
+            raise ValueError("schema is not valid JSON")
+    if not isinstance(schema, dict) or not schema:
+        raise ValueError("schema must be a non-empty object")
+    column_specs(schema)
+    schema_name = row.get("schema_name")
+    if schema_name is not None and not isinstance(schema_name, str):
+        raise ValueError("schema_name must be a string")
+    return (
+        _optional_uuid(row, "schema_uuid"),
+        schema_name or None,
+        _required_uuid(row, "user_uuid"),
+        json.dumps(schema),
+    )
+
+
+def user_record(row):
+    """(user_uuid, user_email, user_password, user_firstname, user_lastname) for POST /user/bulk."""
+    return (
+        _optional_uuid(row, "user_uuid"),
+        _required_text(row, "user_email"),
+        _required_text(row, "user_password"),
+        _required_text(row, "user_firstname"),
+        _required_text(row, "user_lastname"),
+    )
+
+
+def _ndjson_rows(text_file):
+    for line_number, line in enumerate(text_file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError("not a JSON object")
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("not a JSON object")
+
+
+def _csv_rows(text_file):
+    reader = csv.DictReader(text_file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_record_chunks(path, file_format, make_record, chunk_rows):
+    """
+    Records of a spooled import file, in lists of up to chunk_rows.
+
+    Each record is (seq, *make_record(row)); seq orders repeated keys so the last row wins.
+    A chunk with invalid rows raises BulkImportError with up to BULK_IMPORT_MAX_ERRORS of them.
+    """
+    rows = _ndjson_rows if file_format == "ndjson" else _csv_rows
+    chunk, errors = [], []
+    with open(path, newline="", encoding="utf-8-sig") as text_file:
+        for seq, (line_number, row) in enumerate(rows(text_file)):
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                chunk.append((seq, *make_record(row)))
+            except ValueError as e:
+                errors.append((line_number, str(e)))
+                if len(errors) >= setting.BULK_IMPORT_MAX_ERRORS:
+                    break
+            if len(chunk) >= chunk_rows:
+                if errors:
+                    break
+                yield chunk
+                chunk = []
+    if errors:
+        raise BulkImportError(errors)
+    if chunk:
+        yield chunk
+
+
+async def iter_record_chunks(path, file_format, make_record):
+    """read_record_chunks, parsed in the threadpool so a large import does not hold the event loop."""
+    chunks = read_record_chunks(path, file_format, make_record, setting.BULK_IMPORT_CHUNK_ROWS)
+    while True:
+        chunk = await run_in_threadpool(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
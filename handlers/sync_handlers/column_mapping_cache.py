@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from datetime import date, datetime
+from threading import Lock
+import hashlib
+import json
+import math
+from DAO.column_mapping_dao import ColumnMappingDAO, AsyncColumnMappingDAO
+from config import setting
+from config.database import SessionLocal
+from config.logger import logger
+
+
+class _LRUStore:
+    """Per-process LRU tier shared by every handler in the worker."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry[1]
+
+    def set(self, cache_key, schema_uuid, mapping):
+        with self._lock:
+            self._entries[cache_key] = (schema_uuid, mapping)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *schema_uuids):
+        schema_uuids = set(schema_uuids)
+        with self._lock:
+            stale_keys = [key for key, (entry_schema_uuid, _) in self._entries.items() if entry_schema_uuid in schema_uuids]
+            for key in stale_keys:
+                del self._entries[key]
+
+
+_lru_store = _LRUStore(max_size=setting.COLUMN_MAPPING_CACHE_SIZE)
+
+
+def _normalize_header(value):
+    return str(value).strip().lower()
+
+
+def _normalize_sample_cell(value):
+    """Keep text cells (banners, headers) but collapse data values to their type so daily data doesn't change the key."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, bool):
+        return "<bool>"
+    if isinstance(value, (int, float)):
+        return "<num>"
+    if isinstance(value, (datetime, date)):
+        return "<date>"
+    return _normalize_header(value)
+
+
+class ColumnMappingCache:
+    """
+    Two tier cache for LLM column mappings.
+
+    Keys combine a fingerprint of the uploaded header with a hash of the output schema, so an
+    edited schema can never be served a mapping resolved against its previous definition.
+
+    The handlers call get and set from the threadpool, so the database tier never blocks the event
+    loop. Each database read or write opens its own short-lived session from session_factory, as the
+    files of one sync run them from different threads at once.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def header_fingerprint(columns, sample_rows=None):
+        fingerprint = {"columns": [_normalize_header(column) for column in columns]}
+        if sample_rows is not None:
+            fingerprint["sample_rows"] = [[_normalize_sample_cell(cell) for cell in row] for row in sample_rows]
+        return fingerprint
+
+    @staticmethod
+    def make_key(kind, fingerprint, output_schema):
+        # Schema key order decides the output column order, so it must not be sorted away.
+        schema_hash = hashlib.sha256(json.dumps(output_schema, default=str).encode("utf-8")).hexdigest()
+        header_hash = hashlib.sha256(json.dumps(fingerprint, default=str).encode("utf-8")).hexdigest()
+        return f"{kind}:{header_hash}:{schema_hash}"
+
+    def get(self, cache_key, schema_uuid=None):
+        mapping = _lru_store.get(cache_key)
+        if mapping is not None:
+            logger.info(f"column mapping cache hit (memory) : {cache_key}")
+            return mapping
+
+        try:
+            with self.session_factory() as session:
+                mapping = ColumnMappingDAO(session).get_mapping_by_cache_key(cache_key)
+        except Exception as e:
+            logger.error(f"Failed to read column mapping cache: {e}")
+            return None
+
+        if mapping is not None:
+            logger.info(f"column mapping cache hit (database) : {cache_key}")
+            _lru_store.set(cache_key, schema_uuid, mapping)
+        return mapping
+
+    def set(self, cache_key, schema_uuid, mapping):
+        if mapping is None or mapping.get("error") is True:
+            return
+        _lru_store.set(cache_key, schema_uuid, mapping)
+        try:
+            with self.session_factory() as session:
+                ColumnMappingDAO(session).upsert_mapping(cache_key=cache_key, schema_uuid=schema_uuid, mapping=mapping)
+        except Exception as e:
+            logger.error(f"Failed to write column mapping cache: {e}")
+
+    def invalidate(self, schema_uuid):
+        _lru_store.invalidate(schema_uuid)
+        with self.session_factory() as session:
+            deleted = ColumnMappingDAO(session).delete_mappings_by_schema_uuid(schema_uuid=schema_uuid)
+        logger.info(f"invalidated {deleted} cached column mappings for schema {schema_uuid}")
+        return deleted
+
+    @staticmethod
+    async def invalidate_async(session, schema_uuid):
+        """invalidate() for the routers' AsyncSession."""
+        _lru_store.invalidate(schema_uuid)
+        deleted = await AsyncColumnMappingDAO(session).delete_mappings_by_schema_uuid(schema_uuid=schema_uuid)
+        logger.info(f"invalidated {deleted} cached column mappings for schema {schema_uuid}")
+        return deleted
+
+    @staticmethod
+    async def invalidate_many_async(session, schema_uuids):
+        """invalidate_async() for many schemas at once, in a single DELETE."""
+        if not schema_uuids:
+            return 0
+        _lru_store.invalidate(*schema_uuids)
+        deleted = await AsyncColumnMappingDAO(session).delete_mappings_by_schema_uuids(schema_uuids=schema_uuids)
+        logger.info(f"invalidated {deleted} cached column mappings for {len(schema_uuids)} schemas")
+        return deleted
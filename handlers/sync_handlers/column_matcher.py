@@ -0,0 +1,311 @@
+import re
+import numpy as np
+
+# Header shorthand expanded before scoring; keys and values are normalized tokens
+ABBREVIATIONS = {
+    "acct": "account",
+    "addr": "address",
+    "amt": "amount",
+    "avg": "average",
+    "bal": "balance",
+    "cat": "category",
+    "cnt": "count",
+    "cust": "customer",
+    "desc": "description",
+    "dept": "department",
+    "dob": "date of birth",
+    "dt": "date",
+    "emp": "employee",
+    "fname": "first name",
+    "id": "identifier",
+    "lname": "last name",
+    "mob": "mobile",
+    "no": "number",
+    "nbr": "number",
+    "num": "number",
+    "pct": "percent",
+    "ph": "phone",
+    "phn": "phone",
+    "pin": "pincode",
+    "qty": "quantity",
+    "ref": "reference",
+    "sku": "stock keeping unit",
+    "tel": "telephone",
+    "txn": "transaction",
+    "yr": "year",
+    "zip": "zipcode",
+}
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_NGRAM_SIZE = 3
+# Weights of the token, n-gram and edit distance similarities in the blended score
+_WEIGHTS = (0.45, 0.30, 0.25)
+# A near-identical spelling ("Nme" for "name") scores at least this share of its edit similarity
+_TYPO_WEIGHT = 0.8
+
+
+def normalize_header(name):
+    """Lower-cased tokens of a header with camelCase split and abbreviations expanded."""
+    text = _CAMEL_BOUNDARY.sub(" ", str(name)).lower()
+    tokens = []
+    for token in _NON_ALNUM.split(text):
+        if token:
+            tokens.extend(ABBREVIATIONS.get(token, token).split())
+    return tokens
+
+
+def _incidence(rows, vocabulary):
+    """Binary / count matrix of rows (lists of features) over a shared vocabulary."""
+    matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.float64)
+    for i, features in enumerate(rows):
+        for feature in features:
+            matrix[i, vocabulary[feature]] += 1
+    return matrix
+
+
+def _token_similarity(source_tokens, target_tokens):
+    vocabulary = {}
+    for tokens in source_tokens + target_tokens:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    source = np.minimum(_incidence([set(tokens) for tokens in source_tokens], vocabulary), 1)
+    target = np.minimum(_incidence([set(tokens) for tokens in target_tokens], vocabulary), 1)
+    intersection = source @ target.T
+    union = source.sum(axis=1)[:, None] + target.sum(axis=1)[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def _ngrams(text):
+    padded = f" {text} "
+    return [padded[i:i + _NGRAM_SIZE] for i in range(max(len(padded) - _NGRAM_SIZE + 1, 1))]
+
+
+def _ngram_similarity(source_texts, target_texts):
+    """Cosine similarity of character trigram counts."""
+    source_grams = [_ngrams(text) for text in source_texts]
+    target_grams = [_ngrams(text) for text in target_texts]
+    vocabulary = {}
+    for grams in source_grams + target_grams:
+        for gram in grams:
+            vocabulary.setdefault(gram, len(vocabulary))
+    source = _incidence(source_grams, vocabulary)
+    target = _incidence(target_grams, vocabulary)
+    norms = np.linalg.norm(source, axis=1)[:, None] * np.linalg.norm(target, axis=1)[None, :]
+    dot = source @ target.T
+    return np.divide(dot, norms, out=np.zeros_like(dot), where=norms > 0)
+
+
+def _edit_similarity(source_texts, target_texts):
+    """1 - Levenshtein distance / longer length, with the DP vectorized across every pair at once."""
+    pairs_source = [text for text in source_texts for _ in target_texts]
+    pairs_target = [text for _ in source_texts for text in target_texts]
+    n_pairs = len(pairs_source)
+    source_lengths = np.array([len(text) for text in pairs_source])
+    target_lengths = np.array([len(text) for text in pairs_target])
+    max_source = int(source_lengths.max(initial=0))
+    max_target = int(target_lengths.max(initial=0))
+
+    source_codes = np.full((n_pairs, max_source), -1, dtype=np.int32)
+    target_codes = np.full((n_pairs, max_target), -2, dtype=np.int32)
+    for p, (source_text, target_text) in enumerate(zip(pairs_source, pairs_target)):
+        source_codes[p, :len(source_text)] = [ord(char) for char in source_text]
+        target_codes[p, :len(target_text)] = [ord(char) for char in target_text]
+
+    previous = np.tile(np.arange(max_target + 1), (n_pairs, 1))
+    distance = previous[np.arange(n_pairs), target_lengths].copy()
+    for i in range(1, max_source + 1):
+        current = np.empty_like(previous)
+        current[:, 0] = i
+        cost = (source_codes[:, i - 1:i] != target_codes).astype(previous.dtype)
+        substitute_or_delete = np.minimum(previous[:, :-1] + cost, previous[:, 1:] + 1)
+        for j in range(1, max_target + 1):
+            current[:, j] = np.minimum(substitute_or_delete[:, j - 1], current[:, j - 1] + 1)
+        finished = source_lengths == i
+        distance[finished] = current[finished, target_lengths[finished]]
+        previous = current
+
+    longest = np.maximum(source_lengths, target_lengths)
+    similarity = np.where(longest > 0, 1 - distance / np.maximum(longest, 1), 1.0)
+    return similarity.reshape(len(source_texts), len(target_texts))
+
+
+def score_columns(source_columns, target_columns):
+    """
+    Score matrix of shape (len(source_columns), len(target_columns)) with values in [0, 1].
+
+    Headers that are equal after normalization (case, separators, camelCase, abbreviations)
+    score 1; everything else gets a blend of token overlap, trigram and edit distance similarity,
+    floored by the edit similarity alone so that misspellings still rank.
+    """
+    source_tokens = [normalize_header(column) for column in source_columns]
+    target_tokens = [normalize_header(column) for column in target_columns]
+    if not source_tokens or not target_tokens:
+        return np.zeros((len(source_tokens), len(target_tokens)))
+    source_texts = [" ".join(tokens) for tokens in source_tokens]
+    target_texts = [" ".join(tokens) for tokens in target_tokens]
+
+    token_weight, ngram_weight, edit_weight = _WEIGHTS
+    edit_similarity = _edit_similarity(source_texts, target_texts)
+    scores = (
+        token_weight * _token_similarity(source_tokens, target_tokens)
+        + ngram_weight * _ngram_similarity(source_texts, target_texts)
+        + edit_weight * edit_similarity
+    )
+    scores = np.maximum(scores, _TYPO_WEIGHT * edit_similarity)
+    # "first name", "FirstName" and "first_name" are the same header
+    source_compact = np.array(["".join(tokens) for tokens in source_tokens], dtype=object)
+    target_compact = np.array(["".join(tokens) for tokens in target_tokens], dtype=object)
+    exact = (source_compact[:, None] == target_compact[None, :]) & (source_compact[:, None] != "")
+    return np.where(exact, 1.0, scores)
+
+
+def assign_columns(scores):
+    """
+    Maximum-score one-to-one assignment of targets (columns of `scores`) to sources (rows).
+
+    Hungarian algorithm with potentials (shortest augmenting paths), O(n^2 m). Returns, per target,
+    the assigned source index, or None when there are fewer sources than targets.
+    """
+    n_sources, n_targets = scores.shape
+    if n_targets == 0:
+        return []
+    # Rows of the cost matrix are targets; dummy sources with score 0 make it at least square
+    width = max(n_sources, n_targets)
+    cost = np.zeros((n_targets, width))
+    cost[:, :n_sources] = -scores.T
+
+    row_potential = np.zeros(n_targets + 1)
+    column_potential = np.zeros(width + 1)
+    # column_owner[j] is the (1-based) row matched to column j; column 0 is the augmenting root
+    column_owner = np.zeros(width + 1, dtype=np.int64)
+    way = np.zeros(width + 1, dtype=np.int64)
+    for row in range(1, n_targets + 1):
+        column_owner[0] = row
+        current_column = 0
+        min_slack = np.full(width + 1, np.inf)
+        used = np.zeros(width + 1, dtype=bool)
+        while True:
+            used[current_column] = True
+            current_row = column_owner[current_column]
+            free = ~used[1:]
+            slack = cost[current_row - 1] - row_potential[current_row] - column_potential[1:]
+            improved = free & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = current_column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            used_columns = np.flatnonzero(used)
+            row_potential[column_owner[used_columns]] += delta
+            column_potential[used_columns] -= delta
+            min_slack[1:][free] -= delta
+            current_column = next_column
+            if column_owner[current_column] == 0:
+                break
+        while current_column:
+            previous_column = way[current_column]
+            column_owner[current_column] = column_owner[previous_column]
+            current_column = previous_column
+
+    assignment = [None] * n_targets
+    for column in range(1, width + 1):
+        row = column_owner[column]
+        if row and column - 1 < n_sources:
+            assignment[row - 1] = column - 1
+    return assignment
+
+
+def match_columns(source_columns, target_columns):
+    """
+    Match every target column to a distinct source column.
+
+    Returns `reordered_columns` (source index per target, None if there is none left) and the
+    per-target `confidence`, i.e. the score of the chosen pair.
+    """
+    scores = score_columns(source_columns, target_columns)
+    assignment = assign_columns(scores)
+    confidence = [
+        round(float(scores[source, target]), 4) if source is not None else 0.0
+        for target, source in enumerate(assignment)
+    ]
+    return {"reordered_columns": assignment, "confidence": confidence, "scores": scores}
+
+
+def confidence_by_column(match, target_columns, reordered_columns=None):
+    """Score of each target column's chosen source, keyed by target; defaults to the matcher's own choice."""
+    reordered_columns = match["reordered_columns"] if reordered_columns is None else reordered_columns
+    scores = match["scores"]
+    return {
+        str(target): round(float(scores[source, index]), 4) if source is not None and 0 <= source < scores.shape[0] else 0.0
+        for index, (target, source) in enumerate(zip(target_columns, reordered_columns))
+    }
+
+
+def local_mapping_result(match, target_columns, threshold):
+    """
+    A mapping_result from the local match if every target column clears `threshold`, else an error
+    result naming the columns that did not.
+    """
+    unmatched = [
+        str(target) for target, source, confidence in zip(target_columns, match["reordered_columns"], match["confidence"])
+        if source is None or confidence < threshold
+    ]
+    if unmatched:
+        return {
+            "reordered_columns": None,
+            "error": True,
+            "error_message": f"columns {unmatched} not found",
+        }
+    return {
+        "reordered_columns": [int(source) for source in match["reordered_columns"]],
+        "error": False,
+        "error_message": None,
+        "mapping_source": "local",
+        "confidence": confidence_by_column(match, target_columns),
+    }
+
+
+def split_match(match, threshold):
+    """
+    Split a local match into the pairs that clear `threshold`, which are fixed, and the rest.
+
+    Returns (resolved, unresolved_targets, unclaimed_sources): resolved maps target index to source
+    index, the other two list the target and source indexes left for the LLM.
+    """
+    resolved = {
+        target: int(source)
+        for target, (source, confidence) in enumerate(zip(match["reordered_columns"], match["confidence"]))
+        if source is not None and confidence >= threshold
+    }
+    unresolved_targets = [target for target in range(len(match["reordered_columns"])) if target not in resolved]
+    claimed = set(resolved.values())
+    unclaimed_sources = [source for source in range(match["scores"].shape[0]) if source not in claimed]
+    return resolved, unresolved_targets, unclaimed_sources
+
+
+def merge_partial_mapping(resolved, unresolved_targets, unclaimed_sources, partial_reordered_columns):
+    """
+    Full reordered_columns from the fixed pairs plus a mapping of only the unresolved targets, whose
+    indexes are positions in `unclaimed_sources`. None if the partial mapping is not a valid one-to-one pick.
+    """
+    if not isinstance(partial_reordered_columns, list) or len(partial_reordered_columns) != len(unresolved_targets):
+        return None
+    reordered_columns = [None] * (len(resolved) + len(unresolved_targets))
+    for target, source in resolved.items():
+        reordered_columns[target] = source
+    picked = set()
+    for target, position in zip(unresolved_targets, partial_reordered_columns):
+        if isinstance(position, bool) or not isinstance(position, int) or not 0 <= position < len(unclaimed_sources) or position in picked:
+            return None
+        picked.add(position)
+        reordered_columns[target] = unclaimed_sources[position]
+    return reordered_columns
+
+
+def mapping_summary(mapping_result):
+    """How a mapping was resolved and the per-column confidence, as reported back to the client."""
+    return {
+        "source": mapping_result.get("mapping_source"),
+        "confidence": mapping_result.get("confidence"),
+    }
@@ -0,0 +1,13 @@
+def prune_mapping(mapping_result):
+    """
+    Split a resolved mapping into the source columns to parse and a mapping over the pruned frame.
+
+    pandas returns `usecols` in file order, so reordered_columns is rewritten to positions within that subset.
+    """
+    reordered_columns = mapping_result.get("reordered_columns")
+    usecols = sorted(set(reordered_columns))
+    pruned_mapping = {
+        **mapping_result,
+        "reordered_columns": [usecols.index(column) for column in reordered_columns],
+    }
+    return usecols, pruned_mapping
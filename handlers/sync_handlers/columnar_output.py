@@ -0,0 +1,149 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import setting
+
+# output_format -> (extension, media type)
+COLUMNAR_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    # Arrow IPC stream format: record batches follow each other with no footer
+    "arrow": (".arrows", "application/vnd.apache.arrow.stream"),
+    # Feather v2 is the Arrow IPC file format: the same batches plus a footer for random access
+    "feather": (".feather", "application/vnd.apache.arrow.file"),
+}
+COLUMNAR_COMPRESSIONS = {
+    "parquet": {"none", "snappy", "gzip", "brotli", "lz4", "zstd"},
+    "arrow": {"none", "lz4", "zstd"},
+    "feather": {"none", "lz4", "zstd"},
+}
+
+
+def output_options(file_metadata, sync_metadata):
+    """
+    (output_format, compression) for one file, from its file_metadatas entry or else the top level
+    of sync_metadata. output_format is None for the input's own format (CSV or workbook).
+    Raises ValueError for an unknown format or a compression the format does not support.
+    """
+    file_metadata = file_metadata or {}
+    output_format = file_metadata.get("output_format", sync_metadata.get("output_format"))
+    if output_format is None:
+        return None, None
+    output_format = str(output_format).lower()
+    if output_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown output_format '{output_format}', expected one of {', '.join(COLUMNAR_FORMATS)}")
+
+    compression = file_metadata.get("compression", sync_metadata.get("compression"))
+    if compression is None:
+        compression = setting.SYNC_PARQUET_COMPRESSION if output_format == "parquet" else setting.SYNC_ARROW_COMPRESSION
+    compression = str(compression).lower()
+    if compression not in COLUMNAR_COMPRESSIONS[output_format]:
+        raise ValueError(
+            f"Unsupported compression '{compression}' for {output_format}, "
+            f"expected one of {', '.join(sorted(COLUMNAR_COMPRESSIONS[output_format]))}"
+        )
+    return output_format, compression
+
+
+def columnar_filename(filename, output_format):
+    return os.path.splitext(filename)[0] + COLUMNAR_FORMATS[output_format][0]
+
+
+def columnar_media_type(output_format):
+    return COLUMNAR_FORMATS[output_format][1]
+
+
+class _ByteSink:
+    """Write-only file object the Arrow writers write into; the generator driving them drains it."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _cell_text(value):
+    return None if pd.isna(value) else str(value)
+
+
+def _to_table(frame, schema=None):
+    try:
+        return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Object columns mixing types (e.g. workbook cells holding both numbers and text) are written as text
+        text_columns = [
+            name for name in frame.columns
+            if frame[name].dtype == object and (schema is None or pa.types.is_string(schema.field(name).type))
+        ]
+        frame = frame.assign(**{name: frame[name].map(_cell_text) for name in text_columns})
+        return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def _writer_schema(table):
+    # A column that is entirely empty in the first chunk has no type yet; later chunks may hold text
+    fields = [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema]
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def _open_writer(sink, schema, output_format, compression):
+    if output_format == "parquet":
+        return pq.ParquetWriter(sink, schema, compression=compression)
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+    if output_format == "arrow":
+        return pa.ipc.new_stream(sink, schema, options=options)
+    return pa.ipc.new_file(sink, schema, options=options)
+
+
+def iter_columnar_bytes(frames, output_format, compression, columns=None):
+    """
+    Serialize an iterable of DataFrame chunks as Parquet, Arrow IPC or Feather bytes.
+
+    The first chunk fixes the schema; later chunks are converted to it. Each chunk is written as
+    record batches (Parquet row groups) of at most SYNC_STREAM_CHUNK_ROWS rows, and the bytes are
+    yielded as soon as each one is written, so a streamed CSV is never materialized in full.
+    """
+    sink = _ByteSink()
+    writer = None
+    schema = None
+    chunk_rows = setting.SYNC_STREAM_CHUNK_ROWS
+    for frame in frames:
+        table = _to_table(frame, schema)
+        if writer is None:
+            schema = _writer_schema(table)
+            table = table.cast(schema)
+            writer = _open_writer(sink, schema, output_format, compression)
+        for start in range(0, table.num_rows, chunk_rows):
+            writer.write_table(table.slice(start, chunk_rows))
+            yield sink.drain()
+    if writer is None:
+        # Header-only input yields no chunks; still write the columns, as text
+        schema = pa.schema([(str(name), pa.string()) for name in columns or []])
+        writer = _open_writer(sink, schema, output_format, compression)
+    writer.close()
+    yield sink.drain()
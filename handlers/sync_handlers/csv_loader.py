@@ -0,0 +1,77 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from config import setting
+
+
+def read_csv_header(path):
+    """Header names as pandas reads them (repeated names get a .1, .2 suffix)."""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _arrow_options(path, usecols, column_types=None):
+    # Columns are selected by position, so they get positional names; the file's own header row is skipped
+    header = read_csv_header(path)
+    names = [f"f{index}" for index in range(len(header))]
+    included = [names[index] for index in usecols]
+    options = {
+        "read_options": pa_csv.ReadOptions(column_names=names, skip_rows=1),
+        "parse_options": pa_csv.ParseOptions(newlines_in_values=True),
+        "convert_options": pa_csv.ConvertOptions(
+            include_columns=included,
+            # Empty cells are missing values, as with pandas, rather than empty strings
+            strings_can_be_null=True,
+            column_types={name: column_types for name in included} if column_types is not None else None,
+        ),
+    }
+    return options, [header[index] for index in usecols]
+
+
+def _arrow_frame(table, columns, start=0):
+    # pyarrow-backed columns: strings stay in Arrow buffers instead of one Python object per cell
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    df.columns = columns
+    # Row labels continue across chunks, as pandas' chunked reader numbers them
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def read_csv_columns(path, usecols):
+    """The columns at positions usecols, parsed in full with SYNC_PARSE_ENGINE."""
+    if setting.SYNC_PARSE_ENGINE != "pyarrow":
+        return pd.read_csv(path, usecols=usecols, memory_map=True)
+    options, columns = _arrow_options(path, usecols)
+    # Blocks are parsed and typed on all cores
+    df = _arrow_frame(pa_csv.read_csv(path, **options), columns)
+    # The parse's scratch buffers go back to the OS rather than staying cached in the worker's Arrow pool
+    pa.default_memory_pool().release_unused()
+    return df
+
+
+def iter_csv_columns(path, usecols, chunk_rows):
+    """
+    The columns at positions usecols, in frames of chunk_rows rows, read as text.
+
+    Types inferred chunk by chunk drift (a column of ints in one chunk holds 4.5 or a gap in the next),
+    while a columnar writer fixes its schema from the first chunk, so every chunk gets the same types.
+    """
+    if setting.SYNC_PARSE_ENGINE != "pyarrow":
+        with pd.read_csv(path, usecols=usecols, chunksize=chunk_rows, memory_map=True, dtype=str) as reader:
+            yield from reader
+        return
+
+    # The streaming reader would also fix each column's type from its first block and fail on a later one
+    options, columns = _arrow_options(path, usecols, column_types=pa.string())
+    pending, pending_rows, start = [], 0, 0
+    for batch in pa_csv.open_csv(path, **options):
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        # Blocks are sized in bytes; they are regrouped into chunks of chunk_rows rows
+        while pending_rows >= chunk_rows:
+            table = pa.Table.from_batches(pending)
+            yield _arrow_frame(table.slice(0, chunk_rows), columns, start)
+            start += chunk_rows
+            rest = table.slice(chunk_rows)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield _arrow_frame(pa.Table.from_batches(pending), columns, start)
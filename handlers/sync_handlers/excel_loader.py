@@ -0,0 +1,58 @@
+from io import BytesIO
+import zipfile
+import pandas as pd
+from config import setting
+from handlers.sync_handlers.xlsx_package import open_package, read_workbook_sheets, read_sheet_summaries
+
+
+def _as_readable(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BytesIO(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def _engine(source):
+    """openpyxl for xlsx containers, pandas' own choice (xlrd) for legacy .xls."""
+    try:
+        with open_package(source):
+            return "openpyxl"
+    except zipfile.BadZipFile:
+        return None
+
+
+def read_sheet_names(source):
+    """Sheet names from workbook metadata, without parsing any worksheet."""
+    try:
+        with open_package(source) as package:
+            return [sheet["name"] for sheet in read_workbook_sheets(package)]
+    except zipfile.BadZipFile:
+        return pd.ExcelFile(_as_readable(source)).sheet_names
+
+
+def read_sheet_details(source):
+    """Sheet names with dimensions and header rows from sheet metadata; None for legacy .xls."""
+    try:
+        with open_package(source) as package:
+            return read_sheet_summaries(package)
+    except zipfile.BadZipFile:
+        return None
+
+
+def read_sheet_preview(source, sheet_name, n_rows, header=0):
+    """First rows of one sheet; the openpyxl reader stops after n_rows instead of loading the sheet."""
+    return pd.read_excel(_as_readable(source), sheet_name=sheet_name, nrows=n_rows, header=header, engine=_engine(source))
+
+
+def read_sheet(source, sheet_name, usecols=None):
+    """
+    One sheet in full, read through openpyxl's read-only mode. With the pyarrow SYNC_PARSE_ENGINE
+    the cells are still parsed by openpyxl, and the columns of one type are then kept Arrow-backed
+    like a CSV's. A column mixing types, such as one under title rows above the header, keeps the
+    values openpyxl read rather than being turned into text.
+    """
+    df = pd.read_excel(_as_readable(source), sheet_name=sheet_name, usecols=usecols, engine=_engine(source))
+    if setting.SYNC_PARSE_ENGINE == "pyarrow":
+        df = df.convert_dtypes(dtype_backend="pyarrow")
+    return df
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from handlers.sync_handlers.column_matcher import score_columns
+
+# Weights of schema similarity, non-null density, text share and text-over-data contrast in a row's score
+_WEIGHTS = (0.5, 0.2, 0.15, 0.15)
+# Rows below a candidate that are checked for the data the header describes
+_DATA_ROWS = 5
+
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ""
+
+
+def detect_header_row(grid, target_columns):
+    """
+    Index of the header row in `grid`, the top rows of a sheet read without a header.
+
+    Every row is scored on how well its text matches the schema keys, how many cells it fills
+    compared to the widest row, how much of it is text, and how much of the filled cells below it
+    are not text (headers are labels over numbers and dates). Banner and title rows are short,
+    and data rows are numeric or do not resemble the schema. Ties go to the earliest row.
+    """
+    if grid.empty:
+        return 0
+    values = grid.to_numpy(dtype=object)
+    present = pd.notna(grid).to_numpy()
+    text = np.vectorize(_is_text, otypes=[bool])(values)
+    filled = present.sum(axis=1)
+    widest = max(int(filled.max()), 1)
+
+    schema_weight, density_weight, text_weight, contrast_weight = _WEIGHTS
+    scores = np.zeros(len(grid))
+    for row in range(len(grid)):
+        if not text[row].any():
+            continue
+        labels = [str(value).strip() for value in values[row][text[row]]]
+        # How well the schema keys are covered by this row: each key's best match, averaged
+        schema_similarity = float(score_columns(labels, target_columns).max(axis=0).mean()) if target_columns else 0.0
+        below_present = present[row + 1:row + 1 + _DATA_ROWS][:, text[row]]
+        below_text = text[row + 1:row + 1 + _DATA_ROWS][:, text[row]]
+        contrast = float((below_present & ~below_text).sum() / below_present.sum()) if below_present.any() else 0.0
+        scores[row] = (
+            schema_weight * schema_similarity
+            + density_weight * filled[row] / widest
+            + text_weight * text[row].sum() / filled[row]
+            + contrast_weight * contrast
+        )
+    return int(np.argmax(scores))
+
+
+def header_view(grid, header_row):
+    """The rows after `header_row` as a frame whose columns are that row, as pandas names them when reading with `header=header_row`."""
+    if grid.empty:
+        return grid
+    header = [
+        value if pd.notna(value) else f"Unnamed: {index}"
+        for index, value in enumerate(grid.iloc[header_row].tolist())
+    ]
+    view = grid.iloc[header_row + 1:].reset_index(drop=True)
+    view.columns = header
+    return view
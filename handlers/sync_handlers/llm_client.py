@@ -0,0 +1,53 @@
+import asyncio
+import weakref
+from groq import AsyncGroq
+import os
+from dotenv import load_dotenv
+from config import setting
+from config.logger import logger
+
+load_dotenv()
+
+# One semaphore per event loop, so every handler in a worker shares the same in-flight cap.
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(setting.GROQ_MAX_CONCURRENT_CALLS)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+class LLMClient:
+    """Non-blocking Groq client with a per-call timeout and a per-worker concurrency cap."""
+
+    def __init__(self):
+        self.client = AsyncGroq(
+            api_key=os.environ.get("GROQ_API_KEY"),
+            timeout=setting.GROQ_TIMEOUT_SECONDS,
+            max_retries=setting.GROQ_MAX_RETRIES,
+        )
+
+    async def complete(self, prompt: str) -> str:
+        async with _get_semaphore():
+            chat_completion = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt,
+                        }
+                    ],
+                    model=setting.GROQ_MODEL,
+                    stream=False,
+                    temperature=0.1,  # Low temperature for consistent mapping
+                ),
+                # Hard ceiling covering the client's own retries
+                timeout=setting.GROQ_TIMEOUT_SECONDS * (setting.GROQ_MAX_RETRIES + 1),
+            )
+        response_content = chat_completion.choices[0].message.content.strip()
+        logger.info(f"Groq LLM response: {response_content}")
+        return response_content
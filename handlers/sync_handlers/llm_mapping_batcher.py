@@ -0,0 +1,194 @@
+import asyncio
+import json
+from config import setting
+from config.logger import logger
+from handlers.sync_handlers.llm_client import LLMClient
+
+
+def _schema_key(schema):
+    return json.dumps(schema, default=str)
+
+
+def _entry_chars(entry):
+    return len(json.dumps(entry["data"], default=str))
+
+
+def _valid_result(result, entry):
+    """Whether one input's part of a batched answer is a usable mapping (or a usable "cannot map")."""
+    if not isinstance(result, dict):
+        return False
+    if result.get("error") is True:
+        return True
+    reordered_columns = result.get("reordered_columns")
+    if not isinstance(reordered_columns, list) or len(reordered_columns) != len(entry["schema"]):
+        return False
+    for index in reordered_columns:
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < entry["width"]:
+            return False
+    if len(set(reordered_columns)) != len(reordered_columns):
+        return False
+    if entry["kind"] == "excel":
+        skip_n_rows = result.get("skip_n_rows")
+        if skip_n_rows is not None and (isinstance(skip_n_rows, bool) or not isinstance(skip_n_rows, int) or skip_n_rows < 0):
+            return False
+    return True
+
+
+class LLMMappingBatcher:
+    """
+    Coalesces the LLM column mapping requests of one sync into as few calls as possible.
+
+    Every file of the sync is a participant that either asks for one mapping or leaves. Queued
+    requests are sent once every participant has done one or the other, or LLM_BATCH_MAX_WAIT_MS
+    after the first of them, whichever comes first. Inputs that share an output schema list it once,
+    and a batch over LLM_BATCH_MAX_PROMPT_CHARS is split into calls that run concurrently.
+
+    A request resolves to None when the input is alone in its call, or the LLM left it out or
+    answered it malformed; the caller then asks about that file on its own.
+    """
+
+    def __init__(self, participants, llm_client=None):
+        self.llm_client = llm_client or LLMClient()
+        self.participants = participants
+        self._settled = 0
+        self._pending = []
+        self._timer = None
+        # Keeps the send tasks referenced until they finish
+        self._tasks = set()
+
+    def participant(self, name):
+        return LLMMappingParticipant(self, name)
+
+    async def _request(self, entry):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((entry, future))
+        self._settle()
+        if self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(setting.LLM_BATCH_MAX_WAIT_MS / 1000, self._flush)
+        return await future
+
+    def _settle(self):
+        self._settled += 1
+        if self._settled >= self.participants and self._pending:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _split(batch):
+        """Group requests by schema and cut the groups into calls within the prompt budget."""
+        groups = {}
+        for request in batch:
+            groups.setdefault(_schema_key(request[0]["schema"]), []).append(request)
+        calls = [[]]
+        size = 0
+        for schema_key, requests in groups.items():
+            schema_counted = False
+            for request in requests:
+                cost = _entry_chars(request[0]) + (0 if schema_counted else len(schema_key))
+                if calls[-1] and size + cost > setting.LLM_BATCH_MAX_PROMPT_CHARS:
+                    calls.append([])
+                    size = 0
+                    cost = _entry_chars(request[0]) + len(schema_key)
+                calls[-1].append(request)
+                size += cost
+                schema_counted = True
+        return calls
+
+    async def _send(self, batch):
+        await asyncio.gather(*(self._send_call(call) for call in self._split(batch)))
+
+    async def _send_call(self, call):
+        results = {}
+        try:
+            # The single-file prompts are tuned for one input; a lone request goes back to them
+            if len(call) > 1:
+                results = await self._complete([entry for entry, _ in call])
+        except Exception as e:
+            logger.error(f"Batched mapping call for {len(call)} files failed, retrying them individually: {e}")
+        finally:
+            for index, (entry, future) in enumerate(call):
+                result = results.get(f"input_{index + 1}")
+                if results and not _valid_result(result, entry):
+                    logger.warning(f"Malformed batched mapping for '{entry['name']}', retrying it individually: {result}")
+                    result = None
+                if not future.done():
+                    future.set_result(result)
+
+    async def _complete(self, entries):
+        schema_names = {}
+        for entry in entries:
+            schema_names.setdefault(_schema_key(entry["schema"]), (f"schema_{len(schema_names) + 1}", entry["schema"]))
+        schemas = "\n            ".join(f"{name}: {schema}" for name, schema in schema_names.values())
+        inputs = []
+        for index, entry in enumerate(entries):
+            schema_name = schema_names[_schema_key(entry["schema"])][0]
+            if entry["kind"] == "excel":
+                inputs.append(f"input_{index + 1} ({schema_name}), first rows of an Excel sheet: {entry['data']}")
+            else:
+                inputs.append(f"input_{index + 1} ({schema_name}), CSV columns: {entry['data']}")
+        inputs = "\n            ".join(inputs)
+
+        prompt = f"""
+            You are a data mapping expert. Map the columns of each input below to its output schema.
+
+            ### OUTPUT SCHEMAS (list of columns in desired order):
+            {schemas}
+
+            ### INPUTS:
+            {inputs}
+
+            ### REQUIRED OUTPUT (JSON only, no extra text), one entry per input:
+            {{
+                "input_1": {{"reordered_columns": [3, 0, 1], "error": false, "error_message": null}},
+                "input_2": {{"skip_n_rows": 0, "reordered_columns": [1, 0], "error": false, "error_message": null}}
+            }}
+
+            ### RULES:
+            1. `reordered_columns` gives, for each output schema column in order, the 0-based index of the input column it maps to.
+            2. For Excel inputs, `skip_n_rows` is the count of rows above the header row; the header row is the first non-empty row after them.
+            3. Match columns using semantic similarity, including common variations and abbreviations (e.g., "first_name" ~ "fname" ~ "First Name").
+            4. Do not guess; if any schema column of an input cannot be matched, answer that input with
+               {{"skip_n_rows": null, "reordered_columns": null, "error": true, "error_message": "column tax_value not found"}}
+        """
+        logger.info(f"Batched mapping call for {len(entries)} files over {len(schema_names)} schemas")
+        response_content = await self.llm_client.complete(prompt)
+        results = json.loads(response_content)
+        if not isinstance(results, dict):
+            raise ValueError(f"expected a JSON object, got {type(results).__name__}")
+        return results
+
+
+class LLMMappingParticipant:
+    """One file's handle on the batcher: it asks for a mapping at most once, or leaves."""
+
+    def __init__(self, batcher, name):
+        self.batcher = batcher
+        self.name = name
+        self.settled = False
+
+    async def request(self, kind, data, schema, width):
+        """
+        Mapping of one input through the batch, or None when the caller should ask about it alone.
+
+        `data` is the CSV header or the Excel preview rows, `width` the number of columns they have.
+        """
+        if self.settled:
+            return None
+        self.settled = True
+        entry = {"name": self.name, "kind": kind, "data": data, "schema": schema, "width": width}
+        return await self.batcher._request(entry)
+
+    def leave(self):
+        if not self.settled:
+            self.settled = True
+            self.batcher._settle()
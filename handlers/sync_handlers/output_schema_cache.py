@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from threading import Lock
+import uuid
+from DAO.output_schema_dao import OutputSchemaDAO
+from config import setting
+from config.database import SessionLocal
+from config.logger import logger
+
+
+class _SchemaStore:
+    """Per-process LRU of output schemas keyed by schema_uuid, each with the version it was read at."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, schema_uuid):
+        with self._lock:
+            entry = self._entries.get(schema_uuid)
+            if entry is not None:
+                self._entries.move_to_end(schema_uuid)
+            return entry
+
+    def set(self, schema_uuid, schema_version, schema):
+        with self._lock:
+            self._entries[schema_uuid] = (schema_version, schema)
+            self._entries.move_to_end(schema_uuid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, schema_uuid):
+        with self._lock:
+            self._entries.pop(schema_uuid, None)
+
+
+_schema_store = _SchemaStore(max_size=setting.OUTPUT_SCHEMA_CACHE_SIZE)
+
+
+def _valid_uuid(value):
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class OutputSchemaCache:
+    """
+    Output schemas referenced by a sync, read through a per-worker cache.
+
+    A warm sync costs one IN query over the version stamps alone; only schemas that are missing
+    or were updated since they were cached (OutputSchemaDAO bumps schema_version on every write,
+    from any worker) are read in full, again in a single IN query. Each call reads through its own
+    session from session_factory, so a sync never shares one with other threads.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def get_schemas(self, user_uuid, schema_uuids):
+        """schema_uuid -> schema for the user's schemas among schema_uuids; unknown or foreign ones are left out."""
+        schema_uuids = sorted({valid for valid in map(_valid_uuid, schema_uuids) if valid is not None})
+        if not schema_uuids:
+            return {}
+
+        cached = {}
+        for schema_uuid in schema_uuids:
+            entry = _schema_store.get(schema_uuid)
+            if entry is not None:
+                cached[schema_uuid] = entry
+
+        schemas = {}
+        with self.session_factory() as session:
+            output_schema_dao = OutputSchemaDAO(session)
+            if cached:
+                versions = output_schema_dao.get_schema_versions(user_uuid=user_uuid, schema_uuids=schema_uuids)
+                for schema_uuid, (schema_version, schema) in cached.items():
+                    if versions.get(schema_uuid) == schema_version:
+                        schemas[schema_uuid] = schema
+                    elif schema_uuid not in versions:
+                        # Deleted, or not this user's
+                        _schema_store.invalidate(schema_uuid)
+                missing = [schema_uuid for schema_uuid in schema_uuids if schema_uuid in versions and schema_uuid not in schemas]
+            else:
+                missing = schema_uuids
+
+            if missing:
+                for row in output_schema_dao.get_output_schemas_by_schema_uuids(user_uuid=user_uuid, schema_uuids=missing):
+                    _schema_store.set(row["schema_uuid"], row["schema_version"], row["schema"])
+                    schemas[row["schema_uuid"]] = row["schema"]
+        logger.info(f"output schemas : {len(schemas)} of {len(schema_uuids)} found, {len(missing)} read from the database")
+        return schemas
+
+    @staticmethod
+    def invalidate(schema_uuid):
+        _schema_store.invalidate(str(schema_uuid))
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SPEC_TYPES = ("int", "float", "string", "date", "datetime")
+# A schema value is a spec once it is an object with one of these keys; any other value ("", "string",
+# a description) only guides the mapping, as before
+SPEC_KEYS = ("type", "format", "enum", "regex", "nullable")
+ROW_COLUMN = "_row"
+ERRORS_COLUMN = "_errors"
+
+
+class ColumnSpec:
+    def __init__(self, name, type="string", format=None, enum=None, regex=None, nullable=True):
+        self.name = name
+        self.type = type
+        self.format = format
+        self.enum = enum
+        self.regex = regex
+        self.nullable = nullable
+
+
+def column_spec(name, value):
+    """The ColumnSpec for one schema value, or None if it is not a spec. Raises ValueError for a malformed spec."""
+    if not isinstance(value, dict) or not any(key in value for key in SPEC_KEYS):
+        return None
+    spec_type = value.get("type", "string")
+    if spec_type not in SPEC_TYPES:
+        raise ValueError(f"{name}: type must be one of {', '.join(SPEC_TYPES)}")
+    spec_format = value.get("format")
+    if spec_format is not None and (spec_type not in ("date", "datetime") or not isinstance(spec_format, str)):
+        raise ValueError(f"{name}: format must be a strptime pattern, for date and datetime columns")
+    enum = value.get("enum")
+    if enum is not None:
+        if spec_type not in ("int", "float", "string") or not isinstance(enum, list) or not enum:
+            raise ValueError(f"{name}: enum must be a non-empty list, for int, float and string columns")
+        if spec_type != "string" and not all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in enum):
+            raise ValueError(f"{name}: enum values must be numbers for a {spec_type} column")
+    regex = value.get("regex")
+    if regex is not None:
+        if spec_type != "string" or not isinstance(regex, str):
+            raise ValueError(f"{name}: regex must be a pattern, for string columns")
+        try:
+            pc.match_substring_regex(pa.array([""]), regex)
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"{name}: invalid regex: {e}")
+    nullable = value.get("nullable", True)
+    if not isinstance(nullable, bool):
+        raise ValueError(f"{name}: nullable must be true or false")
+    return ColumnSpec(name, spec_type, spec_format, enum, regex, nullable)
+
+
+def column_specs(output_schema):
+    """Specs of the output columns that declare one, by column name."""
+    specs = {}
+    for name, value in output_schema.items():
+        spec = column_spec(name, value)
+        if spec is not None:
+            specs[name] = spec
+    return specs
+
+
+def _is_arrow(series):
+    return isinstance(series.dtype, pd.ArrowDtype)
+
+
+def _present_among(series, candidates):
+    """
+    The candidate rows (a boolean array) that hold a value. Finding missing cells in an object column is
+    a full scan, so only the candidates are looked at: the rows whose value failed a cast or a check.
+    """
+    candidates = np.asarray(candidates, dtype=bool)
+    if candidates.any():
+        candidates = candidates.copy()
+        candidates[candidates] = series[candidates].notna().to_numpy(dtype=bool)
+    return candidates
+
+
+def _numbers(series):
+    numbers = pd.to_numeric(series, errors="coerce")
+    if _is_arrow(numbers) and pa.types.is_floating(numbers.dtype.pyarrow_dtype):
+        # Arrow tells the NaN that to_numeric puts in for unparsable text apart from a missing value
+        numbers = numbers.astype("float64")
+    return numbers
+
+
+def _to_int(series):
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series, None
+    numbers = _numbers(series)
+    failed = (numbers.isna() | (numbers != numbers.round())).to_numpy(dtype=bool, na_value=True)
+    invalid = _present_among(series, failed)
+    dtype = pd.ArrowDtype(pa.int64()) if _is_arrow(series) else "Int64"
+    return numbers.where(~invalid).astype(dtype), invalid
+
+
+def _to_float(series):
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series, None
+    numbers = _numbers(series)
+    invalid = _present_among(series, numbers.isna())
+    dtype = pd.ArrowDtype(pa.float64()) if _is_arrow(series) else "float64"
+    return numbers.astype(dtype), invalid
+
+
+def _to_datetime(series, spec):
+    if spec.type == "date" and _is_arrow(series) and pa.types.is_date(series.dtype.pyarrow_dtype):
+        return series, None
+    if pd.api.types.is_datetime64_any_dtype(series.dtype) or (_is_arrow(series) and pa.types.is_temporal(series.dtype.pyarrow_dtype)):
+        # Parsed already, by the Arrow CSV reader or from workbook date cells
+        parsed, invalid = pd.to_datetime(series), None
+    else:
+        parsed = pd.to_datetime(series, format=spec.format or "ISO8601", errors="coerce")
+        invalid = _present_among(series, parsed.isna())
+    if spec.type == "date":
+        parsed = parsed.dt.normalize()
+        if _is_arrow(series):
+            parsed = parsed.astype(pd.ArrowDtype(pa.date32()))
+    return parsed, invalid
+
+
+def _text(series):
+    try:
+        return pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Numbers read into a string column are matched as pandas writes them
+        return pa.array(series.astype(str).where(series.notna()), type=pa.string(), from_pandas=True)
+
+
+def _coerce(series, spec):
+    """(values, [(message, mask)]) for one column: the values cast to the spec's type and each check's failures."""
+    if spec.type == "int":
+        values, invalid = _to_int(series)
+        message = "not an integer"
+    elif spec.type == "float":
+        values, invalid = _to_float(series)
+        message = "not a number"
+    elif spec.type in ("date", "datetime"):
+        values, invalid = _to_datetime(series, spec)
+        message = f"not a {spec.type}" + (f" ({spec.format})" if spec.format else "")
+    else:
+        values, invalid = series, None
+
+    problems = []
+    if invalid is not None:
+        problems.append((message, invalid))
+    if not spec.nullable:
+        problems.append(("missing value", series.isna().to_numpy(dtype=bool)))
+    if spec.enum is not None:
+        # Values that failed the cast are missing in values, so they are not reported twice
+        outside = ~values.isin(spec.enum).to_numpy(dtype=bool, na_value=False)
+        problems.append(("not one of the allowed values", _present_among(values, outside)))
+    if spec.regex is not None:
+        matched = pc.match_substring_regex(_text(values), f"^(?:{spec.regex})$").fill_null(True)
+        problems.append(("does not match the pattern", ~matched.to_numpy(zero_copy_only=False)))
+    return values, problems
+
+
+def reject_columns(columns):
+    return [ROW_COLUMN, *columns, ERRORS_COLUMN]
+
+
+def validation_summary(rejected_rows, counts):
+    return {"rejected_rows": rejected_rows, "invalid_values": counts}
+
+
+def validate_frame(df, specs, first_row=2):
+    """
+    Cast the columns that have a spec and split off the rows that fail it. Every check is a column-wise
+    cast or mask; reasons are put together only for the rejected rows.
+
+    Returns (valid rows with the cast columns, rejected rows as they were read with _row and _errors,
+    invalid value counts by column). _row is the row index plus first_row: by default the row's number
+    in the source file, the header being row 1.
+    """
+    if not specs:
+        return df, None, {}
+    columns = {}
+    checks = []
+    for name, spec in specs.items():
+        if name not in df.columns:
+            continue
+        series = df[name]
+        values, problems = _coerce(series, spec)
+        if values is not series:
+            columns[name] = values
+        checks.extend((name, message, mask) for message, mask in problems)
+
+    source = df
+    if columns:
+        # Only the cast columns are replaced; the others keep their blocks rather than being stacked again
+        df = df.copy(deep=False)
+        for name, values in columns.items():
+            df[name] = values
+    rejected = np.zeros(len(df), dtype=bool)
+    counts = {}
+    for name, message, mask in checks:
+        rejected |= mask
+        if mask.any():
+            counts[name] = counts.get(name, 0) + int(mask.sum())
+    if not rejected.any():
+        return df, None, counts
+
+    # Rejected rows share a few combinations of failed checks; each combination is labelled once
+    hits = np.stack([mask[rejected] for _, _, mask in checks], axis=1)
+    packed = np.ascontiguousarray(np.packbits(hits, axis=1))
+    keys = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    labels = np.array([
+        "; ".join(f"{name}: {message}" for (name, message, _), hit in zip(checks, hits[row]) if hit)
+        for row in first
+    ], dtype=object)
+    reasons = labels[inverse.ravel()]
+    rejects = source[rejected].copy()
+    rejects.insert(0, ROW_COLUMN, source.index[rejected] + first_row)
+    rejects[ERRORS_COLUMN] = reasons
+    return df[~rejected], rejects, counts
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import asyncio
+import multiprocessing
+from config import setting
+from config.logger import logger
+
+_process_pool = None
+
+
+def get_process_pool():
+    """Lazily created per-worker pool for CPU bound pandas work."""
+    global _process_pool
+    if _process_pool is None:
+        logger.info(f"starting sync process pool with {setting.SYNC_PROCESS_POOL_WORKERS} workers")
+        _process_pool = ProcessPoolExecutor(
+            max_workers=setting.SYNC_PROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+async def run_in_process(func, *args, **kwargs):
+    """Run a picklable, module level function off the event loop."""
+    call = partial(func, *args, **kwargs)
+    if setting.SYNC_PROCESS_POOL_WORKERS <= 0:
+        return await asyncio.to_thread(call)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_process_pool(), call)
+    except BrokenProcessPool:
+        # A crashed child (e.g. OOM killed) poisons the pool; start a fresh one for the next request
+        logger.error("sync process pool is broken, recreating it")
+        shutdown_process_pool()
+        raise
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
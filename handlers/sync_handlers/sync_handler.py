@@ -1,55 +1,131 @@
-from DAO.output_schema_dao import OutputSchemaDAO
 from handlers.sync_handlers.sync_handler_excel import SyncHandlerExcel
 from handlers.sync_handlers.sync_handler_csv import SyncHandlerCSV
+from handlers.sync_handlers.column_mapping_cache import ColumnMappingCache
+from handlers.sync_handlers.output_schema_cache import OutputSchemaCache
+from handlers.sync_handlers.llm_mapping_batcher import LLMMappingBatcher
+from handlers.sync_handlers.columnar_output import output_options, columnar_filename
 from config.logger import log_errors, logger
+from starlette.concurrency import run_in_threadpool
+from config import setting
+from config.database import SessionLocal
+import asyncio
+import time
 
 class SyncHandler:
-    def __init__(self, session):
-        self.session = session
-        self.output_schema_dao = OutputSchemaDAO(self.session)
-        self.sync_handler_csv = SyncHandlerCSV()
-        self.sync_handler_excel = SyncHandlerExcel()
+    def __init__(self, session_factory=SessionLocal, progress_callback=None):
+        # The caches open a short-lived session per query from session_factory, as the files of a sync
+        # reach them from several threads at once; no session is shared with the caller
+        self.session_factory = session_factory
+        # Called as progress_callback(filename, stage, report) when a file starts, finishes or is skipped;
+        # report holds the finished file's timings and mapping summary
+        self.progress_callback = progress_callback
+        self.output_schema_cache = OutputSchemaCache(self.session_factory)
+        self.mapping_cache = ColumnMappingCache(self.session_factory)
+        self.sync_handler_csv = SyncHandlerCSV(mapping_cache=self.mapping_cache)
+        self.sync_handler_excel = SyncHandlerExcel(mapping_cache=self.mapping_cache)
 
     async def handle(self, sync_metadata, files):
+        return [processed_file async for processed_file in self.iter_handle(sync_metadata=sync_metadata, files=files)]
+
+    async def iter_handle(self, sync_metadata, files):
+        """Yield processed files in input order, each as soon as it and the files before it are done."""
         try:
-            processed_files = []
-            output_schemas_dict = self.get_output_schemas(sync_metadata=sync_metadata)
-
-            for file in files:
-                filename = file.filename
-                logger.info(f"processing file : {filename}")
-
-                file_metadata = sync_metadata["file_metadatas"].get(filename, None)
-                logger.info(f"file_metadata : {file_metadata}")
-                if file_metadata is None:
-                    logger.error(f"schema not found for file {filename}")
-                    continue
-
-                output_schema = output_schemas_dict.get(file_metadata.get("schema_uuid"), None)
-                logger.info(f"file_schema : {output_schema}")
-                if output_schema is None:
-                    logger.error(f"schema not found for file {filename}")
-                    continue
-
-                file_extension = filename.split('.')[-1]
-                processed_file = None
-                if file_extension == 'csv' and output_schema is not None:
-                    processed_file = await self.sync_handler_csv.handle(output_schema, file)
-                elif file_extension in ['xlsx', 'xls'] and output_schema is not None:
-                    sheet_name = file_metadata.get("sheet", None)
-                    if sheet_name is not None:
-                        processed_file = await self.sync_handler_excel.handle(output_schema, file, sheet_name)
-                if processed_file is not None:
-                    processed_files.append(processed_file)
-            return processed_files
+            # The schema reads go through a sync session, off the event loop
+            output_schemas_dict = await run_in_threadpool(self.get_output_schemas, sync_metadata=sync_metadata)
+            semaphore = asyncio.Semaphore(setting.SYNC_MAX_CONCURRENT_FILES)
+            # Files that need the LLM for their mapping share as few calls as possible
+            llm_batcher = LLMMappingBatcher(participants=len(files)) if setting.LLM_BATCH_MAPPING and len(files) > 1 else None
+
+            # Files are processed concurrently; awaiting the tasks in turn keeps the results in input order
+            tasks = [
+                asyncio.ensure_future(self._handle_file(file=file, sync_metadata=sync_metadata, output_schemas_dict=output_schemas_dict, semaphore=semaphore, llm_batcher=llm_batcher))
+                for file in files
+            ]
+            try:
+                for task in tasks:
+                    processed_file = await task
+                    if processed_file is not None:
+                        yield processed_file
+            finally:
+                # A consumer that stops early (e.g. a dropped download) cancels the files still in flight
+                for task in tasks:
+                    task.cancel()
         except Exception as e:
             logger.error(f"Error in syncing Schema: {e}")
             raise e
 
+    async def _handle_file(self, file, sync_metadata, output_schemas_dict, semaphore, llm_batcher=None):
+        filename = file.filename
+        participant = llm_batcher.participant(filename) if llm_batcher is not None else None
+        try:
+            return await self._process_file(file, sync_metadata, output_schemas_dict, semaphore, participant)
+        finally:
+            # A file that never asked the LLM (skipped, mapped locally or from cache, failed) must not hold up the batch
+            if participant is not None:
+                participant.leave()
+
+    async def _process_file(self, file, sync_metadata, output_schemas_dict, semaphore, llm_batcher):
+        filename = file.filename
+        logger.info(f"processing file : {filename}")
+
+        file_metadata = sync_metadata["file_metadatas"].get(filename, None)
+        logger.info(f"file_metadata : {file_metadata}")
+        if file_metadata is None:
+            logger.error(f"schema not found for file {filename}")
+            self._report_progress(filename, "skipped")
+            return None
+
+        output_schema = output_schemas_dict.get(file_metadata.get("schema_uuid"), None)
+        logger.info(f"file_schema : {output_schema}")
+        if output_schema is None:
+            logger.error(f"schema not found for file {filename}")
+            self._report_progress(filename, "skipped")
+            return None
+
+        schema_uuid = file_metadata.get("schema_uuid")
+        output_format, output_compression = output_options(file_metadata, sync_metadata)
+        # Rows failing the schema's column specs are dropped from the output either way; this adds a reject file beside it
+        keep_rejects = bool(file_metadata.get("rejects", sync_metadata.get("rejects", False)))
+        file_extension = filename.split('.')[-1]
+        processed_file = None
+        # Mapping runs for every file at once so the LLM questions can be batched; the semaphore bounds the parse and transform
+        self._report_progress(filename, "processing")
+        start = time.perf_counter()
+        if file_extension == 'csv' and file_metadata.get("stream", sync_metadata.get("stream", False)):
+            processed_file = await self.sync_handler_csv.handle_stream(output_schema, file, schema_uuid=schema_uuid, llm_batcher=llm_batcher, keep_rejects=keep_rejects)
+        elif file_extension == 'csv':
+            processed_file = await self.sync_handler_csv.handle(output_schema, file, schema_uuid=schema_uuid, llm_batcher=llm_batcher, transform_slot=semaphore, keep_rejects=keep_rejects)
+        elif file_extension in ['xlsx', 'xls']:
+            sheet_name = file_metadata.get("sheet", None)
+            if sheet_name is not None:
+                processed_file = await self.sync_handler_excel.handle(output_schema, file, sheet_name, schema_uuid=schema_uuid, llm_batcher=llm_batcher, transform_slot=semaphore, keep_rejects=keep_rejects)
+        if processed_file is not None:
+            if output_format is not None:
+                processed_file.update(
+                    filename=columnar_filename(filename, output_format),
+                    output_format=output_format,
+                    output_compression=output_compression,
+                )
+            processed_file["timings"]["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            logger.info(f"processed file {filename} : {processed_file['timings']}")
+            report = {"timings": processed_file["timings"], "mapping": processed_file.get("mapping")}
+            if processed_file.get("validation"):
+                report["validation"] = processed_file["validation"]
+            self._report_progress(filename, "done", report)
+        else:
+            self._report_progress(filename, "skipped")
+        return processed_file
+
+    def _report_progress(self, filename, stage, report=None):
+        if self.progress_callback is not None:
+            self.progress_callback(filename, stage, report)
+
     @log_errors
     def get_output_schemas(self, sync_metadata):
-        output_schemas_dict = {}
-        output_schemas = self.output_schema_dao.get_output_schemas_by_user_uuid(user_uuid=sync_metadata["user_uuid"])
-        for output_schema in output_schemas:
-            output_schemas_dict[output_schema["schema_uuid"]] = output_schema["schema"]
-        return output_schemas_dict
\ No newline at end of file
+        # Only the schemas this sync references are read, not every schema the user owns
+        schema_uuids = [
+            file_metadata.get("schema_uuid")
+            for file_metadata in sync_metadata["file_metadatas"].values()
+            if file_metadata and file_metadata.get("schema_uuid")
+        ]
+        return self.output_schema_cache.get_schemas(user_uuid=sync_metadata["user_uuid"], schema_uuids=schema_uuids)
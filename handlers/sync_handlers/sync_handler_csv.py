@@ -1,18 +1,79 @@
 from config.logger import log_errors, logger
-import pandas as pd
-import io
+from config import setting
 import json
-from groq import Groq
-import os
-from dotenv import load_dotenv
+import asyncio
+import time
+import weakref
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from handlers.sync_handlers.llm_client import LLMClient
+from handlers.sync_handlers.sync_executor import run_in_process
+from handlers.sync_handlers.upload_spool import upload_path, upload_listing, spool_upload, remove_spool
+from handlers.sync_handlers.column_pruning import prune_mapping
+from handlers.sync_handlers.csv_loader import read_csv_header, read_csv_columns, iter_csv_columns
+from handlers.sync_handlers.schema_validation import column_specs, validate_frame, validation_summary, reject_columns
+from handlers.sync_handlers.sync_output_writer import RejectSpool
+from handlers.sync_handlers.column_matcher import match_columns, local_mapping_result, confidence_by_column, mapping_summary, split_match, merge_partial_mapping
+
+
+def _read_and_transform(path, mapping_result, output_schema, keep_rejects=False):
+    """
+    Parse, project and validate the full CSV. Runs in the sync process pool.
+    Returns (valid rows, timings, validation counts or None, rejected rows if keep_rejects).
+    """
+    start = time.perf_counter()
+    # Only the mapped columns are parsed, straight from the upload on disk
+    usecols, pruned_mapping = prune_mapping(mapping_result)
+    df = read_csv_columns(path, usecols)
+    parsed = time.perf_counter()
+    processed_file = SyncHandlerCSV._create_output_dataframe(df=df, mapping_result=pruned_mapping, output_schema=output_schema)
+    transformed = time.perf_counter()
+    timings = {
+        "parse_ms": round((parsed - start) * 1000, 2),
+        "transform_ms": round((transformed - parsed) * 1000, 2),
+    }
+    validation, rejects = None, None
+    specs = column_specs(output_schema)
+    if specs:
+        processed_file, rejects, counts = validate_frame(processed_file, specs)
+        timings["validate_ms"] = round((time.perf_counter() - transformed) * 1000, 2)
+        validation = validation_summary(0 if rejects is None else len(rejects), counts)
+    if keep_rejects and rejects is None:
+        rejects = pd.DataFrame(columns=reject_columns(processed_file.columns))
+    return processed_file, timings, validation, rejects if keep_rejects else None
+
+
+def _iter_output_chunks(path, mapping_result, output_schema, chunk_size, validation=None, reject_spool=None):
+    """
+    Yield projected chunks of a spooled CSV; memory is bounded by chunk_size, not the file size.
+    Rows that fail the schema's column specs are dropped, counted into validation once the file has
+    been read through, and appended to reject_spool.
+    """
+    usecols, pruned_mapping = prune_mapping(mapping_result)
+    specs = column_specs(output_schema)
+    rejected_rows, counts = 0, {}
+    try:
+        for chunk in iter_csv_columns(path, usecols, chunk_size):
+            chunk = SyncHandlerCSV._create_output_dataframe(df=chunk, mapping_result=pruned_mapping, output_schema=output_schema)
+            if specs:
+                chunk, rejects, chunk_counts = validate_frame(chunk, specs)
+                for name, count in chunk_counts.items():
+                    counts[name] = counts.get(name, 0) + count
+                if rejects is not None:
+                    rejected_rows += len(rejects)
+                    if reject_spool is not None:
+                        reject_spool.append(rejects)
+            yield chunk
+        if specs and validation is not None:
+            validation.update(validation_summary(rejected_rows, counts))
+    finally:
+        remove_spool(path)
 
-load_dotenv()
 
 class SyncHandlerCSV:
-    def __init__(self):
-        self.client = Groq(
-            api_key=os.environ.get("GROQ_API_KEY"),
-        )
+    def __init__(self, mapping_cache=None):
+        self.llm_client = LLMClient()
+        self.mapping_cache = mapping_cache
 
     async def _get_column_mapping(self, csv_columns, output_schema):
         prompt = f"""
@@ -47,22 +108,10 @@ class SyncHandlerCSV:
             }}
         """
 
+        response_content = None
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=os.environ.get("GROQ_MODEL","openai/gpt-oss-20b"),
-                stream=False,
-                temperature=0.1,  # Low temperature for consistent mapping
-            )
-            
-            response_content = chat_completion.choices[0].message.content.strip()
-            logger.info(f"Groq LLM response: {response_content}")
-            
+            response_content = await self.llm_client.complete(prompt)
+
             # Parse the JSON response
             mapping_result = json.loads(response_content)
             return mapping_result
@@ -70,15 +119,29 @@ class SyncHandlerCSV:
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse LLM response as JSON: {e}")
             logger.error(f"Response content: {response_content}")
-            # Fallback to exact matching
-            return self._fallback_exact_matching(csv_columns, output_schema)
+            # Fallback to local matching
+            return self._fallback_local_matching(csv_columns, output_schema)
+        except asyncio.TimeoutError:
+            logger.error(f"Groq API call timed out (timeout {setting.GROQ_TIMEOUT_SECONDS}s per attempt)")
+            # Fallback to local matching
+            return self._fallback_local_matching(csv_columns, output_schema)
         except Exception as e:
             logger.error(f"Error calling Groq API: {e}")
-            # Fallback to exact matching
-            return self._fallback_exact_matching(csv_columns, output_schema)
+            # Fallback to local matching
+            return self._fallback_local_matching(csv_columns, output_schema)
 
+    @staticmethod
+    def _fallback_local_matching(csv_columns, output_schema):
+        """Mapping from the local matcher alone, used when the LLM gives no usable answer"""
+        target_columns = list(output_schema.keys())
+        match = match_columns(csv_columns, target_columns)
+        mapping_result = local_mapping_result(match, target_columns, setting.COLUMN_MATCH_FALLBACK_THRESHOLD)
+        if mapping_result.get("error") is not True:
+            mapping_result["mapping_source"] = "local_fallback"
+        return mapping_result
 
-    def _create_output_dataframe(self, df, mapping_result, output_schema):
+    @staticmethod
+    def _create_output_dataframe(df, mapping_result, output_schema):
         """Create the output dataframe based on mapping results"""
         updated_columns = list(output_schema.keys())
         
@@ -93,21 +156,124 @@ class SyncHandlerCSV:
         mapped_df.columns = updated_columns
         return mapped_df
 
+    async def _get_partial_mapping(self, columns, output_schema, match, llm_batcher=None):
+        """
+        Keep the confidently matched columns and ask the LLM only about the rest: the unresolved schema
+        keys against the source columns not yet claimed. Its answer is merged back into full reordered_columns.
+        With an llm_batcher the question shares one call with the other files of the sync.
+        """
+        target_columns = list(output_schema.keys())
+        resolved, unresolved_targets, unclaimed_sources = split_match(match, setting.COLUMN_MATCH_THRESHOLD)
+        partial_columns = [columns[source] for source in unclaimed_sources]
+        partial_schema = {target_columns[target]: output_schema[target_columns[target]] for target in unresolved_targets}
+        logger.info(f"{len(resolved)} of {len(target_columns)} columns matched locally, asking the LLM about {len(partial_schema)}")
+        partial_result = None
+        if llm_batcher is not None:
+            partial_result = await llm_batcher.request("csv", partial_columns, partial_schema, len(partial_columns))
+        if partial_result is None:
+            partial_result = await self._get_column_mapping(partial_columns, partial_schema)
+        if partial_result.get("error") is True:
+            return partial_result
+
+        reordered_columns = merge_partial_mapping(resolved, unresolved_targets, unclaimed_sources, partial_result.get("reordered_columns"))
+        if reordered_columns is None:
+            logger.error(f"Invalid partial mapping from the LLM: {partial_result.get('reordered_columns')}")
+            return self._fallback_local_matching(columns, output_schema)
+        return {
+            "reordered_columns": reordered_columns,
+            "error": False,
+            "error_message": None,
+            "mapping_source": partial_result.get("mapping_source") or ("hybrid" if resolved else "llm"),
+            "confidence": confidence_by_column(match, target_columns, reordered_columns),
+        }
+
+    async def _resolve_mapping(self, columns, output_schema, schema_uuid, llm_batcher=None):
+        # Reuse a cached mapping for a known header layout
+        cache_key = None
+        mapping_result = None
+        if self.mapping_cache is not None:
+            fingerprint = self.mapping_cache.header_fingerprint(columns)
+            cache_key = self.mapping_cache.make_key("csv", fingerprint, output_schema)
+            mapping_result = await run_in_threadpool(self.mapping_cache.get, cache_key, schema_uuid=schema_uuid)
+        if mapping_result is None:
+            # Headers that all match confidently are mapped locally; only the rest go to the Groq LLM
+            target_columns = list(output_schema.keys())
+            match = match_columns(columns, target_columns)
+            mapping_result = local_mapping_result(match, target_columns, setting.COLUMN_MATCH_THRESHOLD)
+            if mapping_result.get("error") is True:
+                mapping_result = await self._get_partial_mapping(columns, output_schema, match, llm_batcher)
+                # A fallback after a failed LLM call is not cached, so the next file gets the LLM again
+                if cache_key is not None and mapping_result.get("mapping_source") in ("llm", "hybrid"):
+                    await run_in_threadpool(self.mapping_cache.set, cache_key, schema_uuid, mapping_result)
+        if mapping_result.get("error") is True:
+            raise Exception(mapping_result.get("error_message"))
+        return mapping_result
+
     @log_errors
-    async def handle(self, output_schema, file):
+    async def handle(self, output_schema, file, schema_uuid=None, llm_batcher=None, transform_slot=None, keep_rejects=False):
         """Main handler method"""
-        # Read file contents
+        # The upload is read from disk by path; its bytes are never loaded onto the heap
         filename = file.filename
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
+        start = time.perf_counter()
+        path = upload_path(file)
+        # The header alone is enough to resolve the mapping; the full parse happens in the process pool.
+        # A staged file already carries it
+        columns = (upload_listing(file) or {}).get("columns") or read_csv_header(path)
+        read_done = time.perf_counter()
         
-        # Get intelligent column mapping using Groq LLM
-        mapping_result = await self._get_column_mapping(list(df.columns), output_schema)
-        if mapping_result.get("error") is True:
-            raise Exception(mapping_result.get("error_message"))
-        processed_file = self._create_output_dataframe(df=df, mapping_result=mapping_result, output_schema=output_schema)
+        mapping_result = await self._resolve_mapping(columns, output_schema, schema_uuid, llm_batcher)
+        mapping_done = time.perf_counter()
+
+        # Mapping waits on the LLM outside the slot; only the parse and transform are bounded by it
+        async with transform_slot or asyncio.Semaphore(1):
+            processed_file, timings, validation, rejects = await run_in_process(_read_and_transform, path, mapping_result, output_schema, keep_rejects)
+        file_detail = {
+            "filename": filename,
+            "file": processed_file,
+            "mapping": mapping_summary(mapping_result),
+            "timings": {
+                "read_ms": round((read_done - start) * 1000, 2),
+                "mapping_ms": round((mapping_done - read_done) * 1000, 2),
+                **timings,
+            },
+            "validation": validation,
+            "rejects": rejects,
+        }
+        return file_detail
+
+    @log_errors
+    async def handle_stream(self, output_schema, file, schema_uuid=None, llm_batcher=None, keep_rejects=False):
+        """Streaming handler: map from the header, then transform the rest lazily in chunks"""
+        filename = file.filename
+        start = time.perf_counter()
+        # The upload is closed before the response body is sent, so the stream reads its own spooled link or copy
+        path = await spool_upload(file, suffix=".csv")
+        try:
+            columns = (upload_listing(file) or {}).get("columns") or read_csv_header(path)
+            read_done = time.perf_counter()
+            mapping_result = await self._resolve_mapping(columns, output_schema, schema_uuid, llm_batcher)
+        except BaseException:
+            remove_spool(path)
+            raise
+        mapping_done = time.perf_counter()
+
+        # Filled in by the chunks as they are read
+        validation = {}
+        reject_spool = RejectSpool(list(output_schema.keys())) if keep_rejects else None
+        chunks = _iter_output_chunks(path, mapping_result, output_schema, setting.SYNC_STREAM_CHUNK_ROWS, validation, reject_spool)
+        # Covers a stream that is dropped before it is ever iterated
+        weakref.finalize(chunks, remove_spool, path)
         file_detail = {
             "filename": filename,
-            "file": processed_file
+            "file": chunks,
+            "streaming": True,
+            "columns": list(output_schema.keys()),
+            "mapping": mapping_summary(mapping_result),
+            "timings": {
+                "read_ms": round((read_done - start) * 1000, 2),
+                "mapping_ms": round((mapping_done - read_done) * 1000, 2),
+            },
+            "validation": validation,
+            "rejects": reject_spool,
         }
-        return file_detail
\ No newline at end of file
+        return file_detail
@@ -1,18 +1,64 @@
 from config.logger import log_errors, logger
-import pandas as pd
-from io import BytesIO
+from config import setting
 import json
-from groq import Groq
-import os
-from dotenv import load_dotenv
+import asyncio
+import time
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from handlers.sync_handlers.llm_client import LLMClient
+from handlers.sync_handlers.sync_executor import run_in_process
+from handlers.sync_handlers.column_pruning import prune_mapping
+from handlers.sync_handlers.column_matcher import match_columns, local_mapping_result, confidence_by_column, mapping_summary, split_match, merge_partial_mapping
+from handlers.sync_handlers.upload_spool import upload_path, upload_listing
+from handlers.sync_handlers.excel_loader import read_sheet_names, read_sheet_preview, read_sheet
+from handlers.sync_handlers.header_detector import detect_header_row, header_view
+from handlers.sync_handlers.schema_validation import column_specs, validate_frame, validation_summary, reject_columns
+
+
+def _read_sheet_preview(path, sheet_name, n_rows, available_sheets=None):
+    """
+    Return the workbook's sheet names and the first rows of the target sheet, without a header. Runs in the sync process pool.
+    available_sheets skips re-reading the names when they are already known, e.g. from the staging store.
+    """
+    if available_sheets is None:
+        available_sheets = read_sheet_names(path)
+    if sheet_name not in available_sheets:
+        return available_sheets, None
+    return available_sheets, read_sheet_preview(path, sheet_name, n_rows, header=None)
+
+
+def _read_and_transform(path, sheet_name, mapping_result, output_schema, keep_rejects=False):
+    """
+    Parse, project and validate only the target sheet. Runs in the sync process pool.
+    Returns (valid rows, timings, validation counts or None, rejected rows if keep_rejects).
+    """
+    start = time.perf_counter()
+    # Only the mapped columns of the target sheet are parsed
+    usecols, pruned_mapping = prune_mapping(mapping_result)
+    sheet_df = read_sheet(path, sheet_name, usecols=usecols)
+    parsed = time.perf_counter()
+    processed_sheet = SyncHandlerExcel._create_output_dataframe(sheet_df=sheet_df, mapping_result=pruned_mapping, output_schema=output_schema)
+    transformed = time.perf_counter()
+    timings = {
+        "parse_ms": round((parsed - start) * 1000, 2),
+        "transform_ms": round((transformed - parsed) * 1000, 2),
+    }
+    validation, rejects = None, None
+    specs = column_specs(output_schema)
+    if specs:
+        # Row labels follow the sheet's rows under its first, so _row is the sheet row number
+        processed_sheet, rejects, counts = validate_frame(processed_sheet, specs)
+        timings["validate_ms"] = round((time.perf_counter() - transformed) * 1000, 2)
+        validation = validation_summary(0 if rejects is None else len(rejects), counts)
+    if keep_rejects and rejects is None:
+        rejects = pd.DataFrame(columns=reject_columns(processed_sheet.columns))
+    return processed_sheet, timings, validation, rejects if keep_rejects else None
 
-load_dotenv()
 
 class SyncHandlerExcel:
-    def __init__(self):
-        self.client = Groq(
-            api_key=os.environ.get("GROQ_API_KEY"),
-        )
+    def __init__(self, mapping_cache=None):
+        self.llm_client = LLMClient()
+        self.mapping_cache = mapping_cache
 
     async def _get_column_mapping(self, sheeet_df, output_schema):
 
@@ -62,22 +108,10 @@ class SyncHandlerExcel:
             Now provide the JSON output based on the above instructions.
 
         """
+        response_content = None
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=os.environ.get("GROQ_MODEL","openai/gpt-oss-20b"),
-                stream=False,
-                temperature=0.1,  # Low temperature for consistent mapping
-            )
-            
-            response_content = chat_completion.choices[0].message.content.strip()
-            logger.info(f"Groq LLM response: {response_content}")
-            
+            response_content = await self.llm_client.complete(prompt)
+
             # Parse the JSON response
             mapping_result = json.loads(response_content)
             return mapping_result
@@ -85,11 +119,96 @@ class SyncHandlerExcel:
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse LLM response as JSON: {e}")
             logger.error(f"Response content: {response_content}")
+        except asyncio.TimeoutError:
+            logger.error(f"Groq API call timed out (timeout {setting.GROQ_TIMEOUT_SECONDS}s per attempt)")
         except Exception as e:
             logger.error(f"Error calling Groq API: {e}")
 
+    @staticmethod
+    def _preview_rows(sheet_df, num_rows):
+        """The preview as numbered rows for the prompt; row 0 is the first row of the sheet"""
+        rows = [f"row 0 : {sheet_df.columns.to_list()}"]
+        for i in range(num_rows):
+            rows.append(f"row {i+1} : {sheet_df.iloc[i].tolist()}")
+        return rows
+
+    async def _request_mapping(self, rows, output_schema, width, llm_batcher=None):
+        """The LLM's mapping of the preview rows, through the sync's shared call when there is an llm_batcher"""
+        mapping_result = None
+        if llm_batcher is not None:
+            mapping_result = await llm_batcher.request("excel", rows, output_schema, width)
+        if mapping_result is None:
+            mapping_result = await self._get_column_mapping(rows, output_schema)
+        return mapping_result
+
+    async def _get_full_mapping(self, sheet_df, output_schema, llm_batcher=None):
+        num_rows = min(5, len(sheet_df))
+        mapping_result = await self._request_mapping(self._preview_rows(sheet_df, num_rows), output_schema, sheet_df.shape[1], llm_batcher)
+        if mapping_result is not None and mapping_result.get("error") is not True:
+            mapping_result["mapping_source"] = "llm"
+            mapping_result["confidence"] = self._llm_confidence(sheet_df, mapping_result, list(output_schema.keys()))
+        return mapping_result
+
+    async def _get_partial_mapping(self, sheet_df, output_schema, match, llm_batcher=None):
+        """
+        Keep the first-row columns that matched confidently and ask the LLM only about the unresolved
+        schema keys, showing it just the preview columns not yet claimed. Its answer is merged back into
+        full reordered_columns. With nothing matched locally this is the full prompt.
+        """
+        target_columns = list(output_schema.keys())
+        resolved, unresolved_targets, unclaimed_sources = split_match(match, setting.COLUMN_MATCH_THRESHOLD)
+        if not resolved:
+            return await self._get_full_mapping(sheet_df, output_schema, llm_batcher)
+
+        partial_schema = {target_columns[target]: output_schema[target_columns[target]] for target in unresolved_targets}
+        logger.info(f"{len(resolved)} of {len(target_columns)} columns matched locally, asking the LLM about {len(partial_schema)}")
+        partial_df = sheet_df.iloc[:, unclaimed_sources]
+        partial_rows = self._preview_rows(partial_df, min(5, len(partial_df)))
+        partial_result = await self._request_mapping(partial_rows, partial_schema, partial_df.shape[1], llm_batcher)
+        if partial_result is None or partial_result.get("error") is True:
+            return partial_result
+        # Columns matched on the first row mean the header is the first row; a different answer needs the full prompt
+        if partial_result.get("skip_n_rows") not in (0, None):
+            logger.info("LLM placed the header after row 0 for a partial mapping, retrying with every column")
+            return await self._get_full_mapping(sheet_df, output_schema)
+
+        reordered_columns = merge_partial_mapping(resolved, unresolved_targets, unclaimed_sources, partial_result.get("reordered_columns"))
+        if reordered_columns is None:
+            logger.error(f"Invalid partial mapping from the LLM: {partial_result.get('reordered_columns')}")
+            return None
+        return {
+            "skip_n_rows": 0,
+            "reordered_columns": reordered_columns,
+            "error": False,
+            "error_message": None,
+            "mapping_source": "hybrid",
+            "confidence": confidence_by_column(match, target_columns, reordered_columns),
+        }
+
+    @staticmethod
+    def _fallback_local_matching(header, output_schema):
+        """Mapping of the first row from the local matcher alone, used when the LLM gives no usable answer"""
+        target_columns = list(output_schema.keys())
+        mapping_result = local_mapping_result(match_columns(header, target_columns), target_columns, setting.COLUMN_MATCH_FALLBACK_THRESHOLD)
+        if mapping_result.get("error") is not True:
+            mapping_result["mapping_source"] = "local_fallback"
+            mapping_result["skip_n_rows"] = 0
+        return mapping_result
+
+    @staticmethod
+    def _llm_confidence(sheet_df, mapping_result, target_columns):
+        """Local scores of the LLM's picks, against the header row it chose when that row is in the preview"""
+        skip_n_rows = mapping_result.get("skip_n_rows") or 0
+        if skip_n_rows == 0:
+            header = list(sheet_df.columns)
+        elif skip_n_rows <= len(sheet_df):
+            header = sheet_df.iloc[skip_n_rows - 1].tolist()
+        else:
+            return None
+        return confidence_by_column(match_columns(header, target_columns), target_columns, mapping_result.get("reordered_columns"))
 
-    def _create_output_dataframe(self, sheet_df, mapping_result, output_schema):
+    @staticmethod
+    def _create_output_dataframe(sheet_df, mapping_result, output_schema):
         """Create the output dataframe based on mapping results"""
         updated_columns = list(output_schema.keys())
         skip_n_rows = mapping_result.get("skip_n_rows", 0)
@@ -106,42 +225,75 @@ class SyncHandlerExcel:
         return mapped_df
 
     @log_errors
-    async def handle(self, output_schema, file, sheet_name: str):
+    async def handle(self, output_schema, file, sheet_name: str, schema_uuid=None, llm_batcher=None, transform_slot=None, keep_rejects=False):
         """Main handler method"""
-        # Read file contents
+        # The workbook is read from disk by path; its bytes are never loaded onto the heap
         filename = file.filename
-        contents = await file.read()
-        file_content = BytesIO(contents)
-        df = pd.read_excel(file_content, engine="openpyxl", sheet_name=None)
-
-        excel_file = pd.ExcelFile(file_content)
-        available_sheets = excel_file.sheet_names
+        start = time.perf_counter()
+        path = upload_path(file)
+        # Only the first rows are needed for the mapping; the full parse happens after it is resolved
+        staged_sheets = (upload_listing(file) or {}).get("sheet_names")
+        available_sheets, preview_rows = await run_in_process(_read_sheet_preview, path, sheet_name, setting.EXCEL_HEADER_SCAN_ROWS, staged_sheets)
+        read_done = time.perf_counter()
     
         # Validate sheet exists
         if sheet_name not in available_sheets:
             logger.error(f"Sheet '{sheet_name}' not found in file '{filename}'. ")
             logger.error(f"Available sheets: {available_sheets}")
             return None
-        
-        sheet_df = df[sheet_name]
-        rows = []
-        rows.append(f"row 0 : {sheet_df.columns.to_list()}")
 
+        # The header row is found locally, past any banner rows; mapping then works on the rows under it
+        header_row = detect_header_row(preview_rows, list(output_schema.keys()))
+        logger.info(f"Detected header row {header_row} in sheet '{sheet_name}' of '{filename}'")
+        sheet_df = header_view(preview_rows, header_row)
+        
         # Get the actual number of rows
         num_rows = min(5, len(sheet_df))
 
-        for i in range(num_rows):
-            row_as_list = sheet_df.iloc[i].tolist()
-            rows.append(f"row {i+1} : {row_as_list}")
-
-        mapping_result = await self._get_column_mapping(rows, output_schema)
+        # Reuse a cached mapping for a known sheet layout
+        cache_key = None
+        mapping_result = None
+        if self.mapping_cache is not None:
+            sample_rows = [sheet_df.iloc[i].tolist() for i in range(num_rows)]
+            fingerprint = self.mapping_cache.header_fingerprint(sheet_df.columns, sample_rows=sample_rows)
+            cache_key = self.mapping_cache.make_key(f"excel:{sheet_name}", fingerprint, output_schema)
+            mapping_result = await run_in_threadpool(self.mapping_cache.get, cache_key, schema_uuid=schema_uuid)
+        if mapping_result is None:
+            # A first row whose headers all match confidently is mapped locally; only the rest go to the Groq LLM
+            target_columns = list(output_schema.keys())
+            match = match_columns(sheet_df.columns, target_columns)
+            mapping_result = local_mapping_result(match, target_columns, setting.COLUMN_MATCH_THRESHOLD)
+            if mapping_result.get("error") is True:
+                mapping_result = await self._get_partial_mapping(sheet_df, output_schema, match, llm_batcher)
+                if mapping_result is None:
+                    mapping_result = self._fallback_local_matching(sheet_df.columns, output_schema)
+                # A fallback after a failed LLM call is not cached, so the next file gets the LLM again
+                if cache_key is not None and mapping_result.get("mapping_source") in ("llm", "hybrid"):
+                    await run_in_threadpool(self.mapping_cache.set, cache_key, schema_uuid, mapping_result)
+            else:
+                mapping_result["skip_n_rows"] = 0
         if mapping_result.get("error") is True:
             raise Exception(mapping_result.get("error_message"))
-        
-        processed_sheet = self._create_output_dataframe(sheet_df=sheet_df, mapping_result=mapping_result, output_schema=output_schema)
-        df[sheet_name] = processed_sheet
+        # skip_n_rows so far counts from the detected header row (and is cached that way, as banners vary between files)
+        mapping_result = {**mapping_result, "skip_n_rows": header_row + (mapping_result.get("skip_n_rows") or 0)}
+        mapping_done = time.perf_counter()
+
+        # Mapping waits on the LLM outside the slot; only the parse and transform are bounded by it
+        async with transform_slot or asyncio.Semaphore(1):
+            processed_sheet, timings, validation, rejects = await run_in_process(_read_and_transform, path, sheet_name, mapping_result, output_schema, keep_rejects)
+        # Untouched sheets are never parsed here; the output writer copies them from the upload, which must stay open until then
         file_detail = {
             "filename": filename,
-            "file": df
+            "file": processed_sheet,
+            "sheet_name": sheet_name,
+            "source": path,
+            "mapping": mapping_summary(mapping_result),
+            "timings": {
+                "read_ms": round((read_done - start) * 1000, 2),
+                "mapping_ms": round((mapping_done - read_done) * 1000, 2),
+                **timings,
+            },
+            "validation": validation,
+            "rejects": rejects,
         }
         return file_detail
\ No newline at end of file
@@ -0,0 +1,228 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+import asyncio
+import copy
+import multiprocessing
+import os
+import shutil
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from config import setting
+from config.database import SessionLocal
+from config.logger import logger
+from DAO.sync_job_dao import SyncJobDAO
+from handlers.sync_handlers.sync_handler import SyncHandler
+from handlers.sync_handlers.sync_output_writer import write_sync_output
+
+_job_pool = None
+
+
+def _init_job_worker():
+    # A job process is already isolated from the web workers, so its transforms run in its own threads
+    setting.SYNC_PROCESS_POOL_WORKERS = 0
+
+
+def get_job_pool():
+    """Lazily created per-worker pool that runs whole sync jobs."""
+    global _job_pool
+    if _job_pool is None:
+        logger.info(f"starting sync job pool with {setting.SYNC_JOB_WORKERS} workers")
+        _job_pool = ProcessPoolExecutor(
+            max_workers=setting.SYNC_JOB_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_job_worker,
+        )
+    return _job_pool
+
+
+def shutdown_job_pool():
+    global _job_pool
+    if _job_pool is not None:
+        _job_pool.shutdown(wait=False, cancel_futures=True)
+        _job_pool = None
+
+
+def job_dir(job_uuid):
+    return os.path.join(setting.SYNC_JOB_DIR, str(job_uuid))
+
+
+def job_inputs_dir(job_uuid):
+    return os.path.join(job_dir(job_uuid), "inputs")
+
+
+def _result_expiry():
+    return datetime.now(timezone.utc) + timedelta(seconds=setting.SYNC_JOB_RESULT_TTL_SECONDS)
+
+
+class _ProgressWriter:
+    """
+    Writes a job's progress from a single thread with a session of its own. The files' tasks report
+    progress on the event loop, so they only hand over a snapshot; one thread keeps the writes in order.
+    """
+
+    def __init__(self, job_uuid):
+        self.job_uuid = job_uuid
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-job-progress")
+        self._session = None
+
+    def write(self, progress):
+        self._executor.submit(self._write, copy.deepcopy(progress))
+
+    def _write(self, progress):
+        if self._session is None:
+            self._session = SessionLocal()
+        try:
+            SyncJobDAO(self._session).update_job(self.job_uuid, {"progress": progress})
+        except Exception as e:
+            # Progress is advisory; the job's final status is written apart from it
+            logger.error(f"Failed to write progress of sync job {self.job_uuid}: {e}")
+            self._session.rollback()
+
+    def close(self):
+        """Wait for the pending writes, so none of them lands after the job's final status."""
+        self._executor.shutdown(wait=True)
+        if self._session is not None:
+            self._session.close()
+
+
+def run_sync_job(job_uuid, sync_metadata, inputs):
+    """
+    Process one job end to end and leave its output under the job directory. Runs in the job pool.
+
+    `inputs` are (filename, path) pairs spooled into the job's inputs directory, which is removed
+    once the job finishes either way.
+    """
+    # This session is only used from the job's own thread; file progress goes through progress_writer
+    session = SessionLocal()
+    sync_job_dao = SyncJobDAO(session)
+    progress_writer = _ProgressWriter(job_uuid)
+    progress = {"stage": "processing", "files": {filename: {"stage": "queued"} for filename, _ in inputs}}
+
+    def update_progress(filename, stage, report):
+        progress["files"][filename] = {"stage": stage, **(report or {})}
+        progress_writer.write(progress)
+
+    files = []
+    try:
+        sync_job_dao.update_job(job_uuid, {"status": "running", "progress": copy.deepcopy(progress)})
+        files = [UploadFile(file=open(path, "rb"), filename=filename) for filename, path in inputs]
+        sync_handler = SyncHandler(progress_callback=update_progress)
+        try:
+            processed_files = asyncio.run(sync_handler.handle(sync_metadata=sync_metadata, files=files))
+        finally:
+            progress_writer.close()
+
+        progress["stage"] = "writing"
+        sync_job_dao.update_job(job_uuid, {"progress": copy.deepcopy(progress)})
+        result_path = os.path.join(job_dir(job_uuid), "result")
+        with open(result_path, "wb") as result_file:
+            result_filename, media_type = write_sync_output(result_file, processed_files)
+
+        progress["stage"] = "done"
+        sync_job_dao.update_job(job_uuid, {
+            "status": "succeeded",
+            "progress": copy.deepcopy(progress),
+            "result_path": result_path,
+            "result_filename": result_filename,
+            "result_media_type": media_type,
+            "expires_at": _result_expiry(),
+        })
+        logger.info(f"sync job {job_uuid} succeeded")
+    except Exception as e:
+        logger.error(f"sync job {job_uuid} failed: {e}", exc_info=True)
+        session.rollback()
+        progress["stage"] = "failed"
+        # Nothing of a failed job is downloadable, so a partially written result goes with its inputs
+        shutil.rmtree(job_dir(job_uuid), ignore_errors=True)
+        sync_job_dao.update_job(job_uuid, {
+            "status": "failed",
+            "progress": copy.deepcopy(progress),
+            "error": str(e),
+            "result_path": None,
+            "expires_at": _result_expiry(),
+        })
+    finally:
+        progress_writer.close()
+        for file in files:
+            file.file.close()
+        shutil.rmtree(job_inputs_dir(job_uuid), ignore_errors=True)
+        session.close()
+
+
+def _mark_failed(job_uuid, error):
+    shutil.rmtree(job_dir(job_uuid), ignore_errors=True)
+    session = SessionLocal()
+    try:
+        SyncJobDAO(session).update_job(job_uuid, {"status": "failed", "error": error, "result_path": None, "expires_at": _result_expiry()})
+    finally:
+        session.close()
+
+
+def submit_sync_job(job_uuid, sync_metadata, inputs):
+    """Queue a job on the pool; a job whose worker dies is marked failed here since it cannot report itself."""
+    def on_done(future):
+        if future.cancelled():
+            _mark_failed(job_uuid, "Job was cancelled before it started")
+            return
+        error = future.exception()
+        if error is None:
+            return
+        logger.error(f"sync job {job_uuid} crashed: {error}")
+        if isinstance(error, BrokenProcessPool):
+            # A crashed child (e.g. OOM killed) poisons the pool; start a fresh one for the next job
+            shutdown_job_pool()
+        _mark_failed(job_uuid, f"Job worker crashed: {error}")
+
+    future = get_job_pool().submit(run_sync_job, job_uuid, sync_metadata, inputs)
+    future.add_done_callback(on_done)
+    return future
+
+
+def cleanup_expired_job_results(session):
+    """Delete the files of jobs past their TTL, succeeded or failed, and mark the jobs expired."""
+    sync_job_dao = SyncJobDAO(session)
+    for job in sync_job_dao.get_expired_jobs(datetime.now(timezone.utc)):
+        shutil.rmtree(job_dir(job.job_uuid), ignore_errors=True)
+        sync_job_dao.update_job(job.job_uuid, {"status": "expired", "result_path": None})
+        logger.info(f"expired result of sync job {job.job_uuid}")
+
+
+def fail_orphaned_jobs(session):
+    """Mark queued or running jobs that no worker has touched for SYNC_JOB_STALE_SECONDS failed, e.g. after a restart."""
+    sync_job_dao = SyncJobDAO(session)
+    updated_before = datetime.now(timezone.utc) - timedelta(seconds=setting.SYNC_JOB_STALE_SECONDS)
+    for job in sync_job_dao.get_stale_jobs(updated_before):
+        shutil.rmtree(job_dir(job.job_uuid), ignore_errors=True)
+        sync_job_dao.update_job(job.job_uuid, {
+            "status": "failed",
+            "error": "Job was interrupted before it finished",
+            "result_path": None,
+            "expires_at": _result_expiry(),
+        })
+        logger.warning(f"marked orphaned sync job {job.job_uuid} failed")
+
+
+def _maintain_jobs(fail_orphaned):
+    session = SessionLocal()
+    try:
+        if fail_orphaned:
+            fail_orphaned_jobs(session)
+        cleanup_expired_job_results(session)
+    finally:
+        session.close()
+
+
+async def run_job_maintenance():
+    """
+    Started with the app: fail jobs orphaned by a previous run, then expire old job files every
+    SYNC_JOB_CLEANUP_INTERVAL_SECONDS whether or not new jobs arrive.
+    """
+    fail_orphaned = True
+    while True:
+        try:
+            await run_in_threadpool(_maintain_jobs, fail_orphaned)
+            fail_orphaned = False
+        except Exception as e:
+            logger.error(f"sync job maintenance failed: {e}")
+        await asyncio.sleep(setting.SYNC_JOB_CLEANUP_INTERVAL_SECONDS)
@@ -0,0 +1,217 @@
+import io
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+import tempfile
+import zipfile
+from config import setting
+from config.logger import logger
+from handlers.sync_handlers.excel_loader import read_sheet_names, read_sheet
+from handlers.sync_handlers.columnar_output import iter_columnar_bytes, columnar_media_type
+from handlers.sync_handlers.xlsx_package import open_package, iter_xlsx_with_replaced_sheet
+from handlers.sync_handlers.zip_stream import ZipStreamWriter
+from handlers.sync_handlers.schema_validation import reject_columns
+
+CSV_MEDIA_TYPE = "text/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MEDIA_TYPE = "application/zip"
+
+
+def _arrow_dates_as_text(frame):
+    """Arrow date columns cast to text by Arrow, which writes the same text pandas would build one date object at a time."""
+    dates = {
+        name: frame[name].astype(pd.ArrowDtype(pa.string()))
+        for name, dtype in frame.dtypes.items()
+        if isinstance(dtype, pd.ArrowDtype) and pa.types.is_date(dtype.pyarrow_dtype)
+    }
+    return frame.assign(**dates) if dates else frame
+
+
+def iter_csv_bytes(frames, columns=None):
+    """Serialize an iterable of DataFrame chunks to CSV bytes, writing the header once."""
+    header = True
+    for frame in frames:
+        yield _arrow_dates_as_text(frame).to_csv(index=False, header=header).encode("utf-8")
+        header = False
+    if header and columns is not None:
+        # Header-only input yields no chunks; still emit the header like the non-streaming path
+        yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+
+
+def iter_frame_chunks(df, chunk_rows):
+    """Split an in-memory DataFrame into row slices so it can be serialized incrementally."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def rejects_filename(filename):
+    return os.path.splitext(filename)[0] + ".rejects.csv"
+
+
+class RejectSpool:
+    """Rejected rows of a streamed file, appended chunk by chunk as CSV to a temporary file until the output is written."""
+
+    def __init__(self, columns):
+        self.columns = reject_columns(columns)
+        self._file = tempfile.TemporaryFile(dir=setting.SYNC_SPOOL_DIR)
+        self._header = True
+
+    def append(self, rejects):
+        self._file.write(_arrow_dates_as_text(rejects).to_csv(index=False, header=self._header).encode("utf-8"))
+        self._header = False
+
+    def iter_bytes(self, chunk_size=1024 * 1024):
+        try:
+            if self._header:
+                yield pd.DataFrame(columns=self.columns).to_csv(index=False).encode("utf-8")
+            self._file.seek(0)
+            while True:
+                chunk = self._file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self._file.close()
+
+
+def iter_reject_bytes(file_detail):
+    """The file's rejected rows as CSV bytes, with the row number first and the reasons last."""
+    rejects = file_detail["rejects"]
+    if isinstance(rejects, RejectSpool):
+        return rejects.iter_bytes()
+    return iter_csv_bytes(iter_frame_chunks(rejects, setting.SYNC_STREAM_CHUNK_ROWS), columns=list(rejects.columns))
+
+
+def write_excel(buffer, file_detail):
+    """Write the transformed sheet together with the workbook's other sheets, in their original order."""
+    for chunk in iter_excel_bytes(file_detail):
+        buffer.write(chunk)
+
+
+def iter_excel_bytes(file_detail):
+    """Yield the output workbook as byte chunks."""
+    source = file_detail["source"]
+    target_sheet = file_detail["sheet_name"]
+    try:
+        open_package(source).close()
+    except zipfile.BadZipFile:
+        # Legacy .xls has no zip parts to copy, so the whole workbook is re-serialized
+        buffer = io.BytesIO()
+        _write_excel_with_pandas(buffer, source, target_sheet, file_detail["file"])
+        yield buffer.getvalue()
+        return
+    # Only the transformed sheet is re-serialized; every other part is copied from the upload as-is
+    yield from iter_xlsx_with_replaced_sheet(source, target_sheet, file_detail["file"])
+
+
+def _write_excel_with_pandas(buffer, source, target_sheet, processed_sheet):
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        for sheet_name in read_sheet_names(source):
+            if sheet_name == target_sheet:
+                df = processed_sheet
+            else:
+                df = read_sheet(source, sheet_name)
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def build_sync_report(processed_files):
+    return {
+        "files": [
+            {
+                "filename": file_detail.get("filename"),
+                "timings": file_detail.get("timings"),
+                "mapping": file_detail.get("mapping"),
+                # A streamed file is only counted once it has been read through
+                **({"validation": file_detail["validation"]} if file_detail.get("validation") else {}),
+            }
+            for file_detail in processed_files
+        ]
+    }
+
+
+def sync_report_comment(processed_files):
+    """The sync report as a zip archive comment, or nothing if it does not fit in one."""
+    report = json.dumps(build_sync_report(processed_files)).encode("utf-8")
+    if len(report) > 0xFFFF:
+        logger.error("sync report exceeds the zip comment limit, omitting it")
+        return b""
+    return report
+
+
+def _csv_frames(file_detail):
+    file = file_detail.get("file")
+    if file_detail.get("streaming"):
+        return file, file_detail.get("columns")
+    return iter_frame_chunks(file, setting.SYNC_STREAM_CHUNK_ROWS), list(file.columns)
+
+
+def iter_columnar_output(file_detail):
+    """Yield the transformed frame in the file's output_format; for a workbook that is the transformed sheet alone."""
+    file = file_detail.get("file")
+    if file_detail.get("streaming"):
+        frames, columns = file, file_detail.get("columns")
+    else:
+        # Whole, so the column types are inferred from every row rather than the first slice
+        frames, columns = [file], list(file.columns)
+    return iter_columnar_bytes(frames, file_detail["output_format"], file_detail["output_compression"], columns=columns)
+
+
+def iter_zip_entry(zip_writer, idx, file_detail):
+    """Yield one processed file as a streamed entry of zip_writer."""
+    filename = file_detail.get("filename", f"{idx+1}-default.csv")
+    file_type = "csv" if filename.split(".")[-1] == "csv" else "excel"
+
+    if file_detail.get("output_format"):
+        # Compressed columnar files are stored as-is, like workbooks
+        compressed = file_detail["output_compression"] != "none"
+        compress_type = zipfile.ZIP_STORED if compressed or setting.SYNC_ZIP_COMPRESSION_LEVEL == 0 else zipfile.ZIP_DEFLATED
+        yield from zip_writer.write_stream(filename, iter_columnar_output(file_detail), compress_type=compress_type)
+
+    elif file_type == "csv":
+        frames, columns = _csv_frames(file_detail)
+        compress_type = zipfile.ZIP_STORED if setting.SYNC_ZIP_COMPRESSION_LEVEL == 0 else zipfile.ZIP_DEFLATED
+        yield from zip_writer.write_stream(filename, iter_csv_bytes(frames, columns=columns), compress_type=compress_type)
+
+    elif file_type == "excel":
+        # xlsx parts are deflated already, so the workbook is stored rather than compressed twice
+        yield from zip_writer.write_stream(filename, iter_excel_bytes(file_detail), compress_type=zipfile.ZIP_STORED)
+
+    if file_detail.get("rejects") is not None:
+        # After the output itself, so a streamed file's rejects are all spooled by then
+        compress_type = zipfile.ZIP_STORED if setting.SYNC_ZIP_COMPRESSION_LEVEL == 0 else zipfile.ZIP_DEFLATED
+        yield from zip_writer.write_stream(rejects_filename(filename), iter_reject_bytes(file_detail), compress_type=compress_type)
+
+
+def needs_zip(processed_files):
+    """Several outputs, or a reject file next to the output, go in a zip; a single output is returned as-is."""
+    return len(processed_files) != 1 or processed_files[0].get("rejects") is not None
+
+
+def write_sync_output(buffer, processed_files):
+    """
+    Write what /sync/ would return for processed_files to a binary file object: the file itself
+    for a single output without rejects, otherwise a zip. Returns the download filename and media type.
+    """
+    if not needs_zip(processed_files):
+        file_detail = processed_files[0]
+        filename = file_detail.get("filename", "output.csv")
+        if file_detail.get("output_format"):
+            for chunk in iter_columnar_output(file_detail):
+                buffer.write(chunk)
+            return filename, columnar_media_type(file_detail["output_format"])
+        if filename.split(".")[-1] == "csv":
+            frames, columns = _csv_frames(file_detail)
+            for chunk in iter_csv_bytes(frames, columns=columns):
+                buffer.write(chunk)
+            return filename, CSV_MEDIA_TYPE
+        write_excel(buffer, file_detail)
+        return filename, XLSX_MEDIA_TYPE
+
+    zip_writer = ZipStreamWriter(compresslevel=setting.SYNC_ZIP_COMPRESSION_LEVEL)
+    for idx, file_detail in enumerate(processed_files):
+        for chunk in iter_zip_entry(zip_writer, idx, file_detail):
+            buffer.write(chunk)
+    for chunk in zip_writer.close(comment=sync_report_comment(processed_files)):
+        buffer.write(chunk)
+    return "processed_files.zip", ZIP_MEDIA_TYPE
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from starlette.datastructures import UploadFile
+from config import setting
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+def upload_path(file):
+    """Filesystem path behind a disk-backed upload: a detached upload or a file from the staging store."""
+    return file.file.name
+
+
+def upload_listing(file):
+    """The sheet listing or CSV header the staging store recorded for a staged file, or None for an upload."""
+    return getattr(file.file, "listing", None)
+
+
+async def spool_upload(file, suffix=None, directory=None):
+    """Give an upload a private path of its own, hard-linked when it is already on disk, else copied in chunks."""
+    directory = directory or setting.SYNC_SPOOL_DIR
+    source_path = getattr(file.file, "name", None)
+    if isinstance(source_path, str):
+        path = tempfile.mktemp(prefix="schema_sync_", suffix=suffix or "", dir=directory)
+        try:
+            os.link(source_path, path)
+            return path
+        except OSError:
+            # Different filesystem (or no hard links); fall back to copying
+            pass
+    await file.seek(0)
+    fd, path = tempfile.mkstemp(prefix="schema_sync_", suffix=suffix or "", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as spool_file:
+            while True:
+                chunk = await file.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool_file.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def spool_request(request, suffix=None, directory=None):
+    """Write a raw request body to a private temp file as it arrives and return its path."""
+    fd, path = tempfile.mkstemp(prefix="schema_sync_", suffix=suffix or "", dir=directory or setting.SYNC_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as spool_file:
+            async for chunk in request.stream():
+                spool_file.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def detach_upload(file):
+    """
+    Copy an upload to a named temp file in fixed-size chunks and wrap it as a new UploadFile.
+
+    Readers get a path (see upload_path) instead of the bytes on the heap, and the copy stays
+    readable after FastAPI closes the request's form files, which happens before a streamed
+    response body is sent. Closing the copy deletes it.
+    """
+    await file.seek(0)
+    spool_file = tempfile.NamedTemporaryFile(prefix="schema_sync_", dir=setting.SYNC_SPOOL_DIR)
+    try:
+        while True:
+            chunk = await file.read(SPOOL_CHUNK_SIZE)
+            if not chunk:
+                break
+            spool_file.write(chunk)
+        spool_file.seek(0)
+    except BaseException:
+        spool_file.close()
+        raise
+    return UploadFile(file=spool_file, filename=file.filename)
+
+
+def remove_spool(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
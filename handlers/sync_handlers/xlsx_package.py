@@ -0,0 +1,423 @@
+from datetime import date, datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+import math
+import posixpath
+import re
+import struct
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from handlers.sync_handlers.zip_stream import ZipStreamWriter, ZIP_DEFLATED
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_REL = f"{REL_NS}/officeDocument"
+
+
+def open_package(source):
+    """Open an xlsx container from bytes, a path or a binary file object. Raises zipfile.BadZipFile for .xls."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(source)
+    return zipfile.ZipFile(source)
+
+
+def _resolve_target(base_part, target):
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def _rels_part(part):
+    return posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+
+
+def read_relationships(package, part):
+    """Return {relationship id: (type, resolved part name)} for a part, or {} if it has none."""
+    rels_part = _rels_part(part)
+    if rels_part not in package.NameToInfo:
+        return {}
+    root = ET.fromstring(package.read(rels_part))
+    return {
+        rel.get("Id"): (rel.get("Type"), _resolve_target(part, rel.get("Target")))
+        for rel in root.iter(f"{{{PACKAGE_REL_NS}}}Relationship")
+        if rel.get("TargetMode") != "External"
+    }
+
+
+def workbook_part(package):
+    root_rels = ET.fromstring(package.read("_rels/.rels"))
+    for rel in root_rels.iter(f"{{{PACKAGE_REL_NS}}}Relationship"):
+        if rel.get("Type") == OFFICE_DOCUMENT_REL:
+            return rel.get("Target").lstrip("/")
+    return "xl/workbook.xml"
+
+
+def read_workbook_sheets(package):
+    """List sheets in workbook order as dicts with name, state and the worksheet part, reading only workbook metadata."""
+    part = workbook_part(package)
+    relationships = read_relationships(package, part)
+    root = ET.fromstring(package.read(part))
+    sheets = []
+    for sheet in root.iter(f"{{{MAIN_NS}}}sheet"):
+        _, sheet_part = relationships.get(sheet.get(f"{{{REL_NS}}}id"), (None, None))
+        sheets.append({
+            "name": sheet.get("name"),
+            "state": sheet.get("state", "visible"),
+            "part": sheet_part,
+        })
+    return sheets
+
+
+SHARED_STRINGS_REL = f"{REL_NS}/sharedStrings"
+_CELL_REFERENCE = re.compile(r"([A-Z]+)(\d+)")
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _inline_text(element):
+    return "".join(text.text or "" for text in element.iter(f"{{{MAIN_NS}}}t"))
+
+
+def _read_first_row(package, sheet_part):
+    """Stream a worksheet only up to its first non-empty row; return (dimension ref, [(column, type, value)])."""
+    dimension = None
+    cells = []
+    with package.open(sheet_part) as sheet_stream:
+        for event, element in ET.iterparse(sheet_stream, events=("start", "end")):
+            if event == "start":
+                continue
+            if element.tag == f"{{{MAIN_NS}}}dimension":
+                dimension = element.get("ref")
+            elif element.tag == f"{{{MAIN_NS}}}c":
+                match = _CELL_REFERENCE.match(element.get("r") or "")
+                column = _column_index(match.group(1)) if match else len(cells)
+                cell_type = element.get("t", "n")
+                if cell_type == "inlineStr":
+                    value = _inline_text(element)
+                else:
+                    value_element = element.find(f"{{{MAIN_NS}}}v")
+                    value = value_element.text if value_element is not None else None
+                cells.append((column, cell_type, value))
+            elif element.tag == f"{{{MAIN_NS}}}row":
+                # Styled but empty rows carry cells without values; keep looking for the first real row
+                if any(value is not None for _, _, value in cells):
+                    break
+                cells = []
+                element.clear()
+            elif element.tag == f"{{{MAIN_NS}}}sheetData":
+                break
+    return dimension, cells
+
+
+def _read_shared_strings(package, part, wanted):
+    """Resolve only the wanted shared string indexes, stopping once the highest one is reached."""
+    resolved = {}
+    if not wanted or part is None or part not in package.NameToInfo:
+        return resolved
+    last = max(wanted)
+    index = 0
+    with package.open(part) as strings_stream:
+        for _, element in ET.iterparse(strings_stream, events=("end",)):
+            if element.tag != f"{{{MAIN_NS}}}si":
+                continue
+            if index in wanted:
+                resolved[index] = _inline_text(element)
+            element.clear()
+            if index >= last:
+                break
+            index += 1
+    return resolved
+
+
+def _cell_value(cell_type, value, shared_strings):
+    if value is None:
+        return None
+    if cell_type == "s":
+        return shared_strings.get(int(value))
+    if cell_type == "b":
+        return value == "1"
+    if cell_type == "n":
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def read_sheet_summaries(package):
+    """
+    Per-sheet dimension and first (header) row, read from sheet metadata.
+
+    Each worksheet is streamed only up to its first row, and shared strings only up to the
+    highest index a header needs, so no sheet is materialized.
+    """
+    part = workbook_part(package)
+    relationships = read_relationships(package, part)
+    shared_strings_part = next((target for rel_type, target in relationships.values() if rel_type == SHARED_STRINGS_REL), None)
+
+    first_rows = []
+    wanted = set()
+    for sheet in read_workbook_sheets(package):
+        dimension, cells = (None, [])
+        if sheet["part"] in package.NameToInfo:
+            dimension, cells = _read_first_row(package, sheet["part"])
+        wanted.update(int(value) for _, cell_type, value in cells if cell_type == "s" and value is not None)
+        first_rows.append((sheet, dimension, cells))
+
+    shared_strings = _read_shared_strings(package, shared_strings_part, wanted)
+    summaries = []
+    for sheet, dimension, cells in first_rows:
+        header = [None] * (max((column for column, _, _ in cells), default=-1) + 1)
+        for column, cell_type, value in cells:
+            header[column] = _cell_value(cell_type, value, shared_strings)
+        summaries.append({
+            "name": sheet["name"],
+            "state": sheet["state"],
+            "dimension": dimension,
+            "header": header,
+        })
+    return summaries
+
+
+STYLES_REL = f"{REL_NS}/styles"
+CALC_CHAIN_REL = f"{REL_NS}/calcChain"
+_LOCAL_HEADER_SIZE = 30
+_RAW_COPY_CHUNK = 1024 * 1024
+_EXCEL_EPOCH = np.datetime64("1899-12-30")
+_ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Built-in number formats, so date cells need no custom numFmt: 14 = short date, 22 = date and time
+_DATE_NUMBER_FORMAT = 14
+_DATETIME_NUMBER_FORMAT = 22
+
+
+def iter_raw_entry(package, zip_info):
+    """Yield an entry's stored bytes exactly as compressed in the source archive."""
+    package.fp.seek(zip_info.header_offset)
+    local_header = package.fp.read(_LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+    package.fp.seek(zip_info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+    remaining = zip_info.compress_size
+    while remaining > 0:
+        chunk = package.fp.read(min(_RAW_COPY_CHUNK, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"truncated entry {zip_info.filename}")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _string_cell(ref, value):
+    text = _ILLEGAL_XML_CHARS.sub("", escape(str(value)))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+
+def _number_cell(ref, value, style=None):
+    if not math.isfinite(value):
+        return ""
+    style_attr = f' s="{style}"' if style is not None else ""
+    return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+
+
+def _excel_serial(value):
+    return (np.datetime64(value, "ns") - _EXCEL_EPOCH) / np.timedelta64(1, "D")
+
+
+def _object_cell(ref, value, date_styles):
+    if value is None or value is pd.NaT:
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c r="{ref}"><v>{int(value)}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        return _number_cell(ref, float(value))
+    if isinstance(value, (datetime, date)) and date_styles is not None:
+        if isinstance(value, datetime):
+            return _number_cell(ref, float(_excel_serial(value.replace(tzinfo=None))), date_styles[1])
+        return _number_cell(ref, float(_excel_serial(value)), date_styles[0])
+    if isinstance(value, (datetime, date)):
+        return _string_cell(ref, value.isoformat())
+    return _string_cell(ref, value)
+
+
+def _column_cells(series, letter, first_row, date_styles):
+    """Render one column of a row chunk to cell XML, choosing the conversion once per dtype."""
+    rows = range(first_row, first_row + len(series))
+    if pd.api.types.is_bool_dtype(series.dtype) and not pd.api.types.is_object_dtype(series.dtype):
+        return [
+            "" if pd.isna(value) else f'<c r="{letter}{row}" t="b"><v>{int(value)}</v></c>'
+            for row, value in zip(rows, series.tolist())
+        ]
+    if pd.api.types.is_integer_dtype(series.dtype) and not series.hasnans:
+        return [f'<c r="{letter}{row}"><v>{value}</v></c>' for row, value in zip(rows, series.tolist())]
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.astype("float64").to_numpy(na_value=np.nan)
+        return [_number_cell(f"{letter}{row}", value) for row, value in zip(rows, values.tolist())]
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if getattr(series.dt, "tz", None) is not None:
+            series = series.dt.tz_localize(None)
+        serials = ((series - pd.Timestamp(_EXCEL_EPOCH)) / pd.Timedelta(days=1)).to_numpy(dtype="float64", na_value=np.nan)
+        if date_styles is None:
+            return [
+                "" if pd.isna(value) else _string_cell(f"{letter}{row}", value.isoformat())
+                for row, value in zip(rows, series.tolist())
+            ]
+        return [_number_cell(f"{letter}{row}", value, date_styles[1]) for row, value in zip(rows, serials.tolist())]
+    return [
+        "" if (isinstance(value, float) and math.isnan(value)) or value is pd.NA else _object_cell(f"{letter}{row}", value, date_styles)
+        for row, value in zip(rows, series.astype(object).tolist())
+    ]
+
+
+def iter_sheet_xml(df, date_styles=None, chunk_rows=10000):
+    """Serialize a DataFrame (header row plus data) as worksheet XML with inline strings."""
+    letters = [_column_letter(index) for index in range(len(df.columns))]
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+    )
+    if len(df.columns):
+        yield f'<dimension ref="A1:{letters[-1]}{len(df) + 1}"/>'
+    yield "<sheetData>"
+    header = "".join(_string_cell(f"{letter}1", column) for letter, column in zip(letters, df.columns))
+    yield f'<row r="1">{header}</row>'
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        first_row = start + 2
+        columns = [
+            _column_cells(chunk.iloc[:, index], letter, first_row, date_styles)
+            for index, letter in enumerate(letters)
+        ]
+        yield "".join(
+            f'<row r="{first_row + offset}">{"".join(cells)}</row>'
+            for offset, cells in enumerate(zip(*columns))
+        )
+    yield "</sheetData></worksheet>"
+
+
+def add_date_styles(styles_xml):
+    """
+    Append date and datetime cell formats to styles.xml and return (xml, (date_style, datetime_style)).
+
+    Edited as text so namespace prefixes and mc:Ignorable declarations survive untouched.
+    Returns (styles_xml, None) when the stylesheet has an unexpected shape.
+    """
+    match = re.search(r"<((?:[\w.-]+:)?)cellXfs\b[^>]*>(.*?)</\1cellXfs>", styles_xml, re.S)
+    if match is None:
+        return styles_xml, None
+    prefix, body = match.group(1), match.group(2)
+    existing = len(re.findall(rf"<{re.escape(prefix)}xf\b", body))
+    new_xfs = "".join(
+        f'<{prefix}xf numFmtId="{number_format}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        for number_format in (_DATE_NUMBER_FORMAT, _DATETIME_NUMBER_FORMAT)
+    )
+    opening = re.sub(r'\scount="\d+"', "", styles_xml[match.start():match.start(2)])
+    opening = opening[:-1] + f' count="{existing + 2}">'
+    patched = styles_xml[:match.start()] + opening + body + new_xfs + styles_xml[match.end(2):]
+    return patched, (existing, existing + 1)
+
+
+def _remove_overrides(xml, parts):
+    for part in parts:
+        xml = re.sub(rf"<Override\b[^>]*PartName=\"/{re.escape(part)}\"[^>]*/>", "", xml)
+    return xml
+
+
+def _remove_calc_chain(xml):
+    # The calculation chain may point at formula cells of the rewritten sheet; Excel rebuilds it when absent
+    return re.sub(rf"<Relationship\b[^>]*Type=\"{re.escape(CALC_CHAIN_REL)}\"[^>]*/>", "", xml)
+
+
+def _reachable_parts(package, roots, skip=()):
+    """Parts reachable from roots through their relationships; the relationships of parts in skip are not followed."""
+    reached = set()
+    pending = list(roots)
+    while pending:
+        part = pending.pop()
+        if part in reached:
+            continue
+        reached.add(part)
+        if part not in skip:
+            pending.extend(target for _, target in read_relationships(package, part).values())
+    return reached
+
+
+def _sheet_only_parts(package, sheet_part):
+    """
+    Parts only the sheet's relationships lead to (its tables, comments, drawings and their charts and
+    images), which are left without a reference once the sheet drops its relationships.
+    """
+    sheet_targets = [target for _, target in read_relationships(package, sheet_part).values()]
+    if not sheet_targets:
+        return set()
+    # "" is the package root, whose relationships are _rels/.rels
+    referenced = _reachable_parts(package, [""], skip={sheet_part})
+    return _reachable_parts(package, sheet_targets) - referenced
+
+
+def iter_xlsx_with_replaced_sheet(source, sheet_name, df, compresslevel=6):
+    """
+    Yield a copy of an xlsx package in which only `sheet_name` is rewritten from `df`.
+
+    Every other part (worksheets, shared strings, themes, drawings) is copied as its original
+    compressed bytes, so the cost depends on the size of the rewritten sheet, not the workbook.
+    The rewritten sheet drops its own relationships (tables, comments, drawings), which no longer
+    line up with the new cells, along with the parts nothing else refers to.
+    """
+    with open_package(source) as package:
+        sheets = {sheet["name"]: sheet for sheet in read_workbook_sheets(package)}
+        target_part = sheets[sheet_name]["part"]
+        target_rels_part = _rels_part(target_part)
+        workbook = workbook_part(package)
+        workbook_rels_part = _rels_part(workbook)
+        relationships = read_relationships(package, workbook)
+        styles_part = next((part for rel_type, part in relationships.values() if rel_type == STYLES_REL), None)
+        calc_chain_part = next((part for rel_type, part in relationships.values() if rel_type == CALC_CHAIN_REL), None)
+        dropped_parts = _sheet_only_parts(package, target_part)
+        if calc_chain_part is not None:
+            dropped_parts.add(calc_chain_part)
+        skipped = dropped_parts | {_rels_part(part) for part in dropped_parts} | {target_rels_part}
+
+        date_styles = None
+        patched_styles = None
+        if styles_part is not None and styles_part in package.NameToInfo:
+            patched_styles, date_styles = add_date_styles(package.read(styles_part).decode("utf-8"))
+
+        writer = ZipStreamWriter(compresslevel=compresslevel)
+        for zip_info in package.infolist():
+            name = zip_info.filename
+            if name in skipped:
+                continue
+            if name == target_part:
+                sheet_xml = (text.encode("utf-8") for text in iter_sheet_xml(df, date_styles=date_styles))
+                # Package parts keep plain headers, which every xlsx reader accepts
+                yield from writer.write_stream(name, sheet_xml, compress_type=ZIP_DEFLATED, zip64=False)
+            elif name == styles_part and date_styles is not None:
+                yield from writer.write_bytes(name, patched_styles.encode("utf-8"), date_time=zip_info.date_time)
+            elif dropped_parts and name == "[Content_Types].xml":
+                xml = _remove_overrides(package.read(name).decode("utf-8"), dropped_parts)
+                yield from writer.write_bytes(name, xml.encode("utf-8"), date_time=zip_info.date_time)
+            elif calc_chain_part is not None and name == workbook_rels_part:
+                xml = _remove_calc_chain(package.read(name).decode("utf-8"))
+                yield from writer.write_bytes(name, xml.encode("utf-8"), date_time=zip_info.date_time)
+            else:
+                yield from writer.write_raw(
+                    name, iter_raw_entry(package, zip_info), zip_info.CRC, zip_info.compress_size,
+                    zip_info.file_size, zip_info.compress_type, date_time=zip_info.date_time,
+                )
+        yield from writer.close()
@@ -0,0 +1,171 @@
+import struct
+import time
+import zlib
+from zipfile import ZIP_DEFLATED
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_ZIP64_DATA_DESCRIPTOR = struct.Struct("<IIQQ")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIR = struct.Struct("<IHHHHIIH")
+_ZIP64_END_OF_CENTRAL_DIR = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_ZIP32_LIMIT = 0xFFFFFFFF
+_VERSION = 20
+_VERSION_ZIP64 = 45
+
+
+def _dos_datetime(date_time):
+    year, month, day, hour, minute, second = date_time[:6]
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_time, dos_date
+
+
+class ZipStreamWriter:
+    """
+    Write a zip archive as a sequence of byte chunks, so it can be streamed without knowing sizes up front.
+
+    Streamed entries use data descriptors (general purpose flag bit 3); raw entries copy already
+    compressed bytes, e.g. untouched parts of another archive. A streamed entry's size is unknown
+    when its header goes out, so by default it is written as zip64 (a zip64 extra field in the local
+    header and 64-bit sizes in its data descriptor) and may grow past 4 GiB; the central directory
+    and end records switch to zip64 only where a size, an offset or the entry count needs it.
+    """
+
+    def __init__(self, compresslevel=6):
+        self.compresslevel = compresslevel
+        self._offset = 0
+        self._entries = []
+
+    def _emit(self, data):
+        self._offset += len(data)
+        return data
+
+    def _local_header(self, name, flags, compress_type, date_time, crc, compress_size, file_size, zip64=False):
+        encoded_name = name.encode("utf-8")
+        if not name.isascii():
+            flags |= _FLAG_UTF8
+        dos_time, dos_date = _dos_datetime(date_time)
+        version = _VERSION
+        extra = b""
+        if zip64:
+            # The sizes follow in the extra field, and in 64-bit form in the data descriptor
+            extra = struct.pack("<HHQQ", 0x0001, 16, file_size, compress_size)
+            compress_size = file_size = _ZIP32_LIMIT
+            version = _VERSION_ZIP64
+        header = _LOCAL_HEADER.pack(
+            0x04034B50, version, flags, compress_type, dos_time, dos_date,
+            crc, compress_size, file_size, len(encoded_name), len(extra),
+        )
+        entry = {
+            "name": encoded_name,
+            "flags": flags,
+            "compress_type": compress_type,
+            "dos_time": dos_time,
+            "dos_date": dos_date,
+            "offset": self._offset,
+            "version": version,
+        }
+        return header + encoded_name + extra, entry
+
+    def write_stream(self, name, chunks, compress_type=ZIP_DEFLATED, compresslevel=None, date_time=None, zip64=True):
+        """
+        Compress and emit an entry chunk by chunk, followed by a data descriptor.
+
+        With zip64=False the entry keeps plain 32-bit headers, for readers that reject zip64 parts
+        (e.g. inside an xlsx package), and raises ValueError once it passes 4 GiB.
+        """
+        date_time = date_time or time.localtime()
+        header, entry = self._local_header(name, _FLAG_DATA_DESCRIPTOR, compress_type, date_time, 0, 0, 0, zip64=zip64)
+        yield self._emit(header)
+
+        level = self.compresslevel if compresslevel is None else compresslevel
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if compress_type == ZIP_DEFLATED else None
+        crc = 0
+        file_size = 0
+        compress_size = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            data = compressor.compress(chunk) if compressor is not None else chunk
+            if data:
+                compress_size += len(data)
+                yield self._emit(data)
+        if compressor is not None:
+            data = compressor.flush()
+            compress_size += len(data)
+            yield self._emit(data)
+
+        if zip64:
+            yield self._emit(_ZIP64_DATA_DESCRIPTOR.pack(0x08074B50, crc, compress_size, file_size))
+        elif file_size >= _ZIP32_LIMIT or compress_size >= _ZIP32_LIMIT:
+            raise ValueError(f"zip entry {name} exceeds 4 GiB")
+        else:
+            yield self._emit(_DATA_DESCRIPTOR.pack(0x08074B50, crc, compress_size, file_size))
+        self._entries.append({**entry, "crc": crc, "compress_size": compress_size, "file_size": file_size})
+
+    def write_raw(self, name, raw_chunks, crc, compress_size, file_size, compress_type, date_time=None):
+        """Emit an entry whose compressed bytes and sizes are already known."""
+        date_time = date_time or time.localtime()
+        header, entry = self._local_header(name, 0, compress_type, date_time, crc, compress_size, file_size)
+        yield self._emit(header)
+        for chunk in raw_chunks:
+            yield self._emit(chunk)
+        self._entries.append({**entry, "crc": crc, "compress_size": compress_size, "file_size": file_size})
+
+    def write_bytes(self, name, data, compress_type=ZIP_DEFLATED, compresslevel=None, date_time=None):
+        """Emit an in-memory entry with sizes in the local header (no data descriptor)."""
+        crc = zlib.crc32(data)
+        if compress_type == ZIP_DEFLATED:
+            level = self.compresslevel if compresslevel is None else compresslevel
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+        else:
+            compressed = data
+        yield from self.write_raw(name, [compressed], crc, len(compressed), len(data), compress_type, date_time=date_time)
+
+    def close(self, comment=b""):
+        """Emit the central directory and end records, with an optional archive comment."""
+        if len(comment) > 0xFFFF:
+            raise ValueError("zip archive comment exceeds 65535 bytes")
+        central_directory_offset = self._offset
+        for entry in self._entries:
+            # Values past the 32-bit fields go to the zip64 extra field, in this order
+            sizes = [entry["file_size"], entry["compress_size"], entry["offset"]]
+            zip64_values = [value for value in sizes if value >= _ZIP32_LIMIT]
+            file_size, compress_size, offset = (min(value, _ZIP32_LIMIT) for value in sizes)
+            extra = b""
+            version = entry["version"]
+            if zip64_values:
+                extra = struct.pack(f"<HH{len(zip64_values)}Q", 0x0001, 8 * len(zip64_values), *zip64_values)
+                version = _VERSION_ZIP64
+            header = _CENTRAL_HEADER.pack(
+                0x02014B50, version, version, entry["flags"], entry["compress_type"],
+                entry["dos_time"], entry["dos_date"], entry["crc"], compress_size,
+                file_size, len(entry["name"]), len(extra), 0, 0, 0, 0o600 << 16, offset,
+            )
+            yield self._emit(header + entry["name"] + extra)
+
+        central_directory_size = self._offset - central_directory_offset
+        entry_count = len(self._entries)
+        if central_directory_offset >= _ZIP32_LIMIT or entry_count >= 0xFFFF:
+            zip64_end_offset = self._offset
+            yield self._emit(_ZIP64_END_OF_CENTRAL_DIR.pack(
+                0x06064B50, 44, _VERSION_ZIP64, _VERSION_ZIP64, 0, 0,
+                entry_count, entry_count, central_directory_size, central_directory_offset,
+            ))
+            yield self._emit(_ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_end_offset, 1))
+            yield self._emit(_END_OF_CENTRAL_DIR.pack(
+                0x06054B50, 0, 0, 0xFFFF, 0xFFFF, _ZIP32_LIMIT, _ZIP32_LIMIT, len(comment),
+            ) + comment)
+        else:
+            yield self._emit(_END_OF_CENTRAL_DIR.pack(
+                0x06054B50, 0, 0, entry_count, entry_count,
+                central_directory_size, central_directory_offset, len(comment),
+            ) + comment)
@@ -1,9 +1,10 @@
+import asyncio
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from router.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
-from config.database import get_db
+from config.database import AsyncSessionLocal, async_engine
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 from DAO.base_dao import BaseDAO
@@ -11,11 +12,29 @@ from config import logger
 from router.output_schema_router import schema_router
 from router.user_router import user_router
 from router.sync_router import sync_router
+from router.file_router import file_router
+from handlers.sync_handlers.sync_executor import shutdown_process_pool
+from handlers.sync_handlers.sync_jobs import shutdown_job_pool, run_job_maintenance
+from middleware.body_size_limit import BodySizeLimitMiddleware
 
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_maintenance = asyncio.create_task(run_job_maintenance())
+    yield
+    job_maintenance.cancel()
+    shutdown_process_pool()
+    shutdown_job_pool()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Added before CORS so that 413 responses still carry CORS headers
+app.add_middleware(BodySizeLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,10 +42,12 @@ app.add_middleware(
     allow_credentials=False,  # No cookies or authentication
     allow_methods=["*"],      # Allow all HTTP methods
     allow_headers=["*"],      # Allow all headers
+    expose_headers=["X-Sync-Report"],
 )
 app.include_router(schema_router)
 app.include_router(user_router)
 app.include_router(sync_router)
+app.include_router(file_router)
 
 @app.get("/")
 async def read_root():
@@ -34,13 +55,13 @@ async def read_root():
 
 
 @app.get("/health_check")
-def health_check():
+async def health_check():
     try:
-        db = next(get_db())
-        db.execute(text("SELECT 1"))
-        return JSONResponse(content={"status": "ok"}, status_code=200)
-    except OperationalError:
-        return JSONResponse(content={"status": "db_error"}, status_code=500)
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+        return ORJSONResponse(content={"status": "ok"}, status_code=200)
+    except (OperationalError, OSError):
+        return ORJSONResponse(content={"status": "db_error"}, status_code=500)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import json
+from starlette.requests import ClientDisconnect
+from config import setting
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies larger than MAX_REQUEST_BYTES with a 413.
+
+    A declared Content-Length over the limit is refused before any of the body is read;
+    chunked bodies are counted as they arrive and cut off as soon as they cross it.
+    """
+
+    def __init__(self, app, max_bytes=None):
+        self.app = app
+        self.max_bytes = setting.MAX_REQUEST_BYTES if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Answer now and end the body as a disconnect, so the app stops reading
+                    if not response_started:
+                        rejected = True
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Whatever the app answers to the cut-off body is dropped in favour of the 413
+            if not rejected:
+                response_started = True
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except ClientDisconnect:
+            # The app stopped at the disconnect this middleware made up; the 413 has already been sent
+            if not rejected:
+                raise
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body exceeds the {self.max_bytes} byte limit"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, JSON, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import UUID
+from config.database import Base
+from models.serialization import ModelSerializer
+
+
+class ColumnMapping(Base):
+    __tablename__ = 'column_mappings'
+
+    cache_key = Column(String, primary_key=True)
+    schema_uuid = Column(UUID(as_uuid=True), nullable=True, index=True)
+    mapping = Column(JSON, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    def to_dict(self):
+        """Convert SQLAlchemy model to dict with UUID as string."""
+        return self.serializer.to_dict(self)
+
+
+ColumnMapping.serializer = ModelSerializer(ColumnMapping)
@@ -1,21 +1,29 @@
-from sqlalchemy import Column, String, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, JSON, Integer, Index, cast
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
 from config.database import Base
+from models.serialization import ModelSerializer
 import json
 
 class OutputSchema(Base):
     __tablename__ = 'output_schemas'
 
-    schema_uuid = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Same composite key as the table (migration 0001); schema_uuid has its own index for lookups by it alone
+    schema_uuid = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     schema_name = Column(String, nullable=True)
-    user_uuid = Column(UUID(as_uuid=True))
+    user_uuid = Column(UUID(as_uuid=True), primary_key=True)
+    # JSON rather than JSONB: the key order is the output column order
     schema = Column(JSON, nullable=False)
+    # Bumped on every update so per-worker caches can tell a stale copy
+    schema_version = Column(Integer, nullable=False, default=1, server_default="1")
 
     def to_dict(self):
         """Convert SQLAlchemy model to dict with UUID as string."""
-        return {
-            column.name: str(getattr(self, column.name)) if isinstance(getattr(self, column.name), uuid.UUID)
-            else getattr(self, column.name)
-            for column in self.__table__.columns
-        }
\ No newline at end of file
+        return self.serializer.to_dict(self)
+
+
+OutputSchema.serializer = ModelSerializer(OutputSchema)
+
+# GIN over the schema's top-level keys, i.e. its output columns (GET /schema/search)
+schema_keys = cast(OutputSchema.schema, JSONB)
+Index('ix_output_schemas_schema_keys', schema_keys, postgresql_using='gin')
@@ -0,0 +1,46 @@
+from operator import attrgetter
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.postgresql import UUID
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+class ModelSerializer:
+    """
+    Dict form of one model's rows, worked out once from its columns instead of per row.
+
+    from_object, like rows_to_dicts for Core rows, keeps values as the driver returns them (UUID,
+    datetime): every JSON response goes through orjson, which encodes those natively. to_dict
+    converts them to strings, for callers that need plain JSON values.
+    """
+
+    def __init__(self, model, exclude=()):
+        columns = [column for column in model.__table__.columns if column.name not in exclude]
+        self.names = tuple(column.name for column in columns)
+        getter = attrgetter(*self.names)
+        # attrgetter returns a bare value rather than a tuple for a single name
+        self._values = getter if len(self.names) > 1 else (lambda obj: (getter(obj),))
+        self._converters = tuple(
+            (column.name, str if isinstance(column.type, UUID) else _isoformat)
+            for column in columns
+            if isinstance(column.type, (UUID, DateTime))
+        )
+
+    def from_object(self, obj):
+        return dict(zip(self.names, self._values(obj)))
+
+    def to_dict(self, obj):
+        row = self.from_object(obj)
+        for name, convert in self._converters:
+            value = row[name]
+            if value is not None:
+                row[name] = convert(value)
+        return row
+
+
+def rows_to_dicts(result):
+    """Dicts from a Core result's plain row tuples, skipping the per-row mapping view."""
+    names = tuple(result.keys())
+    return [dict(zip(names, row)) for row in result]
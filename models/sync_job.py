@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, JSON, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from config.database import Base
+from models.serialization import ModelSerializer
+
+
+class SyncJob(Base):
+    __tablename__ = 'sync_jobs'
+
+    job_uuid = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_uuid = Column(UUID(as_uuid=True), nullable=True, index=True)
+    status = Column(String, nullable=False, default="queued")
+    progress = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    result_path = Column(String, nullable=True)
+    result_filename = Column(String, nullable=True)
+    result_media_type = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
+
+    def to_dict(self):
+        """Convert SQLAlchemy model to dict with UUID and timestamps as strings."""
+        return self.serializer.to_dict(self)
+
+
+SyncJob.serializer = ModelSerializer(SyncJob)
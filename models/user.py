@@ -2,6 +2,7 @@ from sqlalchemy import Column, String, JSON
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from config.database import Base
+from models.serialization import ModelSerializer
 import json
 
 class User(Base):
@@ -13,14 +14,16 @@ class User(Base):
     user_firstname = Column(String, nullable=False)
     user_lastname = Column(String, nullable=False)
 
+    # Never returned by the API
+    PRIVATE_COLUMNS = {"user_password"}
+
     def to_dict(self):
-        """Convert SQLAlchemy model to dict with UUID as string."""
-        return {
-            column.name: str(getattr(self, column.name)) if isinstance(getattr(self, column.name), uuid.UUID)
-            else getattr(self, column.name)
-            for column in self.__table__.columns
-        }
+        """Convert SQLAlchemy model to dict with UUID as string, without the private columns."""
+        return self.serializer.to_dict(self)
 
     def to_json(self):
         """Convert SQLAlchemy model to JSON string."""
-        return json.dumps(self.to_dict())
\ No newline at end of file
+        return json.dumps(self.to_dict())
+
+
+User.serializer = ModelSerializer(User, exclude=User.PRIVATE_COLUMNS)
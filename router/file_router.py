@@ -0,0 +1,56 @@
+from fastapi import APIRouter, status, HTTPException, UploadFile, File
+from router.responses import ORJSONResponse
+from config.logger import logger
+from handlers.file_handlers.file_store import FileStore
+
+file_router = APIRouter(prefix="/files")
+
+
+@file_router.post("/", status_code=status.HTTP_201_CREATED)
+async def stage_file(file: UploadFile = File(...)):
+    try:
+        # Stored once by content hash; /sync can then reference the file_id instead of re-uploading
+        metadata = await FileStore().put(file)
+        return ORJSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content={
+                "message": "File staged successfully",
+                **metadata
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to stage file: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while staging file"
+        )
+
+
+@file_router.get("/{file_id}", status_code=status.HTTP_200_OK)
+async def get_staged_file(file_id: str):
+    try:
+        staged_file = FileStore().get(file_id)
+        if staged_file is None:
+            logger.error(f"Staged file '{file_id}' not found")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Staged file '{file_id}' not found or expired"
+            )
+
+        _, metadata = staged_file
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "message": "Staged file fetched successfully",
+                **metadata
+            }
+        )
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 404) so they're not caught by generic handler
+        raise
+    except Exception as e:
+        logger.error(f"Failed to retrieve staged file: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while retrieving staged file"
+        )
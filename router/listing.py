@@ -0,0 +1,75 @@
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Column
+from config import setting
+from config.database import AsyncSessionLocal
+from config.logger import logger
+from router.responses import dumps
+
+# (session, after, limit) -> rows, for one keyset page
+PageFetcher = Callable[[Any, Any, int], Awaitable[List[Dict[str, Any]]]]
+
+
+def parse_fields(fields: Optional[str], allowed: Dict[str, Column], key: Column) -> List[Column]:
+    """Columns to select for `?fields=a,b`; the key is always selected, since it is the cursor."""
+    if not fields:
+        return list(allowed.values())
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(allowed)}"
+        )
+    if key.name not in names:
+        names.insert(0, key.name)
+    return [allowed[name] for name in names]
+
+
+def parse_uuid(value: Optional[str], name: str) -> Optional[uuid.UUID]:
+    if value is None:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {name}: {value}")
+
+
+def page_limit(limit: Optional[int]) -> int:
+    return min(limit or setting.API_PAGE_DEFAULT_LIMIT, setting.API_PAGE_MAX_LIMIT)
+
+
+def next_cursor(rows: List[Dict[str, Any]], key: Column, limit: int) -> Optional[str]:
+    """Cursor for the following page, or None once a short page shows the end was reached."""
+    return str(rows[-1][key.name]) if len(rows) == limit else None
+
+
+def ndjson_response(fetch_page: PageFetcher, key: Column, after: Any, limit: Optional[int]) -> StreamingResponse:
+    """
+    Every row after `after` (up to limit, if given) as one JSON object per line.
+
+    The rows are read in keyset pages of API_NDJSON_CHUNK_ROWS, each with its own short-lived
+    session, so neither the result set nor a pooled connection is held while the client reads.
+    """
+    async def lines():
+        cursor, remaining = after, limit
+        try:
+            while remaining is None or remaining > 0:
+                chunk_rows = setting.API_NDJSON_CHUNK_ROWS if remaining is None else min(remaining, setting.API_NDJSON_CHUNK_ROWS)
+                async with AsyncSessionLocal() as session:
+                    rows = await fetch_page(session, cursor, chunk_rows)
+                if rows:
+                    yield b"".join(dumps(row, newline=True) for row in rows)
+                if len(rows) < chunk_rows:
+                    break
+                cursor = rows[-1][key.name]
+                if remaining is not None:
+                    remaining -= len(rows)
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated stream
+            logger.error(f"NDJSON export stopped after {cursor} : {str(e)}", exc_info=True)
+            raise
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -1,20 +1,79 @@
-from fastapi import APIRouter, status, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, status, HTTPException, Query, Request
+from router.responses import ORJSONResponse
 from config.logger import logger
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from config.database import get_db
-from DAO.output_schema_dao import OutputSchemaDAO
-from typing import Dict, Any
+from config.database import get_async_db
+from DAO.output_schema_dao import AsyncOutputSchemaDAO
+from models.output_schema import OutputSchema
+from handlers.sync_handlers.column_mapping_cache import ColumnMappingCache
+from handlers.sync_handlers.output_schema_cache import OutputSchemaCache
+from handlers.sync_handlers.upload_spool import spool_request, remove_spool
+from handlers.import_handlers.bulk_import import BulkImportError, import_format, iter_record_chunks, schema_record
+from handlers.sync_handlers.schema_validation import column_specs
+from router.listing import parse_fields, parse_uuid, page_limit, next_cursor, ndjson_response
+from typing import Dict, Any, Optional, Literal
 
 schema_router = APIRouter(prefix="/schema")
 
+# Selectable through ?fields= on the list endpoints
+SCHEMA_FIELDS = {column.name: column for column in OutputSchema.__table__.columns}
+SCHEMA_KEY = OutputSchema.__table__.c.schema_uuid
+
+
+def _check_column_specs(schema_details):
+    """Reject a schema whose column specs (type, format, enum, regex, nullable) are malformed before it is stored."""
+    schema = schema_details.get("schema")
+    if isinstance(schema, dict):
+        try:
+            column_specs(schema)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@schema_router.get("/search", status_code=status.HTTP_200_OK)
+async def search_schemas(
+    column: str = Query(..., min_length=1),
+    user_uuid: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_db)
+):
+    try:
+        columns = parse_fields(fields, SCHEMA_FIELDS, key=SCHEMA_KEY)
+        user_uuid_obj = parse_uuid(user_uuid, "user UUID")
+        after_uuid = parse_uuid(after, "cursor")
+
+        limit = page_limit(limit)
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        output_schemas = await output_schema_dao.search_output_schemas_page(
+            column_name=column, columns=columns, user_uuid=user_uuid_obj, after=after_uuid, limit=limit
+        )
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "message": "Schemas fetched successfully",
+                "column": column,
+                "output_schemas": output_schemas,
+                "next_cursor": next_cursor(output_schemas, SCHEMA_KEY, limit),
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to search schemas: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while searching schemas"
+        )
+
 @schema_router.get("/{schema_uuid}", status_code=status.HTTP_200_OK)
-async def get_schema(schema_uuid: str, session: Session = Depends(get_db)):
+async def get_schema(schema_uuid: str, session: AsyncSession = Depends(get_async_db)):
     try:
-        output_schema_dao = OutputSchemaDAO(session)
-        output_schema = output_schema_dao.get_output_schema_by_schema_uuid(schema_uuid=schema_uuid)
-        output_schema = output_schema.to_dict()
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        output_schema = await output_schema_dao.get_output_schema_by_schema_uuid(schema_uuid=schema_uuid)
         
         if output_schema is None:
             logger.error(f"Schema with UUID '{schema_uuid}' not found")
@@ -22,8 +81,9 @@ async def get_schema(schema_uuid: str, session: Session = Depends(get_db)):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Schema with UUID '{schema_uuid}' not found"
             )
+        output_schema = OutputSchema.serializer.from_object(output_schema)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "message": f"Schema fetched sucessfully",
@@ -42,24 +102,47 @@ async def get_schema(schema_uuid: str, session: Session = Depends(get_db)):
         )
 
 @schema_router.get("/get_all_schemas/{user_uuid}", status_code=status.HTTP_200_OK)
-async def get_all_schemas(user_uuid: str, session: Session = Depends(get_db)):
+async def get_all_schemas(
+    user_uuid: str,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    session: AsyncSession = Depends(get_async_db)
+):
     try:
-        output_schema_dao = OutputSchemaDAO(session)
-        output_schemas = output_schema_dao.get_output_schemas_by_user_uuid(user_uuid=user_uuid)
+        columns = parse_fields(fields, SCHEMA_FIELDS, key=SCHEMA_KEY)
+        user_uuid_obj = parse_uuid(user_uuid, "user UUID")
+        after_uuid = parse_uuid(after, "cursor")
+
+        if format == "ndjson":
+            return ndjson_response(
+                lambda page_session, page_after, page_rows: AsyncOutputSchemaDAO(page_session).get_output_schemas_page(
+                    user_uuid=user_uuid_obj, columns=columns, after=page_after, limit=page_rows
+                ),
+                key=SCHEMA_KEY, after=after_uuid, limit=limit
+            )
+
+        limit = page_limit(limit)
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        output_schemas = await output_schema_dao.get_output_schemas_page(
+            user_uuid=user_uuid_obj, columns=columns, after=after_uuid, limit=limit
+        )
         
-        if output_schemas == []:
+        if output_schemas == [] and after_uuid is None:
             logger.error(f"Schemas with user UUID {user_uuid} not found")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Schemas with user UUID {user_uuid} not found"
             )
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "message": f"Schemas fetched sucessfully",
-                "user_uuid": output_schemas[0]["user_uuid"],
+                "user_uuid": str(user_uuid_obj),
                 "output_schemas": output_schemas,
+                "next_cursor": next_cursor(output_schemas, SCHEMA_KEY, limit),
             }
         )
     except HTTPException:
@@ -72,11 +155,59 @@ async def get_all_schemas(user_uuid: str, session: Session = Depends(get_db)):
             detail="Internal server error occurred while retrieving schema"
         )
 
+@schema_router.post("/bulk", status_code=status.HTTP_200_OK)
+async def bulk_import_schemas(request: Request, session: AsyncSession = Depends(get_async_db)):
+    file_format = import_format(request.headers.get("content-type"))
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the schemas as application/x-ndjson or text/csv"
+        )
+    path = await spool_request(request)
+    try:
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        received, written = await output_schema_dao.bulk_import_output_schemas(iter_record_chunks(path, file_format, schema_record))
+        updated_uuids = [str(schema_uuid) for schema_uuid, inserted in written if not inserted]
+        await ColumnMappingCache.invalidate_many_async(session, updated_uuids)
+        for schema_uuid in updated_uuids:
+            OutputSchemaCache.invalidate(schema_uuid)
+
+        inserted = len(written) - len(updated_uuids)
+        logger.info(f"bulk schema import : {received} received, {inserted} inserted, {len(updated_uuids)} updated")
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "message": "Schemas imported successfully",
+                "received": received,
+                "inserted": inserted,
+                "updated": len(updated_uuids),
+                # Repeated schema_uuids (the last row wins) and schemas owned by another user
+                "skipped": received - len(written),
+            }
+        )
+    except BulkImportError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Invalid rows, nothing was imported", "errors": e.to_dict()}
+        )
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Failed to import schemas : {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while importing schemas"
+        )
+    finally:
+        remove_spool(path)
+
+
 @schema_router.post("/{user_uuid}", status_code=status.HTTP_202_ACCEPTED)
-async def create_schema(user_uuid: str, schema_details: Dict[str, Any], session: Session = Depends(get_db)):
+async def create_schema(user_uuid: str, schema_details: Dict[str, Any], session: AsyncSession = Depends(get_async_db)):
     try:
-        output_schema_dao = OutputSchemaDAO(session)
-        output_schema = output_schema_dao.create_output_schema(user_uuid=user_uuid, schema_details=schema_details)
+        _check_column_specs(schema_details)
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        output_schema = await output_schema_dao.create_output_schema(user_uuid=user_uuid, schema_details=schema_details)
 
         if output_schema is None:
             logger.error(f"Schema with UUID '{output_schema.schema_uuid}' not found")
@@ -84,7 +215,7 @@ async def create_schema(user_uuid: str, schema_details: Dict[str, Any], session:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Schema with UUID '{output_schema.schema_uuid}' not found"
             )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=202,
             content={
                 "message" : f"successfully created schema with schema uuid : {output_schema.schema_uuid}"
@@ -95,24 +226,27 @@ async def create_schema(user_uuid: str, schema_details: Dict[str, Any], session:
         raise
     except Exception as e:
         logger.error(f"Failed to create schema : {str(e)}", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"error": "Internal Server Error", "details": str(e)}
         )
     
 
 @schema_router.put("/{schema_uuid}", status_code=status.HTTP_202_ACCEPTED)
-async def update_schema(schema_uuid: str, schema_details: Dict[str, Any], session: Session = Depends(get_db)):
+async def update_schema(schema_uuid: str, schema_details: Dict[str, Any], session: AsyncSession = Depends(get_async_db)):
     try:
-        output_schema_dao = OutputSchemaDAO(session)
-        is_updated = output_schema_dao.update_output_schema_by_schema_uuid(schema_uuid=schema_uuid, schema_details=schema_details)
+        _check_column_specs(schema_details)
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        is_updated = await output_schema_dao.update_output_schema_by_schema_uuid(schema_uuid=schema_uuid, schema_details=schema_details)
         if is_updated == 0:
             logger.error(f"Schema with UUID {schema_uuid} not found")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Schema with UUID {schema_uuid} not found"
             )
-        return JSONResponse(
+        await ColumnMappingCache.invalidate_async(session, schema_uuid=schema_uuid)
+        OutputSchemaCache.invalidate(schema_uuid)
+        return ORJSONResponse(
             status_code=202,
             content={
                 "message" : f"successfully updated schema with schema uuid : {schema_uuid}"
@@ -123,24 +257,26 @@ async def update_schema(schema_uuid: str, schema_details: Dict[str, Any], sessio
         raise
     except Exception as e:
         logger.error(f"Failed to update schema: {str(e)}", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"error": "Internal Server Error", "details": str(e)}
         )
     
 
 @schema_router.delete("/{schema_uuid}", status_code=status.HTTP_202_ACCEPTED)
-async def delete_schema(schema_uuid: str, session: Session = Depends(get_db)):
+async def delete_schema(schema_uuid: str, session: AsyncSession = Depends(get_async_db)):
     try:
-        output_schema_dao = OutputSchemaDAO(session)
-        is_deleted = output_schema_dao.delete_schema_by_schema_uuid(schema_uuid=schema_uuid)
+        output_schema_dao = AsyncOutputSchemaDAO(session)
+        is_deleted = await output_schema_dao.delete_schema_by_schema_uuid(schema_uuid=schema_uuid)
         if is_deleted == 0:
             logger.error(f"Schema with UUID {schema_uuid} not found")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Schema with UUID {schema_uuid} not found"
             )
-        return JSONResponse(
+        await ColumnMappingCache.invalidate_async(session, schema_uuid=schema_uuid)
+        OutputSchemaCache.invalidate(schema_uuid)
+        return ORJSONResponse(
             status_code=202,
             content={
                 "message" : f"successfully deleted schema with schema uuid : {schema_uuid}"
@@ -151,7 +287,7 @@ async def delete_schema(schema_uuid: str, session: Session = Depends(get_db)):
         raise
     except Exception as e:
         logger.error(f"Failed to delete schema : {str(e)}", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"error": "Internal Server Error", "details": str(e)}
         )
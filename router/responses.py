@@ -0,0 +1,23 @@
+import uuid
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+
+def _encode_default(value):
+    # asyncpg returns its own UUID subclass, which orjson only encodes natively as the exact uuid.UUID
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content, newline=False):
+    """orjson.dumps with the app's encoding rules; newline appends "\\n", as NDJSON needs."""
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+    return orjson.dumps(content, default=_encode_default, option=option)
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """The app's JSON response (the FastAPI default_response_class); encodes through dumps."""
+
+    def render(self, content):
+        return dumps(content)
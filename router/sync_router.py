@@ -1,22 +1,121 @@
 from fastapi import APIRouter, status, HTTPException, Depends, UploadFile, File, Form
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
+from router.responses import ORJSONResponse
 from config.logger import logger
-from sqlalchemy.orm import Session
-from config.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import get_async_db
 from handlers.sync_handlers.sync_handler import SyncHandler
+from handlers.sync_handlers.sync_output_writer import iter_csv_bytes, iter_zip_entry, iter_columnar_output, write_excel, build_sync_report, sync_report_comment, needs_zip
+from handlers.sync_handlers.columnar_output import output_options, columnar_media_type
+from handlers.sync_handlers.upload_spool import detach_upload, spool_upload
+from handlers.sync_handlers.sync_jobs import submit_sync_job, job_inputs_dir
+from DAO.sync_job_dao import AsyncSyncJobDAO
+from handlers.sync_handlers.zip_stream import ZipStreamWriter
+from handlers.sync_handlers.excel_loader import read_sheet_names, read_sheet_details
+from handlers.file_handlers.file_store import FileStore
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from config import setting
 from typing import Dict, Any, List
-import pandas as pd
-import zipfile
+import shutil
+import uuid
 import json
 import io
+import os
 
 sync_router = APIRouter(prefix="/sync")
 
+
+def _sync_report_headers(processed_files):
+    """Per-file timings, returned as a header since the body is the file itself."""
+    return {"X-Sync-Report": json.dumps(build_sync_report(processed_files))}
+
+
+def _sync_report_headers_from_progress(progress):
+    """The same report for a finished job, rebuilt from its per-file progress."""
+    processed_files = [
+        {"filename": filename, "timings": file_progress.get("timings"), "mapping": file_progress.get("mapping"), "validation": file_progress.get("validation")}
+        for filename, file_progress in (progress or {}).get("files", {}).items()
+        if file_progress.get("stage") == "done"
+    ]
+    return _sync_report_headers(processed_files)
+
+
+async def _close_sync_inputs(results, input_files):
+    await results.aclose()
+    for input_file in input_files:
+        input_file.file.close()
+
+
+async def _iter_zip_response(processed_files, results, input_files):
+    """
+    Emit each output as a zip entry once it and the outputs before it are done.
+
+    Timings are only known at the end, so the X-Sync-Report JSON becomes the archive comment.
+    """
+    zip_writer = ZipStreamWriter(compresslevel=setting.SYNC_ZIP_COMPRESSION_LEVEL)
+    try:
+        idx = 0
+        while True:
+            if idx < len(processed_files):
+                file_detail = processed_files[idx]
+            else:
+                try:
+                    file_detail = await results.__anext__()
+                except StopAsyncIteration:
+                    break
+                processed_files.append(file_detail)
+            # Serializing and compressing is blocking work, so it runs in the threadpool chunk by chunk
+            async for chunk in iterate_in_threadpool(iter_zip_entry(zip_writer, idx, file_detail)):
+                yield chunk
+            idx += 1
+
+        for chunk in zip_writer.close(comment=sync_report_comment(processed_files)):
+            yield chunk
+    except Exception as e:
+        logger.error(f"Failed while streaming zip: {str(e)}", exc_info=True)
+        raise
+    finally:
+        await _close_sync_inputs(results, input_files)
+
+
+def _check_output_options(processed_metadata):
+    """Reject an unknown output_format or compression before any file is read."""
+    for file_metadata in processed_metadata.get("file_metadatas", {}).values():
+        try:
+            output_options(file_metadata, processed_metadata)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _open_staged_files(processed_metadata, files):
+    """
+    Files referenced by file_id in sync_metadata, opened from the staging store under their metadata key.
+    Each carries its staged listing, so the handlers skip re-reading the header or sheet names.
+    """
+    uploaded_filenames = {file.filename for file in files}
+    file_store = FileStore()
+    staged_files = []
+    for filename, file_metadata in processed_metadata.get("file_metadatas", {}).items():
+        file_id = file_metadata.get("file_id")
+        if file_id is None or filename in uploaded_filenames:
+            continue
+        # Pinned for the whole request, so an eviction meanwhile cannot pull the bytes from under the sync
+        pinned_file = file_store.open(file_id)
+        if pinned_file is None:
+            for opened_file in staged_files:
+                opened_file.file.close()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Staged file '{file_id}' for {filename} not found or expired"
+            )
+        staged_files.append(UploadFile(file=pinned_file, filename=filename))
+    return staged_files
+
+
 @sync_router.post("/", status_code=status.HTTP_200_OK)
 async def sync_schema(
     sync_metadata: str = Form(None),
-    files: List[UploadFile] = File(...),
-    session: Session = Depends(get_db)
+    files: List[UploadFile] = File(None)
 ):
     try:
         # Parse metadata
@@ -27,77 +126,91 @@ async def sync_schema(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid sync_metadata format. Must be a valid JSON string."
             )
+        _check_output_options(processed_metadata)
+
+        # Uploaded files and files staged earlier through POST /files are processed alike
+        files = files or []
+        staged_files = _open_staged_files(processed_metadata, files)
+        # Handlers read uploads by path, and a streamed zip outlives the request's own form files
+        files = [await detach_upload(file) for file in files]
+        input_files = files + staged_files
 
         # Process input files using handler
-        sync_handler = SyncHandler(session=session)
-        processed_files = await sync_handler.handle(sync_metadata=processed_metadata, files=files)
-
-        if len(processed_files) == 1:
-            # ✅ Single file case
-            file_detail = processed_files[0]
-            filename = file_detail.get("filename", "output.csv")
-            file = file_detail.get("file")
-            file_type = "csv" if filename.split(".")[-1] == "csv" else "excel"
-
-            if file_type == "csv":
-                # Write CSV to in-memory buffer
-                buffer = io.StringIO()
-                file.to_csv(buffer, index=False)
-                buffer.seek(0)
-                media_type = "text/csv"
+        results = SyncHandler().iter_handle(sync_metadata=processed_metadata, files=input_files)
+        processed_files = []
+        streaming_zip = False
+        try:
+            # Wait for at most two outputs: one means a bare file, two means the rest is streamed as a zip
+            async for file_detail in results:
+                processed_files.append(file_detail)
+                if len(processed_files) == 2:
+                    break
 
-                return StreamingResponse(
-                    buffer,
-                    media_type=media_type,
-                    headers={"Content-Disposition": f"attachment; filename={filename}"}
-                )
+            if not needs_zip(processed_files):
+                # ✅ Single file case
+                file_detail = processed_files[0]
+                filename = file_detail.get("filename", "output.csv")
+                file = file_detail.get("file")
+                file_type = "csv" if filename.split(".")[-1] == "csv" else "excel"
+
+                if file_detail.get("output_format"):
+                    # Written batch by batch (row group by row group for Parquet) as the client reads it
+                    return StreamingResponse(
+                        iter_columnar_output(file_detail),
+                        media_type=columnar_media_type(file_detail["output_format"]),
+                        headers={"Content-Disposition": f"attachment; filename={filename}", **_sync_report_headers(processed_files)}
+                    )
+
+                elif file_type == "csv" and file_detail.get("streaming"):
+                    # Chunks are transformed and serialized as the client reads them
+                    return StreamingResponse(
+                        iter_csv_bytes(file, columns=file_detail.get("columns")),
+                        media_type="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename={filename}", **_sync_report_headers(processed_files)}
+                    )
+
+                elif file_type == "csv":
+                    # Write CSV to in-memory buffer
+                    buffer = io.StringIO()
+                    file.to_csv(buffer, index=False)
+                    buffer.seek(0)
+                    media_type = "text/csv"
+
+                    return StreamingResponse(
+                        buffer,
+                        media_type=media_type,
+                        headers={"Content-Disposition": f"attachment; filename={filename}", **_sync_report_headers(processed_files)}
+                    )
 
-            elif file_type == "excel":
-                # file here is expected to be a dict {sheet_name: dataframe}
-                excel_buffer = io.BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
-                    for sheet_name, df in file.items():
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                excel_buffer.seek(0)
-                media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                elif file_type == "excel":
+                    # file here is the transformed sheet; the rest of the workbook comes from the upload
+                    excel_buffer = io.BytesIO()
+                    write_excel(excel_buffer, file_detail)
+                    excel_buffer.seek(0)
+                    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
+                    return StreamingResponse(
+                        excel_buffer,
+                        media_type=media_type,
+                        headers={"Content-Disposition": f"attachment; filename={filename}", **_sync_report_headers(processed_files)}
+                    )
+
+            else:
+                # ✅ Multiple files, or a file with its rejects → ZIP streamed entry by entry as each file finishes
+                streaming_zip = True
                 return StreamingResponse(
-                    excel_buffer,
-                    media_type=media_type,
-                    headers={"Content-Disposition": f"attachment; filename={filename}"}
+                    _iter_zip_response(processed_files, results, input_files),
+                    media_type="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=processed_files.zip"}
                 )
+        finally:
+            # The inputs back the Excel writer's source, so they are closed only once the output is built
+            if not streaming_zip:
+                await _close_sync_inputs(results, input_files)
 
-        else:
-            # ✅ Multiple files → ZIP in-memory
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                for idx, file_detail in enumerate(processed_files):
-                    filename = file_detail.get("filename", f"{idx+1}-default.csv")
-                    file = file_detail.get("file")
-                    file_type = "csv" if filename.split(".")[-1] == "csv" else "excel"
-
-                    if file_type == "csv":
-                        # Write CSV to memory
-                        csv_buffer = io.StringIO()
-                        file.to_csv(csv_buffer, index=False)
-                        zip_file.writestr(filename, csv_buffer.getvalue())
-
-                    elif file_type == "excel":
-                        # Write Excel (with multiple sheets) to memory
-                        excel_bytes = io.BytesIO()
-                        with pd.ExcelWriter(excel_bytes, engine="xlsxwriter") as writer:
-                            for sheet_name, df in file.items():
-                                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        zip_file.writestr(filename, excel_bytes.getvalue())
-
-            zip_buffer.seek(0)
-
-            return StreamingResponse(
-                zip_buffer,
-                media_type="application/zip",
-                headers={"Content-Disposition": "attachment; filename=processed_files.zip"}
-            )
-
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 404) so they're not caught by generic handler
+        raise
     except Exception as e:
         logger.error(f"Failed to generate files: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -106,28 +219,156 @@ async def sync_schema(
         )
 
 
+@sync_router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_sync_job(
+    sync_metadata: str = Form(None),
+    files: List[UploadFile] = File(None),
+    session: AsyncSession = Depends(get_async_db)
+):
+    try:
+        # Parse metadata
+        try:
+            processed_metadata = json.loads(sync_metadata)
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid sync_metadata format. Must be a valid JSON string."
+            )
+        _check_output_options(processed_metadata)
+
+        # Inputs are copied next to the job (staged files are hard-linked) so they outlive this request
+        files = files or []
+        staged_files = _open_staged_files(processed_metadata, files)
+        job_uuid = str(uuid.uuid4())
+        inputs_dir = job_inputs_dir(job_uuid)
+        os.makedirs(inputs_dir)
+        inputs = []
+        try:
+            for file in files + staged_files:
+                inputs.append((file.filename, await spool_upload(file, directory=inputs_dir)))
+        except BaseException:
+            shutil.rmtree(inputs_dir, ignore_errors=True)
+            raise
+        finally:
+            for staged_file in staged_files:
+                staged_file.file.close()
+
+        progress = {"stage": "queued", "files": {filename: {"stage": "queued"} for filename, _ in inputs}}
+        await AsyncSyncJobDAO(session).create_job(job_uuid=job_uuid, user_uuid=processed_metadata.get("user_uuid"), progress=progress)
+        submit_sync_job(job_uuid, processed_metadata, inputs)
+
+        return ORJSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "message": "Sync job queued",
+                "job_uuid": job_uuid,
+                "status": "queued"
+            }
+        )
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 404) so they're not caught by generic handler
+        raise
+    except Exception as e:
+        logger.error(f"Failed to queue sync job: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error occurred while queueing sync job : {e}"
+        )
+
+
+async def _get_sync_job(session, job_uuid):
+    try:
+        sync_job = await AsyncSyncJobDAO(session).get_job_by_uuid(job_uuid=job_uuid)
+    except ValueError:
+        sync_job = None
+    if sync_job is None:
+        logger.error(f"Sync job '{job_uuid}' not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sync job '{job_uuid}' not found"
+        )
+    return sync_job
+
+
+@sync_router.get("/jobs/{job_uuid}", status_code=status.HTTP_200_OK)
+async def get_sync_job(job_uuid: str, session: AsyncSession = Depends(get_async_db)):
+    try:
+        sync_job = (await _get_sync_job(session, job_uuid)).to_dict()
+        # The result is downloaded through /result; its location on disk is not part of the API
+        sync_job.pop("result_path", None)
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "message": "Sync job fetched successfully",
+                "sync_job": sync_job
+            }
+        )
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 404) so they're not caught by generic handler
+        raise
+    except Exception as e:
+        logger.error(f"Failed to retrieve sync job: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while retrieving sync job"
+        )
+
+
+@sync_router.get("/jobs/{job_uuid}/result", status_code=status.HTTP_200_OK)
+async def get_sync_job_result(job_uuid: str, session: AsyncSession = Depends(get_async_db)):
+    try:
+        sync_job = await _get_sync_job(session, job_uuid)
+        if sync_job.status == "expired" or (sync_job.status == "succeeded" and not os.path.exists(sync_job.result_path)):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail=f"Result of sync job '{job_uuid}' has expired"
+            )
+        if sync_job.status != "succeeded":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Sync job '{job_uuid}' is {sync_job.status}, no result available"
+            )
+
+        return FileResponse(
+            sync_job.result_path,
+            media_type=sync_job.result_media_type,
+            filename=sync_job.result_filename,
+            headers=_sync_report_headers_from_progress(sync_job.progress)
+        )
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 404) so they're not caught by generic handler
+        raise
+    except Exception as e:
+        logger.error(f"Failed to retrieve sync job result: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while retrieving sync job result"
+        )
+
+
 @sync_router.post("/get_excel_sheets", status_code=status.HTTP_200_OK)
 async def get_excel_sheet_names(
     file: UploadFile = File(...),
+    include_details: bool = False,
 ):
     try:
-        # Read the uploaded Excel file
-        file_contents = await file.read()
-        xls = pd.ExcelFile(io.BytesIO(file_contents))
-        
-        # Get the sheet names
-        sheet_names = xls.sheet_names
-        
-        return JSONResponse(
+        # Only the zip directory and xl/workbook.xml are read; no sheet is parsed
+        sheet_names = await run_in_threadpool(read_sheet_names, file.file)
+        content = {
+            "message": "Excel sheets retrieved successfully",
+            "sheet_names": sheet_names
+        }
+        if include_details:
+            # Dimensions and header rows come from sheet metadata; unavailable (null) for legacy .xls
+            content["sheets"] = await run_in_threadpool(read_sheet_details, file.file)
+
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
-            content={
-                "message": "Excel sheets retrieved successfully",
-                "sheet_names": sheet_names
-            }
+            content=content
         )
     except Exception as e:
         logger.error(f"Failed to read Excel file sheets: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error reading Excel file: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -1,27 +1,56 @@
-from fastapi import APIRouter, status, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request
+from router.responses import ORJSONResponse
 from config.logger import logger
-from sqlalchemy.orm import Session
-from config.database import get_db
-from DAO.user_dao import UserDAO
-from typing import Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from config.database import get_async_db
+from DAO.user_dao import AsyncUserDAO
+from models.user import User
+from handlers.sync_handlers.upload_spool import spool_request, remove_spool
+from handlers.import_handlers.bulk_import import BulkImportError, import_format, iter_record_chunks, user_record
+from router.listing import parse_fields, parse_uuid, page_limit, next_cursor, ndjson_response
+from typing import Dict, Any, Optional, Literal
 import uuid
 
 user_router = APIRouter(prefix="/user")
 
+# Selectable through ?fields=; the private columns are not
+USER_FIELDS = {column.name: column for column in User.__table__.columns if column.name not in User.PRIVATE_COLUMNS}
+USER_KEY = User.__table__.c.user_uuid
+
+
 @user_router.get("/", status_code=status.HTTP_200_OK)
-async def get_all_users(session: Session = Depends(get_db)):
+async def get_all_users(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    session: AsyncSession = Depends(get_async_db)
+):
     try:
-        user_dao = UserDAO(session)
-        users = user_dao.get_all_users()
+        columns = parse_fields(fields, USER_FIELDS, key=USER_KEY)
+        after_uuid = parse_uuid(after, "cursor")
+
+        if format == "ndjson":
+            return ndjson_response(
+                lambda page_session, page_after, page_rows: AsyncUserDAO(page_session).get_users_page(columns, after=page_after, limit=page_rows),
+                key=USER_KEY, after=after_uuid, limit=limit
+            )
+
+        limit = page_limit(limit)
+        user_dao = AsyncUserDAO(session)
+        users = await user_dao.get_users_page(columns, after=after_uuid, limit=limit)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "message": "Users fetched successfully",
-                "users": [user.to_dict() for user in users]
+                "users": users,
+                "next_cursor": next_cursor(users, USER_KEY, limit)
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to retrieve users: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -29,12 +58,63 @@ async def get_all_users(session: Session = Depends(get_db)):
             detail="Internal server error occurred while retrieving users"
         )
 
+
+@user_router.post("/bulk", status_code=status.HTTP_200_OK)
+async def bulk_import_users(request: Request, session: AsyncSession = Depends(get_async_db)):
+    file_format = import_format(request.headers.get("content-type"))
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the users as application/x-ndjson or text/csv"
+        )
+    path = await spool_request(request)
+    try:
+        user_dao = AsyncUserDAO(session)
+        received, written = await user_dao.bulk_import_users(iter_record_chunks(path, file_format, user_record))
+        inserted = sum(1 for _, is_inserted in written if is_inserted)
+
+        logger.info(f"bulk user import : {received} received, {inserted} inserted, {len(written) - inserted} updated")
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "message": "Users imported successfully",
+                "received": received,
+                "inserted": inserted,
+                "updated": len(written) - inserted,
+                # Repeated emails; the last row wins
+                "skipped": received - len(written),
+            }
+        )
+    except BulkImportError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Invalid rows, nothing was imported", "errors": e.to_dict()}
+        )
+    except IntegrityError as e:
+        await session.rollback()
+        logger.error(f"Bulk user import conflicts with existing users : {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A user_uuid in the import already belongs to a user with another email"
+        )
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Failed to import users : {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred while importing users"
+        )
+    finally:
+        remove_spool(path)
+
+
 @user_router.get("/{user_uuid}", status_code=status.HTTP_200_OK)
-async def get_user_details(user_uuid: str, session: Session = Depends(get_db)):
+async def get_user_details(user_uuid: str, session: AsyncSession = Depends(get_async_db)):
     try:
-        user_dao = UserDAO(session)
+        user_dao = AsyncUserDAO(session)
         user_uuid_obj = uuid.UUID(user_uuid)
-        user = user_dao.get_user_by_uuid(user_uuid_obj)
+        user = await user_dao.get_user_by_uuid(user_uuid_obj)
         
         if user is None:
             logger.error(f"User with UUID {user_uuid} not found")
@@ -43,13 +123,15 @@ async def get_user_details(user_uuid: str, session: Session = Depends(get_db)):
                 detail=f"User with UUID {user_uuid} not found"
             )
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "message": "User details fetched successfully",
-                "user": user.to_dict()
+                "user": User.serializer.from_object(user)
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to retrieve user details: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -57,12 +139,13 @@ async def get_user_details(user_uuid: str, session: Session = Depends(get_db)):
             detail="Internal server error occurred while retrieving user details"
         )
 
+
 @user_router.put("/{user_uuid}", status_code=status.HTTP_202_ACCEPTED)
-async def update_user_details(user_uuid: str, user_data: Dict[str, Any], session: Session = Depends(get_db)):
+async def update_user_details(user_uuid: str, user_data: Dict[str, Any], session: AsyncSession = Depends(get_async_db)):
     try:
-        user_dao = UserDAO(session)
+        user_dao = AsyncUserDAO(session)
         
-        updated_rows = user_dao.update_user_by_uuid(user_uuid=user_uuid, update_data=user_data)
+        updated_rows = await user_dao.update_user_by_uuid(user_uuid=user_uuid, update_data=user_data)
         
         if updated_rows == 0:
             logger.error(f"User with UUID {user_uuid} not found")
@@ -71,21 +154,24 @@ async def update_user_details(user_uuid: str, user_data: Dict[str, Any], session
                 detail=f"User with UUID {user_uuid} not found"
             )
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_202_ACCEPTED,
             content={
                 "message": f"User with UUID {user_uuid} updated successfully"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to update user details: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"error": "Internal Server Error", "details": str(e)}
+            detail="Internal server error occurred while updating user details"
         )
 
+
 @user_router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_user(user_data: Dict[str, str], session: Session = Depends(get_db)):
+async def create_user(user_data: Dict[str, str], session: AsyncSession = Depends(get_async_db)):
     try:
         # Validate required fields
         required_fields = ['user_email', 'user_firstname', 'user_lastname', 'user_password']
@@ -97,8 +183,8 @@ async def create_user(user_data: Dict[str, str], session: Session = Depends(get_
                 )
         
         # Check if user with the same email already exists
-        user_dao = UserDAO(session)
-        existing_user = user_dao.get_user_by_email(user_data['user_email'])
+        user_dao = AsyncUserDAO(session)
+        existing_user = await user_dao.get_user_by_email(user_data['user_email'])
         
         if existing_user:
             logger.error(f"User with email {user_data['user_email']} already exists")
@@ -107,13 +193,13 @@ async def create_user(user_data: Dict[str, str], session: Session = Depends(get_
                 detail="User with this email already exists"
             )
         # Create the user
-        new_user = user_dao.create_user(user_data)
+        new_user = await user_dao.create_user(user_data)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
                 "message": "User created successfully",
-                "user": new_user.to_dict()
+                "user": User.serializer.from_object(new_user)
             }
         )
     except HTTPException:
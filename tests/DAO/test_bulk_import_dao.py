@@ -0,0 +1,117 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from config.database import ASYNC_DATABASE_URL, DB_SCHEMA, Base
+from DAO.output_schema_dao import AsyncOutputSchemaDAO
+from DAO.user_dao import AsyncUserDAO
+from models.output_schema import OutputSchema
+from models.user import User
+
+
+def _run(test):
+    """Run test(session) on a fresh engine in its own loop, with the tables created if missing."""
+    async def main():
+        engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+        try:
+            async with engine.begin() as connection:
+                await connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{DB_SCHEMA}"'))
+                await connection.run_sync(Base.metadata.create_all, tables=[User.__table__, OutputSchema.__table__])
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                return await test(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    async def ping(session):
+        await session.execute(text("SELECT 1"))
+
+    try:
+        _run(ping)
+    except Exception as e:
+        pytest.skip(f"no database at {ASYNC_DATABASE_URL.split('@')[-1]}: {e}")
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _user(seq, email, firstname, user_uuid=None):
+    return (seq, user_uuid or uuid.uuid4(), email, "pw", firstname, "Lee")
+
+
+def test_users_are_copied_and_merged_on_email():
+    tag = uuid.uuid4().hex
+    existing, new = f"existing-{tag}@example.com", f"new-{tag}@example.com"
+
+    async def test(session):
+        try:
+            await AsyncUserDAO(session).create_user({
+                "user_email": existing, "user_password": "old", "user_firstname": "Old", "user_lastname": "Lee",
+            })
+            # The new address appears in both chunks; its later row wins
+            staged, written = await AsyncUserDAO(session).bulk_import_users(_chunks(
+                [_user(0, new, "First"), _user(1, existing, "Updated")],
+                [_user(2, new, "Last")],
+            ))
+            rows = (await session.execute(
+                select(User.user_email, User.user_firstname, User.user_password).where(User.user_email.in_([existing, new]))
+            )).all()
+            return staged, sorted(written), sorted(rows)
+        finally:
+            await session.execute(delete(User).where(User.user_email.in_([existing, new])))
+            await session.commit()
+
+    staged, written, rows = _run(test)
+
+    assert staged == 3
+    assert written == [(existing, False), (new, True)]
+    assert rows == [(existing, "Updated", "pw"), (new, "Last", "pw")]
+
+
+def test_schemas_are_merged_per_owner_and_bump_their_version():
+    owner, other_owner = uuid.uuid4(), uuid.uuid4()
+    kept, foreign, created = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    async def test(session):
+        try:
+            dao = AsyncOutputSchemaDAO(session)
+            session.add_all([
+                OutputSchema(schema_uuid=kept, user_uuid=owner, schema_name="kept", schema={"a": ""}),
+                OutputSchema(schema_uuid=foreign, user_uuid=other_owner, schema_name="theirs", schema={"a": ""}),
+            ])
+            await session.commit()
+            staged, written = await dao.bulk_import_output_schemas(_chunks([
+                (0, kept, "renamed", owner, json.dumps({"b": "", "a": ""})),
+                # Another user's schema_uuid is left alone rather than copied under this owner
+                (1, foreign, "stolen", owner, json.dumps({"x": ""})),
+                (2, created, None, owner, json.dumps({"c": ""})),
+            ]))
+            rows = (await session.execute(
+                select(OutputSchema.schema_uuid, OutputSchema.user_uuid, OutputSchema.schema_name, OutputSchema.schema, OutputSchema.schema_version)
+                .where(OutputSchema.user_uuid.in_([owner, other_owner]))
+            )).all()
+            return staged, sorted(written), {row[0]: tuple(row[1:]) for row in rows}
+        finally:
+            await session.execute(delete(OutputSchema).where(OutputSchema.user_uuid.in_([owner, other_owner])))
+            await session.commit()
+
+    staged, written, rows = _run(test)
+
+    assert staged == 3
+    assert written == sorted([(kept, False), (created, True)])
+    # The JSON column keeps the imported key order
+    assert list(rows[kept][2]) == ["b", "a"]
+    assert rows[kept][1:2] == ("renamed",) and rows[kept][3] == 2
+    assert rows[foreign] == (other_owner, "theirs", {"a": ""}, 1)
+    assert rows[created] == (owner, None, {"c": ""}, 1)
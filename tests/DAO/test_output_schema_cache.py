@@ -0,0 +1,98 @@
+import uuid
+
+import pytest
+from sqlalchemy import delete, text
+
+from config import setting
+from config.database import SessionLocal, engine
+from DAO.output_schema_dao import OutputSchemaDAO
+from handlers.sync_handlers.output_schema_cache import OutputSchemaCache
+from models.output_schema import OutputSchema
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{setting.SCHEMA_SYNC_DB_SCHEMA_NAME}"'))
+            OutputSchema.metadata.create_all(connection, tables=[OutputSchema.__table__])
+    except Exception as e:
+        pytest.skip(f"no database at {setting.DB_HOST}:{setting.DB_PORT}: {e}")
+
+
+@pytest.fixture
+def owners():
+    owners = uuid.uuid4(), uuid.uuid4()
+    yield owners
+    with SessionLocal() as session:
+        session.execute(delete(OutputSchema).where(OutputSchema.user_uuid.in_(owners)))
+        session.commit()
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """The queries the cache runs: ("versions", schema_uuids) for the stamps, ("full", schema_uuids) for whole schemas."""
+    reads = []
+    get_versions = OutputSchemaDAO.get_schema_versions
+    get_schemas = OutputSchemaDAO.get_output_schemas_by_schema_uuids
+
+    def versions(self, user_uuid, schema_uuids):
+        reads.append(("versions", list(schema_uuids)))
+        return get_versions(self, user_uuid=user_uuid, schema_uuids=schema_uuids)
+
+    def schemas(self, user_uuid, schema_uuids):
+        reads.append(("full", list(schema_uuids)))
+        return get_schemas(self, user_uuid=user_uuid, schema_uuids=schema_uuids)
+
+    monkeypatch.setattr(OutputSchemaDAO, "get_schema_versions", versions)
+    monkeypatch.setattr(OutputSchemaDAO, "get_output_schemas_by_schema_uuids", schemas)
+    return reads
+
+
+def _create(user_uuid, schema):
+    with SessionLocal() as session:
+        return str(OutputSchemaDAO(session).create_output_schema(user_uuid, {"schema_name": "orders", "schema": schema}).schema_uuid)
+
+
+def test_a_warm_read_checks_versions_and_a_bump_reloads_the_schema(owners, reads):
+    owner, _ = owners
+    schema_uuid = _create(owner, {"name": ""})
+    cache = OutputSchemaCache()
+
+    assert cache.get_schemas(owner, [schema_uuid, "not-a-uuid"]) == {schema_uuid: {"name": ""}}
+    assert cache.get_schemas(owner, [schema_uuid]) == {schema_uuid: {"name": ""}}
+    assert reads == [("full", [schema_uuid]), ("versions", [schema_uuid])]
+
+    # Written by another worker, whose invalidation this process never sees
+    with SessionLocal() as session:
+        OutputSchemaDAO(session).update_output_schema_by_schema_uuid(schema_uuid, {"schema": {"name": "", "city": ""}})
+    reads.clear()
+
+    assert cache.get_schemas(owner, [schema_uuid]) == {schema_uuid: {"name": "", "city": ""}}
+    assert reads == [("versions", [schema_uuid]), ("full", [schema_uuid])]
+
+
+def test_a_cached_schema_is_not_served_to_another_user(owners, reads):
+    owner, other = owners
+    schema_uuid = _create(owner, {"name": ""})
+    cache = OutputSchemaCache()
+    cache.get_schemas(owner, [schema_uuid])
+    reads.clear()
+
+    assert cache.get_schemas(other, [schema_uuid]) == {}
+    # The entry is dropped and the owner's next read loads it again
+    assert reads == [("versions", [schema_uuid])]
+    assert cache.get_schemas(owner, [schema_uuid]) == {schema_uuid: {"name": ""}}
+    assert reads[-1] == ("full", [schema_uuid])
+
+
+def test_a_deleted_schema_is_not_served(owners):
+    owner, _ = owners
+    schema_uuid = _create(owner, {"name": ""})
+    cache = OutputSchemaCache()
+    cache.get_schemas(owner, [schema_uuid])
+
+    with SessionLocal() as session:
+        OutputSchemaDAO(session).delete_schema_by_schema_uuid(schema_uuid)
+
+    assert cache.get_schemas(owner, [schema_uuid]) == {}
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The packages are plain directories at the repo root, imported the way main.py imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("GROQ_API_KEY", "test")
@@ -0,0 +1,51 @@
+import asyncio
+import io
+import os
+
+from starlette.datastructures import UploadFile
+
+from config import setting
+from handlers.file_handlers.file_store import FileStore
+
+
+def _stage(store, data, filename="people.csv"):
+    return asyncio.run(store.put(UploadFile(file=io.BytesIO(data), filename=filename)))
+
+
+def test_identical_bytes_are_staged_once(tmp_path):
+    store = FileStore(str(tmp_path))
+    first = _stage(store, b"name,age\nAnn,3\n")
+    second = _stage(store, b"name,age\nAnn,3\n", filename="copy.csv")
+
+    assert first == second
+    assert first["columns"] == ["name", "age"]
+    assert sorted(os.listdir(tmp_path)) == [f"{first['file_id']}.data", f"{first['file_id']}.json"]
+
+
+def test_pinned_file_outlives_eviction_and_carries_the_listing(tmp_path, monkeypatch):
+    store = FileStore(str(tmp_path))
+    file_id = _stage(store, b"name,age\nAnn,3\n")["file_id"]
+
+    pinned = store.open(file_id)
+    monkeypatch.setattr(setting, "FILE_STORE_MAX_BYTES", 0)
+    store.evict()
+
+    assert store.get(file_id) is None
+    assert pinned.listing == {"columns": ["name", "age"]}
+    with open(pinned.name, "rb") as reopened:
+        assert reopened.read() == b"name,age\nAnn,3\n"
+    assert pinned.read() == b"name,age\nAnn,3\n"
+
+    pinned.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_unknown_or_evicted_file_opens_as_none(tmp_path, monkeypatch):
+    store = FileStore(str(tmp_path))
+    file_id = _stage(store, b"a\n1\n")["file_id"]
+    monkeypatch.setattr(setting, "FILE_STORE_MAX_BYTES", 0)
+    store.evict()
+
+    assert store.open(file_id) is None
+    assert store.open("not-a-file-id") is None
+    assert store.open("0" * 64) is None
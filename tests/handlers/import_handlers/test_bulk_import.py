@@ -0,0 +1,112 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from config import setting
+from handlers.import_handlers.bulk_import import (
+    BulkImportError,
+    import_format,
+    iter_record_chunks,
+    read_record_chunks,
+    schema_record,
+    user_record,
+)
+
+USER_UUID = "6f1c2b1e-8a53-4d0e-9a3e-0d3c1f6f8b11"
+
+
+def _user(email, **fields):
+    return {"user_email": email, "user_password": "pw", "user_firstname": "Ann", "user_lastname": "Lee", **fields}
+
+
+def test_import_format_from_content_type():
+    assert import_format("application/x-ndjson; charset=utf-8") == "ndjson"
+    assert import_format("Text/CSV") == "csv"
+    assert import_format("application/json") is None
+    assert import_format(None) is None
+
+
+def test_schema_record_parses_csv_json_text_and_checks_specs():
+    schema_uuid, schema_name, user_uuid, schema = schema_record({"user_uuid": USER_UUID, "schema": '{"b": "", "a": ""}'})
+
+    assert isinstance(schema_uuid, uuid.UUID)
+    assert schema_name is None
+    assert user_uuid == uuid.UUID(USER_UUID)
+    # Key order is the output column order and is kept
+    assert schema == '{"b": "", "a": ""}'
+
+    for row, message in [
+        ({"user_uuid": USER_UUID, "schema": "{"}, "not valid JSON"),
+        ({"user_uuid": USER_UUID, "schema": {}}, "non-empty object"),
+        ({"schema": {"a": ""}}, "missing user_uuid"),
+        ({"user_uuid": "nope", "schema": {"a": ""}}, "invalid user_uuid"),
+        ({"user_uuid": USER_UUID, "schema": {"a": {"type": "money"}}}, "type must be one of"),
+    ]:
+        with pytest.raises(ValueError, match=message):
+            schema_record(row)
+
+
+def test_user_record_requires_every_text_field():
+    record = user_record(_user("ann@example.com", user_uuid=USER_UUID))
+    assert record == (uuid.UUID(USER_UUID), "ann@example.com", "pw", "Ann", "Lee")
+
+    with pytest.raises(ValueError, match="missing user_lastname"):
+        user_record(_user("ann@example.com", user_lastname=" "))
+    with pytest.raises(ValueError, match="user_email must be a string"):
+        user_record(_user(7))
+
+
+def test_records_are_chunked_and_numbered_in_file_order(tmp_path):
+    path = tmp_path / "users.ndjson"
+    path.write_text("\n".join(json.dumps(_user(f"{index}@example.com")) for index in range(5)) + "\n\n")
+
+    chunks = list(read_record_chunks(str(path), "ndjson", user_record, chunk_rows=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [record[0] for chunk in chunks for record in chunk] == [0, 1, 2, 3, 4]
+    assert chunks[2][0][2] == "4@example.com"
+
+
+def test_invalid_rows_are_reported_by_line(tmp_path):
+    path = tmp_path / "users.csv"
+    # A byte order mark is dropped, and a quoted field spanning lines keeps the numbering right
+    path.write_text(
+        "\ufeffuser_email,user_password,user_firstname,user_lastname\n"
+        "a@example.com,pw,Ann,Lee\n"
+        "b@example.com,,Bo,\"Multi\nLine\"\n"
+        ",pw,Cy,Doe\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(BulkImportError) as raised:
+        list(read_record_chunks(str(path), "csv", user_record, chunk_rows=100))
+
+    assert raised.value.to_dict() == [
+        {"line": 4, "error": "missing user_password"},
+        {"line": 5, "error": "missing user_email"},
+    ]
+
+
+def test_errors_stop_the_read_at_the_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(setting, "BULK_IMPORT_MAX_ERRORS", 3)
+    path = tmp_path / "schemas.ndjson"
+    path.write_text("[]\n" * 10)
+
+    with pytest.raises(BulkImportError) as raised:
+        list(read_record_chunks(str(path), "ndjson", schema_record, chunk_rows=100))
+
+    assert raised.value.errors == [(1, "not a JSON object"), (2, "not a JSON object"), (3, "not a JSON object")]
+
+
+def test_async_chunks_match_the_sync_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(setting, "BULK_IMPORT_CHUNK_ROWS", 2)
+    path = tmp_path / "users.ndjson"
+    path.write_text("\n".join(json.dumps(_user(f"{index}@example.com")) for index in range(3)))
+
+    async def collect():
+        return [chunk async for chunk in iter_record_chunks(str(path), "ndjson", user_record)]
+
+    chunks = asyncio.run(collect())
+    assert [[record[2] for record in chunk] for chunk in chunks] == [["0@example.com", "1@example.com"], ["2@example.com"]]
@@ -0,0 +1,84 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from handlers.sync_handlers.column_matcher import (
+    assign_columns,
+    local_mapping_result,
+    match_columns,
+    merge_partial_mapping,
+    normalize_header,
+    score_columns,
+    split_match,
+)
+
+
+def test_normalize_header_splits_camel_case_and_expands_abbreviations():
+    assert normalize_header("custFname") == ["customer", "first", "name"]
+    assert normalize_header("Txn_Amt (USD)") == ["transaction", "amount", "usd"]
+    assert normalize_header("HTTPStatus") == ["http", "status"]
+    assert normalize_header(42) == ["42"]
+
+
+def test_equivalent_spellings_score_one_and_misspellings_still_rank():
+    scores = score_columns(["First_Name", "Emial", "qty"], ["first name", "email", "Quantity", "zip"])
+
+    assert scores[0, 0] == 1.0
+    assert scores[2, 2] == 1.0
+    # The typo's best target is the one it misspells
+    assert int(np.argmax(scores[1])) == 1
+    assert scores.shape == (3, 4)
+    assert ((scores >= 0) & (scores <= 1)).all()
+
+
+def test_empty_headers_give_an_empty_score_matrix():
+    assert score_columns([], ["a"]).shape == (0, 1)
+    assert match_columns(["a"], [])["reordered_columns"] == []
+
+
+@pytest.mark.parametrize("shape", [(3, 3), (5, 3), (4, 4), (6, 2)])
+def test_assignment_is_one_to_one_and_maximal(shape):
+    rng = np.random.default_rng(sum(shape))
+    scores = rng.random(shape)
+
+    assignment = assign_columns(scores)
+
+    assert len(set(assignment)) == shape[1]
+    best = max(
+        sum(scores[source, target] for target, source in enumerate(sources))
+        for sources in itertools.permutations(range(shape[0]), shape[1])
+    )
+    assert sum(scores[source, target] for target, source in enumerate(assignment)) == pytest.approx(best)
+
+
+def test_targets_beyond_the_sources_are_left_unassigned():
+    match = match_columns(["email"], ["name", "email"])
+    assert match["reordered_columns"] == [None, 0]
+    assert match["confidence"] == [0.0, 1.0]
+
+
+def test_local_mapping_needs_every_target_over_the_threshold():
+    targets = ["name", "email", "phone number"]
+    confident = local_mapping_result(match_columns(["Phone_No", "E-mail", "Name"], targets), targets, 0.85)
+    assert confident["reordered_columns"] == [2, 1, 0]
+    assert confident["mapping_source"] == "local"
+
+    # "Phone No" is only a partial match for "phone"
+    targets = ["name", "email", "phone"]
+    unsure = local_mapping_result(match_columns(["Name", "E-mail", "Phone No"], targets), targets, 0.85)
+    assert unsure["error"] is True
+    assert "phone" in unsure["error_message"]
+
+
+def test_partial_mapping_merges_into_the_fixed_pairs():
+    match = match_columns(["name", "c1", "email", "c2"], ["email", "city", "name", "zip"])
+    resolved, unresolved_targets, unclaimed_sources = split_match(match, 0.9)
+
+    assert resolved == {0: 2, 2: 0}
+    assert unresolved_targets == [1, 3]
+    assert unclaimed_sources == [1, 3]
+    assert merge_partial_mapping(resolved, unresolved_targets, unclaimed_sources, [1, 0]) == [2, 3, 0, 1]
+    # Out of range, repeated, non-integer or wrongly sized picks are rejected rather than guessed at
+    for invalid in ([2, 0], [0, 0], [True, 0], ["0", 1], [0], None):
+        assert merge_partial_mapping(resolved, unresolved_targets, unclaimed_sources, invalid) is None
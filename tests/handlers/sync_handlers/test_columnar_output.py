@@ -0,0 +1,63 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from config import setting
+from handlers.sync_handlers.columnar_output import iter_columnar_bytes, output_options
+from handlers.sync_handlers.csv_loader import iter_csv_columns
+
+
+def _read_back(data, output_format):
+    if output_format == "parquet":
+        return pq.read_table(io.BytesIO(data))
+    if output_format == "arrow":
+        return pa.ipc.open_stream(data).read_all()
+    return pa.ipc.open_file(data).read_all()
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+@pytest.mark.parametrize("output_format", ["parquet", "arrow", "feather"])
+def test_streamed_csv_whose_types_drift_across_chunks(tmp_path, monkeypatch, engine, output_format):
+    monkeypatch.setattr(setting, "SYNC_PARSE_ENGINE", engine)
+    monkeypatch.setattr(setting, "SYNC_STREAM_CHUNK_ROWS", 2)
+    path = tmp_path / "drift.csv"
+    # Integers in the first chunk, then a fraction, a gap and text further down
+    path.write_text("id,amount,code\n1,2,7\n3,4,8\n5,4.5,\n6,,x\n")
+
+    frames = iter_csv_columns(str(path), [0, 1, 2], chunk_rows=2)
+    table = _read_back(b"".join(iter_columnar_bytes(frames, output_format, "none")), output_format)
+
+    assert table.num_rows == 4
+    assert table.column("amount").to_pylist() == ["2", "4", "4.5", None]
+    assert table.column("code").to_pylist() == ["7", "8", None, "x"]
+
+
+def test_first_chunk_fixes_the_schema_and_empty_columns_become_text():
+    frames = [
+        pd.DataFrame({"name": ["a", "b"], "note": [None, None]}),
+        pd.DataFrame({"name": ["c"], "note": ["later"]}),
+    ]
+
+    table = _read_back(b"".join(iter_columnar_bytes(frames, "parquet", "snappy")), "parquet")
+
+    assert table.schema.field("note").type == pa.string()
+    assert table.column("note").to_pylist() == [None, None, "later"]
+
+
+def test_header_only_input_still_writes_its_columns():
+    data = b"".join(iter_columnar_bytes([], "feather", "lz4", columns=["a", "b"]))
+    table = _read_back(data, "feather")
+    assert table.column_names == ["a", "b"]
+    assert table.num_rows == 0
+
+
+def test_output_options_prefer_the_file_entry():
+    sync_metadata = {"output_format": "parquet"}
+    assert output_options({"output_format": "ARROW", "compression": "zstd"}, sync_metadata) == ("arrow", "zstd")
+    assert output_options(None, sync_metadata) == ("parquet", setting.SYNC_PARQUET_COMPRESSION)
+    assert output_options({}, {}) == (None, None)
+    with pytest.raises(ValueError):
+        output_options({"output_format": "feather", "compression": "snappy"}, {})
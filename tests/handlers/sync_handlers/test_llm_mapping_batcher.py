@@ -0,0 +1,115 @@
+import asyncio
+import json
+import re
+
+from config import setting
+from handlers.sync_handlers.llm_mapping_batcher import LLMMappingBatcher
+
+
+class FakeLLMClient:
+    """Answers every input listed in a prompt from `answers`, keyed by its CSV columns."""
+
+    def __init__(self, answers, fail=False):
+        self.answers = answers
+        self.fail = fail
+        self.prompts = []
+
+    async def complete(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("service unavailable")
+        results = {}
+        for name, columns in re.findall(r"(input_\d+) \(schema_\d+\), CSV columns: (\[.*?\])", prompt):
+            answer = self.answers.get(columns)
+            if answer is not None:
+                results[name] = answer
+        return json.dumps(results)
+
+
+def _ok(*reordered_columns):
+    return {"reordered_columns": list(reordered_columns), "error": False, "error_message": None}
+
+
+def _run(batcher, requests, leaving=()):
+    """Each request is (name, columns, schema); the names in leaving join the batch but never ask."""
+    async def ask(name, columns, schema):
+        return await batcher.participant(name).request("csv", columns, schema, len(columns))
+
+    async def leave(name):
+        batcher.participant(name).leave()
+
+    async def main():
+        return await asyncio.gather(*(ask(*request) for request in requests), *(leave(name) for name in leaving))
+
+    return asyncio.run(main())[:len(requests)]
+
+
+def test_requests_share_one_call_and_each_schema_is_listed_once():
+    schema = {"name": "", "total": ""}
+    llm = FakeLLMClient({"['Total', 'Who']": _ok(1, 0), "['Person', 'Sum']": _ok(0, 1)})
+    batcher = LLMMappingBatcher(participants=3, llm_client=llm)
+
+    results = _run(batcher, [("a.csv", ["Total", "Who"], schema), ("b.csv", ["Person", "Sum"], schema)], leaving=["c.csv"])
+
+    assert results == [_ok(1, 0), _ok(0, 1)]
+    assert len(llm.prompts) == 1
+    assert llm.prompts[0].count(str(schema)) == 1
+
+
+def test_a_lone_request_goes_back_to_the_single_file_prompt():
+    llm = FakeLLMClient({})
+    batcher = LLMMappingBatcher(participants=2, llm_client=llm)
+
+    assert _run(batcher, [("a.csv", ["x"], {"x": ""})], leaving=["b.csv"]) == [None]
+    assert llm.prompts == []
+
+
+def test_malformed_or_missing_answers_are_retried_individually():
+    schema = {"a": "", "b": ""}
+    llm = FakeLLMClient({
+        "['p', 'q']": _ok(1, 0),
+        "['r', 's']": _ok(0, 0),
+        "['t', 'u']": _ok(0, 2),
+        "['v', 'w']": {"reordered_columns": None, "error": True, "error_message": "column b not found"},
+    })
+    batcher = LLMMappingBatcher(participants=5, llm_client=llm)
+    requests = [(f"{index}.csv", columns, schema) for index, columns in enumerate([["p", "q"], ["r", "s"], ["t", "u"], ["v", "w"], ["y", "z"]])]
+
+    results = _run(batcher, requests)
+
+    # Repeated and out of range indexes are malformed, and "y, z" was left out of the answer
+    assert results[0] == _ok(1, 0)
+    assert results[1] is None and results[2] is None and results[4] is None
+    assert results[3]["error"] is True
+
+
+def test_a_failed_call_leaves_every_request_to_its_own_call():
+    llm = FakeLLMClient({}, fail=True)
+    batcher = LLMMappingBatcher(participants=2, llm_client=llm)
+
+    assert _run(batcher, [("a.csv", ["x"], {"x": ""}), ("b.csv", ["y"], {"y": ""})]) == [None, None]
+    assert len(llm.prompts) == 1
+
+
+def test_queued_requests_are_sent_after_the_wait_without_the_stragglers(monkeypatch):
+    monkeypatch.setattr(setting, "LLM_BATCH_MAX_WAIT_MS", 20)
+    llm = FakeLLMClient({"['x']": _ok(0), "['y']": _ok(0)})
+    # A third participant never asks nor leaves, e.g. a file still being read
+    batcher = LLMMappingBatcher(participants=3, llm_client=llm)
+
+    assert _run(batcher, [("a.csv", ["x"], {"x": ""}), ("b.csv", ["y"], {"y": ""})]) == [_ok(0), _ok(0)]
+    assert len(llm.prompts) == 1
+
+
+def test_a_batch_over_the_prompt_budget_is_split_into_calls(monkeypatch):
+    schema = {"column": ""}
+    monkeypatch.setattr(setting, "LLM_BATCH_MAX_PROMPT_CHARS", 90)
+    columns = [[f"header_{index}_{'x' * 20}"] for index in range(4)]
+    llm = FakeLLMClient({json.dumps(column).replace('"', "'"): _ok(0) for column in columns})
+    batcher = LLMMappingBatcher(participants=4, llm_client=llm)
+
+    results = _run(batcher, [(f"{index}.csv", column, schema) for index, column in enumerate(columns)])
+
+    # Two requests fit a call; a call of one would have gone back to the single-file prompt
+    assert results == [_ok(0)] * 4
+    assert len(llm.prompts) == 2
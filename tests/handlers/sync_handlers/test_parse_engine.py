@@ -0,0 +1,112 @@
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from config import setting
+from handlers.sync_handlers import sync_handler_csv, sync_handler_excel
+from handlers.sync_handlers.sync_output_writer import iter_csv_bytes, write_excel
+
+# A repeated header name, an empty cell, and a quoted field holding a comma and a line break
+CSV = 'id,name,name,note\n1,Ann,A,"x, y"\n2,,B,"two\nlines"\n3,Cy,C,\n'
+MAPPING = {"reordered_columns": [3, 2, 0], "error": False, "error_message": None}
+SCHEMA = {"note": "", "alias": "", "id": ""}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text(CSV)
+    return str(path)
+
+
+def _with_engine(monkeypatch, engine, read):
+    monkeypatch.setattr(setting, "SYNC_PARSE_ENGINE", engine)
+    return read()
+
+
+def _csv_text(frames, columns):
+    return b"".join(iter_csv_bytes(frames, columns=columns)).decode("utf-8")
+
+
+def test_csv_engines_give_the_same_output(csv_path, monkeypatch):
+    outputs = {
+        engine: _with_engine(monkeypatch, engine, lambda: sync_handler_csv._read_and_transform(csv_path, MAPPING, SCHEMA)[0])
+        for engine in ("c", "pyarrow")
+    }
+
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in outputs["pyarrow"].dtypes)
+    assert outputs["pyarrow"]["alias"].tolist() == ["A", "B", "C"]
+    assert outputs["pyarrow"]["note"].tolist() == ["x, y", "two\nlines", pd.NA]
+    assert _csv_text([outputs["pyarrow"]], list(SCHEMA)) == _csv_text([outputs["c"]], list(SCHEMA))
+
+
+def test_streamed_csv_chunks_match_across_engines(csv_path, monkeypatch):
+    def chunks():
+        # The chunk generator removes its input once read through, so each engine reads a copy
+        path = f"{csv_path}.{setting.SYNC_PARSE_ENGINE}"
+        with open(csv_path) as source, open(path, "w") as copy:
+            copy.write(source.read())
+        return list(sync_handler_csv._iter_output_chunks(path, MAPPING, SCHEMA, chunk_size=2))
+
+    outputs = {engine: _with_engine(monkeypatch, engine, chunks) for engine in ("c", "pyarrow")}
+
+    assert [len(chunk) for chunk in outputs["pyarrow"]] == [2, 1]
+    # Row labels continue across chunks, as the pandas reader numbers them
+    assert outputs["pyarrow"][1].index.tolist() == [2]
+    assert _csv_text(outputs["pyarrow"], list(SCHEMA)) == _csv_text(outputs["c"], list(SCHEMA))
+
+
+def test_validation_casts_arrow_columns(csv_path, monkeypatch):
+    schema = {"note": "", "alias": {"enum": ["A", "C"]}, "id": {"type": "int"}}
+    monkeypatch.setattr(setting, "SYNC_PARSE_ENGINE", "pyarrow")
+
+    valid, _, validation, rejects = sync_handler_csv._read_and_transform(csv_path, MAPPING, schema, keep_rejects=True)
+
+    assert str(valid["id"].dtype) == "int64[pyarrow]"
+    assert valid["id"].tolist() == [1, 3]
+    assert rejects["_row"].tolist() == [3]
+    assert validation == {"rejected_rows": 1, "invalid_values": {"alias": 1}}
+
+
+def _workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "People"
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("title_rows", [0, 2], ids=["header-first", "title-rows"])
+def test_excel_engines_give_the_same_sheet(tmp_path, monkeypatch, title_rows):
+    rows = [["id", "name", "joined"], [1, "Ann", pd.Timestamp("2024-01-02")], [2, None, None]]
+    path = _workbook(tmp_path / "people.xlsx", [["Report"], []][:title_rows] + rows)
+    # skip_n_rows counts the rows above the header
+    mapping = {"reordered_columns": [1, 0, 2], "error": False, "error_message": None, "skip_n_rows": title_rows}
+    schema = {"name": "", "id": "", "joined": ""}
+
+    def transform():
+        return sync_handler_excel._read_and_transform(path, "People", mapping, schema)[0]
+
+    outputs = {engine: _with_engine(monkeypatch, engine, transform) for engine in ("c", "pyarrow")}
+
+    assert str(outputs["pyarrow"]["name"].dtype) == "string[pyarrow]"
+    assert outputs["pyarrow"]["name"].tolist() == ["Ann", pd.NA]
+    assert outputs["pyarrow"]["id"].tolist() == [1, 2]
+    if title_rows:
+        # The title rows above the header mix text into the other columns, which keep the values read
+        assert outputs["pyarrow"]["joined"].iloc[0] == pd.Timestamp("2024-01-02")
+    else:
+        assert str(outputs["pyarrow"]["id"].dtype) == "int64[pyarrow]"
+        assert isinstance(outputs["pyarrow"]["joined"].dtype, pd.ArrowDtype)
+    # The written workbook reads back the same either way, dates included
+    written = {}
+    for engine, frame in outputs.items():
+        buffer = io.BytesIO()
+        write_excel(buffer, {"file": frame, "sheet_name": "People", "source": path})
+        written[engine] = pd.read_excel(io.BytesIO(buffer.getvalue()), sheet_name="People")
+    pd.testing.assert_frame_equal(written["pyarrow"], written["c"])
+    assert written["pyarrow"]["joined"].iloc[0] == pd.Timestamp("2024-01-02")
@@ -0,0 +1,119 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from handlers.sync_handlers.schema_validation import (
+    ERRORS_COLUMN,
+    ROW_COLUMN,
+    column_spec,
+    column_specs,
+    reject_columns,
+    validate_frame,
+    validation_summary,
+)
+
+
+def _arrow(df):
+    return df.astype({name: pd.ArrowDtype(pa.string()) for name in df.columns})
+
+
+def test_plain_schema_values_are_not_specs():
+    specs = column_specs({"name": "", "note": "free text", "id": {"type": "int"}, "city": {"enum": ["Pune"]}})
+
+    assert sorted(specs) == ["city", "id"]
+    assert specs["city"].type == "string"
+    assert column_spec("raw", {"description": "kept as is"}) is None
+
+
+@pytest.mark.parametrize("value, message", [
+    ({"type": "money"}, "type must be one of"),
+    ({"type": "int", "format": "%Y"}, "format must be a strptime pattern"),
+    ({"type": "date", "enum": ["2024-01-01"]}, "enum must be a non-empty list"),
+    ({"enum": []}, "enum must be a non-empty list"),
+    ({"type": "int", "enum": [1, True]}, "enum values must be numbers"),
+    ({"type": "float", "regex": r"\d+"}, "regex must be a pattern"),
+    ({"regex": "("}, "invalid regex"),
+    ({"nullable": "no"}, "nullable must be true or false"),
+])
+def test_malformed_specs_are_rejected(value, message):
+    with pytest.raises(ValueError, match=f"^amount: {message}"):
+        column_spec("amount", value)
+
+
+@pytest.mark.parametrize("as_arrow", [False, True], ids=["numpy", "arrow"])
+def test_valid_rows_are_cast_and_rejects_keep_the_values_read(as_arrow):
+    df = pd.DataFrame({
+        "id": ["1", "2", "x", "4", "5.5"],
+        "price": ["1.5", "2", "3", "nope", None],
+        "day": ["2024-01-31", "2024-02-01", "2024-02-02", "2024-13-01", "2024-02-04"],
+        "note": ["a", "b", "c", "d", "e"],
+    })
+    if as_arrow:
+        df = _arrow(df)
+    specs = column_specs({
+        "id": {"type": "int"},
+        "price": {"type": "float"},
+        "day": {"type": "date", "format": "%Y-%m-%d"},
+        "note": "",
+    })
+
+    valid, rejects, counts = validate_frame(df, specs)
+
+    assert valid["id"].tolist() == [1, 2]
+    assert valid["price"].tolist() == [1.5, 2.0]
+    assert pd.api.types.is_integer_dtype(valid["id"].dtype)
+    assert str(valid["day"].iloc[0])[:10] == "2024-01-31"
+    assert valid["note"].tolist() == ["a", "b"]
+
+    # A missing price is allowed; the failed cast is reported, not the blank
+    assert list(rejects.columns) == reject_columns(df.columns)
+    assert rejects[ROW_COLUMN].tolist() == [4, 5, 6]
+    assert rejects["id"].tolist() == ["x", "4", "5.5"]
+    assert rejects[ERRORS_COLUMN].tolist() == [
+        "id: not an integer",
+        "price: not a number; day: not a date (%Y-%m-%d)",
+        "id: not an integer",
+    ]
+    assert counts == {"id": 2, "price": 1, "day": 1}
+
+
+def test_required_enum_and_pattern_checks():
+    df = pd.DataFrame({
+        "sku": ["SKU-1", "SKU-22", "sku-3", None, "SKU-4x"],
+        "status": ["open", "shipped", "open", "lost", None],
+        "vendor": ["A", None, "B", "C", "D"],
+        "qty": [1, 2, 3, 4, 9],
+    })
+    specs = column_specs({
+        "sku": {"regex": r"SKU-\d+"},
+        "status": {"enum": ["open", "shipped"]},
+        "vendor": {"nullable": False},
+        "qty": {"type": "int", "enum": [1, 2, 3, 4]},
+    })
+
+    valid, rejects, counts = validate_frame(df, specs, first_row=0)
+
+    # A missing sku or status is only rejected when the column is required
+    assert valid.index.tolist() == [0]
+    assert rejects[ROW_COLUMN].tolist() == [1, 2, 3, 4]
+    assert rejects[ERRORS_COLUMN].tolist() == [
+        "vendor: missing value",
+        "sku: does not match the pattern",
+        "status: not one of the allowed values",
+        "sku: does not match the pattern; qty: not one of the allowed values",
+    ]
+    assert validation_summary(len(rejects), counts) == {
+        "rejected_rows": 4,
+        "invalid_values": {"sku": 2, "status": 1, "vendor": 1, "qty": 1},
+    }
+
+
+def test_frames_without_specs_or_failures_pass_through():
+    df = pd.DataFrame({"qty": ["1", "2"], "name": ["a", "b"]})
+
+    assert validate_frame(df, {}) == (df, None, {})
+    valid, rejects, counts = validate_frame(df, column_specs({"qty": {"type": "int"}, "missing": {"type": "int"}}))
+    assert rejects is None and counts == {}
+    assert valid["qty"].tolist() == [1, 2]
+    # The source frame is not cast in place
+    assert df["qty"].tolist() == ["1", "2"]
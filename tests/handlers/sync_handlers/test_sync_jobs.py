@@ -0,0 +1,274 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+import main
+from config import setting
+from config.database import ASYNC_DATABASE_URL, SessionLocal, engine, get_async_db
+from DAO.sync_job_dao import SyncJobDAO
+from handlers.sync_handlers import sync_jobs
+from handlers.sync_handlers.llm_client import LLMClient
+from router import sync_router
+from models.column_mapping import ColumnMapping
+from models.output_schema import OutputSchema
+from models.sync_job import SyncJob
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{setting.SCHEMA_SYNC_DB_SCHEMA_NAME}"'))
+            SyncJob.metadata.create_all(connection, tables=[SyncJob.__table__, OutputSchema.__table__, ColumnMapping.__table__])
+    except Exception as e:
+        pytest.skip(f"no database at {setting.DB_HOST}:{setting.DB_PORT}: {e}")
+
+
+@pytest.fixture(autouse=True)
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(setting, "SYNC_JOB_DIR", str(tmp_path / "jobs"))
+
+
+@pytest.fixture
+def session():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def job_uuids(session):
+    """Jobs a test created, deleted afterwards."""
+    job_uuids = []
+    yield job_uuids
+    session.execute(delete(SyncJob).where(SyncJob.job_uuid.in_([uuid.UUID(job_uuid) for job_uuid in job_uuids])))
+    session.commit()
+
+
+def _queue_job(session, job_uuids, filenames=()):
+    """A queued job, as the POST /sync/jobs route creates it."""
+    job_uuid = str(uuid.uuid4())
+    SyncJobDAO(session).create_job(job_uuid, None, {"stage": "queued", "files": {filename: {"stage": "queued"} for filename in filenames}})
+    job_uuids.append(job_uuid)
+    return job_uuid
+
+
+def _job(session, job_uuid):
+    session.expire_all()
+    return SyncJobDAO(session).get_job_by_uuid(job_uuid)
+
+
+def _write_inputs(job_uuid, contents):
+    inputs_dir = sync_jobs.job_inputs_dir(job_uuid)
+    os.makedirs(inputs_dir)
+    inputs = []
+    for filename, content in contents.items():
+        path = os.path.join(inputs_dir, filename)
+        with open(path, "w") as input_file:
+            input_file.write(content)
+        inputs.append((filename, path))
+    return inputs
+
+
+class _SessionUse:
+    """Records the thread each session runs a statement on, and whether an event loop was running there."""
+
+    def __init__(self, monkeypatch):
+        self.threads = {}
+        self.on_event_loop = []
+        serials = itertools.count()
+        execute = Session.execute
+
+        def recording_execute(session, *args, **kwargs):
+            serial = session.__dict__.setdefault("_test_serial", next(serials))
+            self.threads.setdefault(serial, set()).add(threading.get_ident())
+            if asyncio._get_running_loop() is not None:
+                self.on_event_loop.append(str(args[0])[:60])
+            return execute(session, *args, **kwargs)
+
+        monkeypatch.setattr(Session, "execute", recording_execute)
+
+
+def test_a_two_file_job_keeps_each_session_on_one_thread(session, job_uuids, monkeypatch):
+    monkeypatch.setattr(setting, "LLM_BATCH_MAPPING", False)
+    prompts = []
+
+    async def complete(self, prompt):
+        prompts.append(prompt)
+        return json.dumps({"reordered_columns": [0], "error": False, "error_message": None})
+
+    monkeypatch.setattr(LLMClient, "complete", complete)
+    # "name" matches locally; the other column goes to the LLM, so the mappings miss the cache and are written to it
+    tag = uuid.uuid4().hex[:8]
+    user_uuid, schema_uuid = uuid.uuid4(), uuid.uuid4()
+    session.add(OutputSchema(schema_uuid=schema_uuid, user_uuid=user_uuid, schema={"name": "", f"zq{tag}": ""}))
+    session.commit()
+    job_uuid = _queue_job(session, job_uuids, ["a.csv", "b.csv"])
+    inputs = _write_inputs(job_uuid, {"a.csv": "name,vx\nAnn,1\n", "b.csv": "wy,name\n2,Bo\n"})
+    sync_metadata = {
+        "user_uuid": str(user_uuid),
+        "file_metadatas": {filename: {"schema_uuid": str(schema_uuid)} for filename, _ in inputs},
+    }
+    session_use = _SessionUse(monkeypatch)
+
+    try:
+        sync_jobs.run_sync_job(job_uuid, sync_metadata, inputs)
+        cached = session.query(ColumnMapping).filter_by(schema_uuid=schema_uuid).count()
+    finally:
+        session.execute(delete(ColumnMapping).where(ColumnMapping.schema_uuid == schema_uuid))
+        session.execute(delete(OutputSchema).where(OutputSchema.schema_uuid == schema_uuid))
+        session.commit()
+
+    job = _job(session, job_uuid)
+    assert job.status == "succeeded", job.error
+    assert {filename: file_progress["stage"] for filename, file_progress in job.progress["files"].items()} == {"a.csv": "done", "b.csv": "done"}
+    assert job.progress["stage"] == "done"
+    assert job.result_filename.endswith(".zip") and os.path.exists(job.result_path)
+    assert not os.path.exists(sync_jobs.job_inputs_dir(job_uuid))
+    assert len(prompts) == 2 and cached == 2
+    # The files' cache lookups run in threadpool workers while their progress is reported on the event loop
+    assert session_use.on_event_loop == []
+    assert all(len(threads) == 1 for threads in session_use.threads.values())
+
+
+@pytest.fixture
+def schema(session):
+    """An output schema whose columns the test CSVs match locally, so no LLM is asked."""
+    user_uuid, schema_uuid = uuid.uuid4(), uuid.uuid4()
+    session.add(OutputSchema(schema_uuid=schema_uuid, user_uuid=user_uuid, schema={"name": "", "city": ""}))
+    session.commit()
+    yield {"user_uuid": str(user_uuid), "schema_uuid": str(schema_uuid)}
+    session.execute(delete(OutputSchema).where(OutputSchema.schema_uuid == schema_uuid))
+    session.commit()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The app without its lifespan; each request gets an unpooled async session, as TestClient runs it on a new loop."""
+    async def async_db():
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+            yield db
+        await async_engine.dispose()
+
+    submitted = []
+    # The job pool is left out; the test runs the submitted job itself
+    monkeypatch.setattr(sync_router, "submit_sync_job", lambda *job: submitted.append(job))
+    main.app.dependency_overrides[get_async_db] = async_db
+    yield TestClient(main.app), submitted
+    main.app.dependency_overrides.pop(get_async_db)
+
+
+def test_job_routes_follow_a_job_from_queued_to_expired(session, job_uuids, schema, client):
+    client, submitted = client
+    sync_metadata = {"user_uuid": schema["user_uuid"], "file_metadatas": {"people.csv": {"schema_uuid": schema["schema_uuid"]}}}
+
+    response = client.post("/sync/jobs", data={"sync_metadata": json.dumps(sync_metadata)}, files={"files": ("people.csv", b"city,name\nPune,Ann\n", "text/csv")})
+    assert response.status_code == 202
+    job_uuid = response.json()["job_uuid"]
+    job_uuids.append(job_uuid)
+    assert client.get(f"/sync/jobs/{job_uuid}").json()["sync_job"]["status"] == "queued"
+    assert client.get(f"/sync/jobs/{job_uuid}/result").status_code == 409
+
+    sync_jobs.run_sync_job(*submitted[0])
+    sync_job = client.get(f"/sync/jobs/{job_uuid}").json()["sync_job"]
+    assert sync_job["status"] == "succeeded"
+    assert sync_job["progress"]["files"]["people.csv"]["stage"] == "done"
+    assert "result_path" not in sync_job
+    result = client.get(f"/sync/jobs/{job_uuid}/result")
+    assert result.status_code == 200
+    assert result.text.splitlines() == ["name,city", "Ann,Pune"]
+    assert json.loads(result.headers["X-Sync-Report"])["files"][0]["filename"] == "people.csv"
+
+    SyncJobDAO(session).update_job(job_uuid, {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)})
+    sync_jobs.cleanup_expired_job_results(session)
+    assert _job(session, job_uuid).status == "expired"
+    assert not os.path.exists(sync_jobs.job_dir(job_uuid))
+    assert client.get(f"/sync/jobs/{job_uuid}/result").status_code == 410
+    assert client.get(f"/sync/jobs/{uuid.uuid4()}").status_code == 404
+    assert client.get("/sync/jobs/not-a-uuid").status_code == 404
+
+
+def test_a_failed_job_keeps_no_files(session, job_uuids, schema, monkeypatch):
+    def write_sync_output(result_file, processed_files):
+        result_file.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(sync_jobs, "write_sync_output", write_sync_output)
+    job_uuid = _queue_job(session, job_uuids, ["people.csv"])
+    inputs = _write_inputs(job_uuid, {"people.csv": "name,city\nAnn,Pune\n"})
+
+    sync_jobs.run_sync_job(job_uuid, {"user_uuid": schema["user_uuid"], "file_metadatas": {"people.csv": {"schema_uuid": schema["schema_uuid"]}}}, inputs)
+
+    job = _job(session, job_uuid)
+    assert (job.status, job.error, job.result_path) == ("failed", "disk full", None)
+    assert job.progress["stage"] == "failed"
+    assert job.expires_at > datetime.now(timezone.utc)
+    assert not os.path.exists(sync_jobs.job_dir(job_uuid))
+
+
+class _Pool:
+    def __init__(self, future):
+        self.future = future
+
+    def submit(self, *args):
+        return self.future
+
+
+@pytest.mark.parametrize("error, shuts_down_pool", [(BrokenProcessPool("A child process terminated abruptly"), True), (MemoryError("out of memory"), False)])
+def test_a_job_whose_worker_crashes_is_marked_failed(session, job_uuids, monkeypatch, error, shuts_down_pool):
+    future = Future()
+    future.set_exception(error)
+    shutdowns = []
+    monkeypatch.setattr(sync_jobs, "get_job_pool", lambda: _Pool(future))
+    monkeypatch.setattr(sync_jobs, "shutdown_job_pool", lambda: shutdowns.append(True))
+    job_uuid = _queue_job(session, job_uuids)
+    os.makedirs(sync_jobs.job_inputs_dir(job_uuid))
+
+    sync_jobs.submit_sync_job(job_uuid, {}, [])
+
+    job = _job(session, job_uuid)
+    assert job.status == "failed"
+    assert job.error == f"Job worker crashed: {error}"
+    assert bool(shutdowns) is shuts_down_pool
+    assert not os.path.exists(sync_jobs.job_dir(job_uuid))
+
+
+def test_a_cancelled_job_is_marked_failed(session, job_uuids, monkeypatch):
+    future = Future()
+    future.cancel()
+    monkeypatch.setattr(sync_jobs, "get_job_pool", lambda: _Pool(future))
+    job_uuid = _queue_job(session, job_uuids)
+
+    sync_jobs.submit_sync_job(job_uuid, {}, [])
+
+    job = _job(session, job_uuid)
+    assert (job.status, job.error) == ("failed", "Job was cancelled before it started")
+
+
+def test_jobs_no_worker_touched_for_a_while_are_failed(session, job_uuids, monkeypatch):
+    monkeypatch.setattr(setting, "SYNC_JOB_STALE_SECONDS", 60)
+    stale, recent = _queue_job(session, job_uuids), _queue_job(session, job_uuids)
+    SyncJobDAO(session).update_job(stale, {"status": "running", "updated_at": datetime.now(timezone.utc) - timedelta(minutes=5)})
+    SyncJobDAO(session).update_job(recent, {"status": "running"})
+    os.makedirs(sync_jobs.job_inputs_dir(stale))
+
+    sync_jobs.fail_orphaned_jobs(session)
+
+    stale_job = _job(session, stale)
+    assert (stale_job.status, stale_job.error, stale_job.result_path) == ("failed", "Job was interrupted before it finished", None)
+    assert stale_job.expires_at is not None
+    assert not os.path.exists(sync_jobs.job_dir(stale))
+    assert _job(session, recent).status == "running"
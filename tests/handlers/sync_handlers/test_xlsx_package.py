@@ -0,0 +1,122 @@
+import datetime
+import io
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.comments import Comment
+from openpyxl.worksheet.table import Table
+
+from handlers.sync_handlers.xlsx_package import iter_xlsx_with_replaced_sheet, open_package, read_sheet_summaries, read_workbook_sheets
+
+
+def _workbook():
+    workbook = openpyxl.Workbook()
+    first = workbook.active
+    first.title = "Orders"
+    first.append(["Customer", "Total"])
+    first.append(["Ann", 10])
+    second = workbook.create_sheet("Notes")
+    second.append(["Banner"])
+    second.append([])
+    second.append(["Key", "Value"])
+    second["B3"].font = openpyxl.styles.Font(bold=True)
+    hidden = workbook.create_sheet("Hidden")
+    hidden.sheet_state = "hidden"
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _replace(source, sheet_name, df):
+    return b"".join(iter_xlsx_with_replaced_sheet(source, sheet_name, df))
+
+
+def test_sheets_and_summaries_come_from_workbook_metadata():
+    with open_package(_workbook()) as package:
+        sheets = read_workbook_sheets(package)
+        summaries = read_sheet_summaries(package)
+
+    assert [(sheet["name"], sheet["state"]) for sheet in sheets] == [("Orders", "visible"), ("Notes", "visible"), ("Hidden", "hidden")]
+    assert summaries[0]["header"] == ["Customer", "Total"]
+    # The first non-empty row is the header, past any blank rows
+    assert summaries[1]["header"] == ["Banner"]
+
+
+def test_only_the_target_sheet_part_is_rewritten():
+    source = _workbook()
+    df = pd.DataFrame({"name": ["Bo", "Cy"], "spend": [1.5, 2]})
+
+    output = _replace(source, "Orders", df)
+
+    with zipfile.ZipFile(io.BytesIO(source)) as before, zipfile.ZipFile(io.BytesIO(output)) as after:
+        assert after.testzip() is None
+        target = read_workbook_sheets(before)[0]["part"]
+        assert sorted(after.namelist()) == sorted(before.namelist())
+        for name in before.namelist():
+            if name not in (target, "xl/styles.xml"):
+                assert after.read(name) == before.read(name), name
+        assert after.read(target) != before.read(target)
+
+    result = pd.read_excel(io.BytesIO(output), sheet_name=None)
+    assert list(result) == ["Orders", "Notes", "Hidden"]
+    pd.testing.assert_frame_equal(result["Orders"], df)
+    # Untouched sheets keep their formatting
+    assert openpyxl.load_workbook(io.BytesIO(output))["Notes"]["B3"].font.bold
+
+
+def test_cell_types_round_trip():
+    df = pd.DataFrame({
+        "text": ["a&b <c>", None, "bad\x01char"],
+        "count": pd.array([1, None, 3], dtype="Int64"),
+        "ratio": [0.5, np.nan, 2.0],
+        "flag": [True, False, None],
+        "day": pd.to_datetime(["2024-01-02", None, "2024-03-04"]),
+        "at": [datetime.datetime(2024, 1, 2, 3, 4, 5), None, None],
+    })
+
+    sheet = openpyxl.load_workbook(io.BytesIO(_replace(_workbook(), "Orders", df)))["Orders"]
+    rows = list(sheet.iter_rows(values_only=True))
+
+    assert rows[0] == ("text", "count", "ratio", "flag", "day", "at")
+    assert rows[1] == ("a&b <c>", 1, 0.5, True, datetime.datetime(2024, 1, 2), datetime.datetime(2024, 1, 2, 3, 4, 5))
+    assert rows[2] == (None, None, None, False, None, None)
+    # Characters XML cannot hold are dropped rather than corrupting the part
+    assert rows[3][0] == "badchar"
+    assert sheet["E2"].is_date and sheet["F2"].is_date
+
+
+def test_header_only_frame_writes_just_the_header():
+    output = _replace(_workbook(), "Notes", pd.DataFrame(columns=["Key", "Value"]))
+    result = pd.read_excel(io.BytesIO(output), sheet_name="Notes")
+    assert list(result.columns) == ["Key", "Value"]
+    assert result.empty
+
+
+def test_parts_only_the_replaced_sheet_referred_to_are_dropped():
+    workbook = openpyxl.load_workbook(io.BytesIO(_workbook()))
+    workbook["Orders"].add_table(Table(displayName="OrdersTable", ref="A1:B2"))
+    workbook["Orders"]["A1"].comment = Comment("replaced", "test")
+    workbook["Notes"]["A1"].comment = Comment("kept", "test")
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    source = buffer.getvalue()
+    with zipfile.ZipFile(io.BytesIO(source)) as before:
+        names = set(before.namelist())
+    orders_parts = {"xl/worksheets/_rels/sheet1.xml.rels", "xl/tables/table1.xml", "xl/comments/comment1.xml", "xl/drawings/commentsDrawing1.vml"}
+    assert orders_parts < names
+
+    output = _replace(source, "Orders", pd.DataFrame({"name": ["Bo"]}))
+
+    with zipfile.ZipFile(io.BytesIO(output)) as after:
+        assert after.testzip() is None
+        kept = set(after.namelist())
+        content_types = after.read("[Content_Types].xml").decode("utf-8")
+    # The Notes sheet keeps its own comment and legacy drawing
+    assert kept == names - orders_parts
+    assert "/xl/tables/table1.xml" not in content_types and "/xl/comments/comment1.xml" not in content_types
+    assert "/xl/comments/comment2.xml" in content_types
+    result = openpyxl.load_workbook(io.BytesIO(output))
+    assert result["Orders"].tables == {}
+    assert result["Notes"]["A1"].comment.text == "kept"
@@ -0,0 +1,155 @@
+import bisect
+import io
+import struct
+import zipfile
+
+from handlers.sync_handlers.zip_stream import ZipStreamWriter
+
+
+def _archive(writer, *entries, comment=b""):
+    chunks = [chunk for entry in entries for chunk in entry]
+    return b"".join(chunks) + b"".join(writer.close(comment=comment))
+
+
+def test_streamed_entries_read_back_with_zipfile():
+    writer = ZipStreamWriter()
+    csv_chunks = [b"a,b\n", b"", b"1,2\n" * 1000]
+    archive = _archive(
+        writer,
+        writer.write_stream("a.csv", iter(csv_chunks)),
+        writer.write_stream("b.csv", iter([b"x\n"]), compress_type=zipfile.ZIP_STORED),
+        comment=b'{"files": []}',
+    )
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as package:
+        assert package.testzip() is None
+        assert package.namelist() == ["a.csv", "b.csv"]
+        assert package.read("a.csv") == b"".join(csv_chunks)
+        assert package.read("b.csv") == b"x\n"
+        assert package.getinfo("a.csv").compress_type == zipfile.ZIP_DEFLATED
+        assert package.getinfo("b.csv").compress_type == zipfile.ZIP_STORED
+        assert package.getinfo("a.csv").flag_bits & 0x08
+        assert package.comment == b'{"files": []}'
+
+
+def test_raw_and_in_memory_entries_copy_their_bytes():
+    source = io.BytesIO()
+    with zipfile.ZipFile(source, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("part.xml", "<x/>" * 100)
+    with zipfile.ZipFile(source) as package:
+        info = package.getinfo("part.xml")
+        with package.open(info) as entry:
+            entry.read()
+        raw = source.getvalue()
+        # The compressed bytes follow the local header, its name and its extra field
+        name_length = int.from_bytes(raw[info.header_offset + 26:info.header_offset + 28], "little")
+        extra_length = int.from_bytes(raw[info.header_offset + 28:info.header_offset + 30], "little")
+        start = info.header_offset + 30 + name_length + extra_length
+        compressed = raw[start:start + info.compress_size]
+
+    writer = ZipStreamWriter()
+    archive = _archive(
+        writer,
+        writer.write_raw("part.xml", [compressed], info.CRC, info.compress_size, info.file_size, info.compress_type),
+        writer.write_bytes("note.txt", "café".encode("utf-8")),
+        writer.write_bytes("ünïcode.txt", b"name", compress_type=zipfile.ZIP_STORED),
+    )
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as package:
+        assert package.testzip() is None
+        assert package.read("part.xml") == b"<x/>" * 100
+        assert package.read("note.txt").decode("utf-8") == "café"
+        assert package.read("ünïcode.txt") == b"name"
+
+
+class _ChunkFile(io.RawIOBase):
+    """A read-only, seekable view of emitted chunks, so a multi-GiB archive is read back without copying it."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.starts = []
+        self.size = 0
+        for chunk in chunks:
+            self.starts.append(self.size)
+            self.size += len(chunk)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.position = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence] + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+        index = bisect.bisect_right(self.starts, self.position) - 1
+        start = self.position - self.starts[index]
+        data = self.chunks[index][start:start + len(buffer)]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def test_streamed_entries_past_4_gib_are_written_as_zip64():
+    block = bytes(64 * 1024 * 1024)
+    blocks = 0x1_0000_0000 // len(block)
+    writer = ZipStreamWriter()
+    chunks = [
+        *writer.write_stream("big.csv", iter([block] * blocks + [b"end"]), compress_type=zipfile.ZIP_STORED),
+        *writer.write_stream("small.csv", iter([b"a\n"])),
+        *writer.close(),
+    ]
+
+    with zipfile.ZipFile(io.BufferedReader(_ChunkFile(chunks))) as package:
+        big, small = package.infolist()
+        assert big.file_size == big.compress_size == 0x1_0000_0003
+        assert small.header_offset > 0xFFFFFFFF
+        assert package.read("small.csv") == b"a\n"
+    # The big entry's data descriptor, just ahead of the next local header, carries 64-bit sizes
+    descriptor = chunks[chunks.index(b"end") + 1]
+    assert struct.unpack("<IIQQ", descriptor)[2:] == (0x1_0000_0003, 0x1_0000_0003)
+
+
+def test_entries_kept_to_32_bit_headers_have_no_zip64_fields():
+    writer = ZipStreamWriter()
+    archive = _archive(writer, writer.write_stream("part.xml", iter([b"<x/>"]), zip64=False))
+
+    assert len(archive[archive.index(b"PK\x07\x08"):archive.index(b"PK\x01\x02")]) == 16
+    with zipfile.ZipFile(io.BytesIO(archive)) as package:
+        assert package.read("part.xml") == b"<x/>"
+        assert package.infolist()[0].extra == b""
+
+
+def test_empty_archive_is_valid():
+    archive = b"".join(ZipStreamWriter().close())
+    with zipfile.ZipFile(io.BytesIO(archive)) as package:
+        assert package.namelist() == []
+
+
+def test_entry_count_past_the_zip32_limit_switches_to_zip64_records():
+    writer = ZipStreamWriter()
+    count = 0xFFFF + 1
+    archive = _archive(writer, *(writer.write_bytes(f"{index}.txt", b"", compress_type=zipfile.ZIP_STORED) for index in range(count)))
+
+    assert b"PK\x06\x06" in archive[-200:]
+    with zipfile.ZipFile(io.BytesIO(archive)) as package:
+        assert len(package.infolist()) == count
+        assert package.read(f"{count - 1}.txt") == b""
+
+
+def test_oversized_comment_is_rejected():
+    writer = ZipStreamWriter()
+    try:
+        b"".join(writer.close(comment=b"x" * 0x10000))
+    except ValueError as e:
+        assert "comment" in str(e)
+    else:
+        raise AssertionError("expected a ValueError")
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+from config import setting
+from middleware.body_size_limit import BodySizeLimitMiddleware
+
+
+def _app(max_bytes, reads):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            reads.append(len(chunk))
+            size += len(chunk)
+        return {"size": size}
+
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=max_bytes)
+    return app
+
+
+def _post_chunks(app, chunks, headers=()):
+    """Send the body through ASGI one chunk per message; returns (sent messages, chunks pulled)."""
+    scope = {"type": "http", "method": "POST", "path": "/upload", "headers": list(headers), "query_string": b""}
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages[-1]["more_body"] = False
+    pulled, sent = [], []
+
+    async def receive():
+        if pulled == messages:
+            return {"type": "http.disconnect"}
+        pulled.append(messages[len(pulled)])
+        return pulled[-1]
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent, len(pulled)
+
+
+def test_bodies_within_the_limit_pass_through():
+    reads = []
+    response = TestClient(_app(10, reads)).post("/upload", content=b"x" * 10)
+
+    assert response.status_code == 200
+    assert response.json() == {"size": 10}
+
+
+def test_a_declared_length_over_the_limit_is_refused_before_the_body_is_read():
+    reads = []
+    response = TestClient(_app(10, reads)).post("/upload", content=b"x" * 11)
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body exceeds the 10 byte limit"}
+    assert reads == []
+
+
+def test_a_chunked_body_is_cut_off_once_it_crosses_the_limit():
+    reads = []
+
+    sent, pulled = _post_chunks(_app(10, reads), [b"x" * 6, b"x" * 6, b"x" * 6, b"x" * 6])
+
+    # The chunk that crossed the limit is neither handed to the route nor followed by the rest
+    assert pulled == 2
+    assert reads == [6]
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+    assert sent[0]["status"] == 413
+    assert sent[1]["body"] == b'{"detail": "Request body exceeds the 10 byte limit"}'
+
+
+def test_a_client_that_really_disconnects_is_not_hidden():
+    app = _app(10, [])
+    scope = {"type": "http", "method": "POST", "path": "/upload", "headers": [], "query_string": b""}
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(app(scope, receive, send))
+
+
+@pytest.mark.parametrize("max_bytes", [0, None], ids=["disabled", "setting"])
+def test_a_limit_of_zero_disables_the_check(monkeypatch, max_bytes):
+    monkeypatch.setattr(setting, "MAX_REQUEST_BYTES", 0)
+    reads = []
+
+    sent, pulled = _post_chunks(_app(max_bytes, reads), [b"x" * 6, b"x" * 6])
+
+    assert pulled == 2
+    assert sent[0]["status"] == 200
+    assert sent[1]["body"] == b'{"size":12}'